@@ -0,0 +1,303 @@
+from collections import Counter
+from math import sqrt
+from typing import List, Dict, Iterable
+
+from PyQt5.QtCore import QPoint, QRect
+
+import constants
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+import positioning_helper_grid
+import positioning_helper_v2
+from shape_boxes import ShapeBoxes
+
+# Shapes collection which watches distribution of shapes and switches index when it degrades
+#
+# Shapes are stored in positioning_helper_v2 collection first, it is fast for shapes spread along X
+# Sorted list is slow when many shapes have the same X (stacked vertically) or when some shape is much wider than others,
+# since search scans all points within widest shape width. Collection tracks:
+# - share of shapes with the same left X as other shapes
+# - ratio of widest shape width to average width
+# - average number of boundary points scanned per query
+# When any of them exceeds its limit, shapes are moved to grid collection (positioning_helper_grid)
+#
+# Migration does not block: new collection is filled by chunks during following calls,
+# and until it is complete, all queries are served by old collection, changes are applied to both
+class AdaptiveShapesCollection():
+    def __init__(self) -> None:
+        self._collection = positioning_helper_v2.ShapesCollection()
+
+        # Collection being filled during migration, shapes left to move to it and shapes already moved
+        self._targetCollection: positioning_helper_grid.ShapesCollection = None
+        self._pendingShapes: List[CustomShape] = []
+        self._migratedShapes = set()
+
+        # Left X of every shape in collection and number of shapes with each left X
+        self._shapeLeftX: Dict[CustomShape, int] = {}
+        self._leftXCounts: Dict[int, int] = {}
+        # After batch move left X values are outdated, they are read from shapes again when needed
+        self._leftXOutdated = False
+        # Sums of shapes widths and squared widths, to get average width and its spread
+        self._widthSum = 0
+        self._widthSquaresSum = 0
+
+        # Own modification counter, it does not change when collection is switched
+        self._generation = 0
+        # Distribution is checked once per ADAPTIVE_INDEX_CHECK_INTERVAL calls
+        self._callsCount = 0
+        self._checkedScanStatistics = (0, 0)
+
+    @property
+    def shapesList(self) -> List[CustomShape]:
+        return self._collection.shapesList
+
+    @property
+    def maxShapeWidth(self) -> int:
+        return self._collection.maxShapeWidth
+
+    @property
+    def minShapeWidth(self) -> int:
+        return self._collection.minShapeWidth
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # True if shapes are being moved to grid collection or already moved
+    @property
+    def isGridUsed(self) -> bool:
+        return self._targetCollection is not None or isinstance(self._collection, positioning_helper_grid.ShapesCollection)
+
+    # Current distribution statistics, e.g. to show them in overlay
+    def getStatistics(self) -> dict:
+        self.__updateLeftX()
+        shapesCount = len(self._shapeLeftX)
+        averageWidth = self._widthSum / shapesCount if shapesCount else 0
+        widthVariance = self._widthSquaresSum / shapesCount - averageWidth ** 2 if shapesCount else 0
+        scansCount, scannedCount = self._collection.scanStatistics
+        checkedScansCount, checkedScannedCount = self._checkedScanStatistics
+
+        return {"shapes": shapesCount,
+                "sameLeftXRatio": 1 - len(self._leftXCounts) / shapesCount if shapesCount else 0,
+                "averageWidth": averageWidth,
+                "widthDeviation": sqrt(max(widthVariance, 0)),
+                "maxWidthRatio": self._collection.maxShapeWidth / averageWidth if averageWidth else 0,
+                "averageScanLength": (scannedCount - checkedScannedCount) / (scansCount - checkedScansCount) if scansCount > checkedScansCount else 0}
+
+    def addShape(self, shape: CustomShape) -> None:
+        self.__onCall(True)
+        self._collection.addShape(shape)
+        self.__addStatistics(shape)
+
+        if self._targetCollection:
+            self._targetCollection.addShape(shape)
+            self._migratedShapes.add(shape)
+
+    def updateShapePosition(self, shape: CustomShape, newCenterPoint: QPoint) -> None:
+        self.__onCall(True)
+        self._collection.updateShapePosition(shape, newCenterPoint)
+        self.__moveStatistics(shape)
+
+        if shape in self._migratedShapes:
+            self._targetCollection.relocateShapes([shape])
+
+    def relocateShapes(self, shapes: Iterable[CustomShape]) -> None:
+        self.__onCall(True)
+        shapes = list(shapes)
+        self._collection.relocateShapes(shapes)
+
+        for shape in shapes:
+            self.__moveStatistics(shape)
+
+        if self._targetCollection:
+            self._targetCollection.relocateShapes([shape for shape in shapes if shape in self._migratedShapes])
+
+    # Same as relocateShapes for shapes, which boxes before and after move are known (see ShapeBoxes)
+    # Statistics are not updated for every shape, left X values are marked as outdated instead
+    def relocateShapeBoxes(self, oldBoxes: ShapeBoxes, newBoxes: ShapeBoxes) -> None:
+        self.__onCall(True)
+        self._collection.relocateShapeBoxes(oldBoxes, newBoxes)
+        self._leftXOutdated = True
+
+        if self._targetCollection:
+            migratedIndexes = [index for index, shape in enumerate(newBoxes.shapes) if shape in self._migratedShapes]
+            self._targetCollection.relocateShapeBoxes(oldBoxes.take(migratedIndexes), newBoxes.take(migratedIndexes))
+
+    def getShapeAtPoint(self, point: QPoint) -> CustomShape:
+        self.__onCall(False)
+        return self._collection.getShapeAtPoint(point)
+
+    def popShapeAtPoint(self, point: QPoint) -> CustomShape:
+        result = self.getShapeAtPoint(point)
+
+        if result:
+            self.deleteShape(result)
+
+        return result
+
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        self.__onCall(False)
+        return self._collection.getShapesInRect(rect)
+
+    def deleteShape(self, shape: CustomShape) -> None:
+        self.__onCall(True)
+        self._collection.deleteShape(shape)
+        self.__removeStatistics(shape)
+
+        if shape in self._migratedShapes:
+            self._targetCollection.deleteShape(shape)
+            self._migratedShapes.discard(shape)
+
+    def deleteShapes(self, shapes: Iterable[CustomShape]) -> None:
+        self.__onCall(True)
+        shapes = {shape for shape in shapes if shape in self._shapeLeftX}
+        self._collection.deleteShapes(shapes)
+
+        for shape in shapes:
+            self.__removeStatistics(shape)
+
+        if self._targetCollection:
+            migratedShapes = shapes & self._migratedShapes
+            self._targetCollection.deleteShapes(migratedShapes)
+            self._migratedShapes -= migratedShapes
+
+    # Collection starts from sorted list again
+    def clearCollection(self) -> None:
+        self._generation += 1
+        self._collection = positioning_helper_v2.ShapesCollection()
+        self.__stopMigration()
+
+        self._shapeLeftX.clear()
+        self._leftXCounts.clear()
+        self._leftXOutdated = False
+        self._widthSum = 0
+        self._widthSquaresSum = 0
+        self._checkedScanStatistics = (0, 0)
+
+    # Only sorted list has index to save
+    def exportIndex(self) -> dict:
+        if self._targetCollection:
+            return None
+
+        return self._collection.exportIndex()
+
+    # Loaded shapes are put to sorted list with saved index, distribution is checked right away
+    def loadShapes(self, shapes: List[CustomShape], index: dict = None) -> bool:
+        self.clearCollection()
+        indexAdopted = self._collection.loadShapes(shapes, index)
+
+        for shape in shapes:
+            self.__addStatistics(shape)
+
+        self.__checkDistribution()
+        return indexAdopted
+
+    # Shapes are reordered in current collection, but not while they are moved to grid,
+    # since order of shapes left to move is fixed
+    # Returns true if shapes were reordered
+    def reorderShapes(self, shapes: List[CustomShape]) -> bool:
+        if self._targetCollection:
+            return False
+
+        self._generation += 1
+        return self._collection.reorderShapes(shapes)
+
+    # Every call continues migration by one chunk and counts calls until the next distribution check
+    def __onCall(self, modifying: bool) -> None:
+        if modifying:
+            self._generation += 1
+
+        if self._targetCollection:
+            self.__continueMigration()
+
+        self._callsCount += 1
+
+        if self._callsCount >= constants.ADAPTIVE_INDEX_CHECK_INTERVAL:
+            self._callsCount = 0
+            self.__checkDistribution()
+
+    def __checkDistribution(self) -> None:
+        if self.isGridUsed or len(self._shapeLeftX) < constants.ADAPTIVE_INDEX_MIN_SHAPES:
+            return
+
+        statistics = self.getStatistics()
+        self._checkedScanStatistics = self._collection.scanStatistics
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.addSample("index.average_scan_length", round(statistics["averageScanLength"]))
+
+        if (statistics["sameLeftXRatio"] > constants.ADAPTIVE_INDEX_MAX_SAME_X_RATIO
+                or statistics["maxWidthRatio"] > constants.ADAPTIVE_INDEX_MAX_WIDTH_RATIO
+                or statistics["averageScanLength"] > constants.ADAPTIVE_INDEX_MAX_SCAN_LENGTH):
+            self.__startMigration(statistics["averageWidth"])
+
+    # Cells of grid are made several times bigger than average shape, so most shapes are in 1 - 4 cells
+    def __startMigration(self, averageWidth: float) -> None:
+        cellSize = max(round(averageWidth * constants.ADAPTIVE_INDEX_GRID_CELL_SIZE_RATIO), 1)
+
+        self._targetCollection = positioning_helper_grid.ShapesCollection(cellSize)
+        self._pendingShapes = list(reversed(self._collection.shapesList))
+        self._migratedShapes = set()
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("index.migrations")
+
+    # Moves next chunk of shapes to new collection, switches to it when all shapes are moved
+    # Shapes deleted after migration start are skipped
+    def __continueMigration(self) -> None:
+        for _ in range(min(constants.ADAPTIVE_INDEX_MIGRATION_CHUNK, len(self._pendingShapes))):
+            shape = self._pendingShapes.pop()
+
+            if shape in self._shapeLeftX and shape not in self._migratedShapes:
+                self._targetCollection.addShape(shape)
+                self._migratedShapes.add(shape)
+
+        if not self._pendingShapes:
+            self._collection = self._targetCollection
+            self.__stopMigration()
+
+    def __stopMigration(self) -> None:
+        self._targetCollection = None
+        self._pendingShapes = []
+        self._migratedShapes = set()
+
+    def __addStatistics(self, shape: CustomShape) -> None:
+        leftX = shape.boundingBox.left()
+        width = shape.boundingBox.width()
+
+        self._shapeLeftX[shape] = leftX
+        self._leftXCounts[leftX] = self._leftXCounts.get(leftX, 0) + 1
+        self._widthSum += width
+        self._widthSquaresSum += width * width
+
+    def __removeStatistics(self, shape: CustomShape) -> None:
+        self.__updateLeftX()
+        self.__removeLeftX(self._shapeLeftX.pop(shape))
+
+        width = shape.boundingBox.width()
+        self._widthSum -= width
+        self._widthSquaresSum -= width * width
+
+    # Width does not change on move, only left X is updated
+    def __moveStatistics(self, shape: CustomShape) -> None:
+        self.__updateLeftX()
+        self.__removeLeftX(self._shapeLeftX[shape])
+
+        leftX = shape.boundingBox.left()
+        self._shapeLeftX[shape] = leftX
+        self._leftXCounts[leftX] = self._leftXCounts.get(leftX, 0) + 1
+
+    # Reads left X of all shapes again, if they were outdated by batch move
+    def __updateLeftX(self) -> None:
+        if not self._leftXOutdated:
+            return
+
+        self._leftXOutdated = False
+        self._shapeLeftX = {shape: shape.boundingBox.left() for shape in self._shapeLeftX}
+        self._leftXCounts = Counter(self._shapeLeftX.values())
+
+    def __removeLeftX(self, leftX: int) -> None:
+        if self._leftXCounts[leftX] == 1:
+            del self._leftXCounts[leftX]
+        else:
+            self._leftXCounts[leftX] -= 1
@@ -0,0 +1,215 @@
+from math import cos, sin, pi
+from typing import Callable, Dict, List
+
+# NumPy is optional, without it trajectories are called one by one
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from PyQt5.QtCore import QPoint, QTimer
+
+import constants
+from custom_shape import CustomShape
+from event_trace import EventTraceRecorder
+from geometry_controller import GeometryController
+from performance_monitor import PERF_MONITOR
+
+# Trajectory returns center of shape for frame number since animation start, or None when animation is finished
+Trajectory = Callable[[int], QPoint]
+
+# Moves many shapes along trajectories, once per frame
+#
+# All shapes are moved by single GeometryController.tryRelocateShapeList call:
+# collisions between moving shapes are found by sort and sweep, and collection index is updated once per frame
+# Shape which would collide at the next point of its trajectory waits at current position
+# List of animated shapes stays the same between frames, until animations are changed, so controller keeps
+# boxes of shapes between frames, and points of orbit trajectories are calculated for all shapes at once over arrays
+class AnimationEngine():
+    def __init__(self, geometryController: GeometryController, onFrame: Callable[[], None]) -> None:
+        self._geometryController = geometryController
+        # Called after every frame which moved any shape
+        self._onFrame = onFrame
+
+        # Trajectory of every animated shape and frame of animation start
+        self._trajectories: Dict[CustomShape, Trajectory] = {}
+        self._startFrames: Dict[CustomShape, int] = {}
+        self._frameNumber = 0
+
+        # Animated shapes in order of trajectories and parameters of their orbits, collected again when animations change
+        self._animatedShapes: List[CustomShape] = None
+        self._orbits: OrbitArrays = None
+        # Indexes of shapes with other trajectories, which are called one by one
+        self._otherIndexes: List[int] = []
+
+        # Frames are recorded to trace, since replay has no timers running
+        self._traceRecorder: EventTraceRecorder = None
+
+        self._frameTimer = QTimer()
+        self._frameTimer.setInterval(constants.ANIMATION_FRAME_INTERVAL_MS)
+        self._frameTimer.timeout.connect(self.processFrame)
+
+    @property
+    def animatedShapesCount(self) -> int:
+        return len(self._trajectories)
+
+    # Starts moving shape along trajectory, previous animation of the shape is replaced
+    def animateShape(self, shape: CustomShape, trajectory: Trajectory) -> None:
+        self._trajectories[shape] = trajectory
+        self._startFrames[shape] = self._frameNumber
+        self._animatedShapes = None
+
+        if not self._frameTimer.isActive():
+            self._frameTimer.start()
+
+    # Stops shape at its current position
+    def stopShape(self, shape: CustomShape) -> None:
+        if self._trajectories.pop(shape, None) is not None:
+            self._animatedShapes = None
+
+        self._startFrames.pop(shape, None)
+
+    # Recorder could be None to stop recording
+    def setTraceRecorder(self, traceRecorder: EventTraceRecorder) -> None:
+        self._traceRecorder = traceRecorder
+
+    def stopAll(self) -> None:
+        self._trajectories.clear()
+        self._startFrames.clear()
+        self._animatedShapes = None
+        self._frameTimer.stop()
+
+    # Moves all animated shapes to their next trajectory points
+    # Called by frame timer, timer stops itself when there are no animations left
+    def processFrame(self) -> None:
+        if self._traceRecorder:
+            self._traceRecorder.recordEvent("animation_frame")
+
+        timerStart = PERF_MONITOR.startTimer()
+        self._frameNumber += 1
+
+        # Shapes deleted from the scene are not animated anymore
+        for shape in self._geometryController.getMissingShapes(self._trajectories):
+            self.stopShape(shape)
+
+        if self._animatedShapes is None:
+            self.__collectAnimations()
+
+        shapes = self._animatedShapes
+        centersX, centersY = self._orbits.getPoints(self._frameNumber)
+        finishedShapes: List[CustomShape] = []
+
+        for index in self._otherIndexes:
+            shape = shapes[index]
+            point = self._trajectories[shape](self._frameNumber - self._startFrames[shape])
+
+            # Finished shape stays at its current position in this frame
+            if point is None:
+                finishedShapes.append(shape)
+                point = shape.centerPoint
+
+            centersX[index] = point.x()
+            centersY[index] = point.y()
+
+        for shape in finishedShapes:
+            self.stopShape(shape)
+
+        if not self._trajectories:
+            self._frameTimer.stop()
+
+        if shapes and self._geometryController.tryRelocateShapeList(shapes, centersX, centersY):
+            self._onFrame()
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.stopTimer("animation.frame", timerStart)
+            PERF_MONITOR.addSample("animation.shapes", len(shapes))
+
+    # Animated shapes are split to shapes on orbits and shapes with other trajectories
+    def __collectAnimations(self) -> None:
+        self._animatedShapes = list(self._trajectories)
+        orbitIndexes = [index for index, shape in enumerate(self._animatedShapes) if isinstance(self._trajectories[shape], OrbitTrajectory)]
+
+        self._orbits = OrbitArrays([self._trajectories[self._animatedShapes[index]] for index in orbitIndexes],
+                                   [self._startFrames[self._animatedShapes[index]] for index in orbitIndexes],
+                                   orbitIndexes, len(self._animatedShapes))
+        self._otherIndexes = sorted(set(range(len(self._animatedShapes))) - set(orbitIndexes))
+
+# Circular trajectory which starts and ends at start point, full circle takes specified number of frames
+# Phase (0..1) defines position of start point on the circle, trajectory never finishes
+class OrbitTrajectory():
+    def __init__(self, startPoint: QPoint, radius: int, periodFrames: int, phase: float = 0.0) -> None:
+        self.startX = startPoint.x()
+        self.startY = startPoint.y()
+        self.radius = radius
+        self.periodFrames = periodFrames
+        self.phase = phase
+
+    def __call__(self, frame: int) -> QPoint:
+        angle = 2 * pi * (frame / self.periodFrames + self.phase)
+        return QPoint(self.startX + round(self.radius * (cos(angle) - cos(2 * pi * self.phase))),
+                      self.startY + round(self.radius * (sin(angle) - sin(2 * pi * self.phase))))
+
+# Parameters of many orbit trajectories as arrays, points of all orbits for a frame are calculated at once
+# Points are returned for all animated shapes, places of shapes with other trajectories are left for caller
+# numpy.rint rounds halves to even, same as round, so points are the same as points of OrbitTrajectory
+# Without NumPy, trajectories are called one by one
+class OrbitArrays():
+    def __init__(self, trajectories: List[OrbitTrajectory], startFrames: List[int], indexes: List[int], shapesCount: int) -> None:
+        self._trajectories = trajectories
+        self._startFrames = startFrames
+        self._indexes = indexes
+        self._shapesCount = shapesCount
+
+        if numpy is not None:
+            self._indexes = numpy.array(indexes, dtype=numpy.int64)
+            self._startFrameArray = numpy.array(startFrames, dtype=numpy.int64)
+            self._startXs = numpy.array([trajectory.startX for trajectory in trajectories], dtype=numpy.int64)
+            self._startYs = numpy.array([trajectory.startY for trajectory in trajectories], dtype=numpy.int64)
+            self._radii = numpy.array([trajectory.radius for trajectory in trajectories], dtype=numpy.float64)
+            self._periods = numpy.array([trajectory.periodFrames for trajectory in trajectories], dtype=numpy.int64)
+            self._phases = numpy.array([trajectory.phase for trajectory in trajectories], dtype=numpy.float64)
+            self._startCos = numpy.cos(2 * pi * self._phases)
+            self._startSin = numpy.sin(2 * pi * self._phases)
+
+    # X and Y of points of all orbits for frame number since engine start, as arrays with NumPy and as lists without it
+    def getPoints(self, frameNumber: int) -> tuple:
+        if numpy is None:
+            centersX = [0] * self._shapesCount
+            centersY = [0] * self._shapesCount
+
+            for index, trajectory, startFrame in zip(self._indexes, self._trajectories, self._startFrames):
+                point = trajectory(frameNumber - startFrame)
+                centersX[index] = point.x()
+                centersY[index] = point.y()
+
+            return centersX, centersY
+
+        angles = 2 * pi * ((frameNumber - self._startFrameArray) / self._periods + self._phases)
+
+        centersX = numpy.zeros(self._shapesCount, dtype=numpy.int64)
+        centersY = numpy.zeros(self._shapesCount, dtype=numpy.int64)
+        centersX[self._indexes] = self._startXs + numpy.rint(self._radii * (numpy.cos(angles) - self._startCos)).astype(numpy.int64)
+        centersY[self._indexes] = self._startYs + numpy.rint(self._radii * (numpy.sin(angles) - self._startSin)).astype(numpy.int64)
+
+        return centersX, centersY
+
+def orbitTrajectory(startPoint: QPoint, radius: int, periodFrames: int, phase: float = 0.0) -> Trajectory:
+    return OrbitTrajectory(startPoint, radius, periodFrames, phase)
+
+# Trajectory through list of points with constant speed between neighbour points
+# Finishes at the last point
+def waypointsTrajectory(points: List[QPoint], framesPerSegment: int) -> Trajectory:
+    def trajectory(frame: int) -> QPoint:
+        segmentIndex, segmentFrame = divmod(frame, framesPerSegment)
+
+        if segmentIndex >= len(points) - 1:
+            return points[-1] if segmentIndex == len(points) - 1 and segmentFrame == 0 else None
+
+        start = points[segmentIndex]
+        end = points[segmentIndex + 1]
+        progress = segmentFrame / framesPerSegment
+
+        return QPoint(start.x() + round((end.x() - start.x()) * progress),
+                      start.y() + round((end.y() - start.y()) * progress))
+
+    return trajectory
@@ -0,0 +1,127 @@
+import json
+import os
+import random
+from argparse import ArgumentParser
+from time import perf_counter_ns
+from typing import Callable, Dict, List
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtCore import Qt, QPoint, QRect, QSize
+
+import constants
+from custom_rect import CustomRectRandomColorFactory
+from geometry_controller import GeometryController
+from positioning_backends import POSITIONING_BACKENDS
+
+# Benchmark of paint and query throughput on big scene
+#
+# Scene is built from shapes created in random places in random order, as after long editing session,
+# then paint and query loops are measured before and after reordering of shapes collection along Hilbert curve:
+# - "paint 1:1" and "paint 1:10" - drawing of view-sized part of the world at two scales into offscreen image
+# - "point hit" and "point miss" - search of shape at shape center and at random point
+# - "rect query" - search of shapes in view-sized rect
+# - "full scan" - iteration through all shapes of collection, as drawing without index does
+# Every result is number of operations per second
+
+VIEW_SIZE = QSize(1000, 700)
+
+# Only world size is taken from draw area by controller
+class _BenchmarkArea():
+    def __init__(self, worldSize: QSize) -> None:
+        self._worldSize = worldSize
+
+    def worldSize(self) -> QSize:
+        return self._worldSize
+
+# Shapes are placed into random free cells of lattice, so they do not collide, and then shuffled
+def createScene(controller: GeometryController, shapesCount: int, worldSize: QSize, seed: int) -> List[QPoint]:
+    generator = random.Random(seed)
+    factory = CustomRectRandomColorFactory()
+
+    cellWidth = constants.RECT_SIZE_X * 2
+    cellHeight = constants.RECT_SIZE_Y * 2
+    columnsCount = worldSize.width() // cellWidth
+    cellsCount = columnsCount * (worldSize.height() // cellHeight)
+
+    centers = [QPoint((cell % columnsCount) * cellWidth + cellWidth // 2, (cell // columnsCount) * cellHeight + cellHeight // 2)
+               for cell in generator.sample(range(cellsCount), min(shapesCount, cellsCount))]
+
+    controller.loadSceneContent([factory.getNewCustomShape(center) for center in centers], [])
+    return centers
+
+# Measures every benchmark, returns operations per second for each of them
+def runBenchmarks(controller: GeometryController, centers: List[QPoint], worldSize: QSize, operationsCount: int, seed: int) -> Dict[str, float]:
+    generator = random.Random(seed)
+
+    def randomPoint() -> QPoint:
+        return QPoint(generator.randrange(worldSize.width()), generator.randrange(worldSize.height()))
+
+    def randomViewRect(scale: float) -> QRect:
+        width = int(VIEW_SIZE.width() / scale)
+        height = int(VIEW_SIZE.height() / scale)
+        return QRect(generator.randrange(max(worldSize.width() - width, 1)), generator.randrange(max(worldSize.height() - height, 1)), width, height)
+
+    image = QImage(VIEW_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+
+    def paint(rect: QRect, scale: float) -> None:
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.scale(scale, scale)
+        painter.translate(-rect.left(), -rect.top())
+        controller.drawGeometryInRect(painter, rect, scale)
+        painter.end()
+
+    paintsCount = max(operationsCount // 100, 1)
+    hitPoints = [generator.choice(centers) for _ in range(operationsCount)]
+    missPoints = [randomPoint() for _ in range(operationsCount)]
+    paintRects = [randomViewRect(1.0) for _ in range(paintsCount)]
+    zoomedPaintRects = [randomViewRect(0.1) for _ in range(paintsCount)]
+    queryRects = [randomViewRect(1.0) for _ in range(operationsCount // 10)]
+
+    return {"paint 1:1": _measure(lambda: [paint(rect, 1.0) for rect in paintRects], paintsCount),
+            "paint 1:10": _measure(lambda: [paint(rect, 0.1) for rect in zoomedPaintRects], paintsCount),
+            "point hit": _measure(lambda: [controller.getShapeAtPoint(point) for point in hitPoints], operationsCount),
+            "point miss": _measure(lambda: [controller.getShapeAtPoint(point) for point in missPoints], operationsCount),
+            "rect query": _measure(lambda: [controller.getShapesInRect(rect) for rect in queryRects], len(queryRects)),
+            "full scan": _measure(lambda: [shape.boundingBox.width() for shape in controller.getAllShapes()], len(centers))}
+
+def _measure(function: Callable[[], object], operationsCount: int) -> float:
+    timerStart = perf_counter_ns()
+    function()
+    return operationsCount * 1e9 / max(perf_counter_ns() - timerStart, 1)
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measure paint and query throughput before and after Hilbert curve reordering of shapes")
+    parser.add_argument("--shapes", type=int, default=constants.BENCHMARK_SHAPES_COUNT, help="number of shapes in scene")
+    parser.add_argument("--operations", type=int, default=constants.BENCHMARK_OPERATIONS_COUNT, help="number of point queries, paints and rect queries are fewer")
+    parser.add_argument("--backend", default="v2", choices=list(POSITIONING_BACKENDS), help="positioning backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", metavar="REPORT_FILE", help="save results to JSON file")
+    args = parser.parse_args()
+
+    # Shapes are painted into offscreen images, window is not needed
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication([])
+
+    worldSize = QSize(constants.WORLD_SIZE_X, constants.WORLD_SIZE_Y)
+    controller = GeometryController(_BenchmarkArea(worldSize), args.backend)
+    centers = createScene(controller, args.shapes, worldSize, args.seed)
+
+    before = runBenchmarks(controller, centers, worldSize, args.operations, args.seed)
+
+    timerStart = perf_counter_ns()
+    controller.reorderShapes()
+    reorderTime = (perf_counter_ns() - timerStart) / 1e6
+
+    after = runBenchmarks(controller, centers, worldSize, args.operations, args.seed)
+
+    print(f"{len(centers)} shapes, backend {args.backend}, reordering took {reorderTime:.1f} ms")
+    print(f"{'benchmark':<12}{'before, op/s':>16}{'after, op/s':>16}{'gain':>10}")
+
+    for name in before:
+        print(f"{name:<12}{before[name]:>16.1f}{after[name]:>16.1f}{after[name] / before[name]:>9.2f}x")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as reportFile:
+            json.dump({"shapes": len(centers), "backend": args.backend, "reorder_ms": reorderTime, "before": before, "after": after}, reportFile, indent=4)
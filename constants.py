@@ -6,13 +6,124 @@ MAIN_WINDOW_START_POSITION_Y = 100
 MAIN_WINDOW_SIZE_X = 500
 MAIN_WINDOW_SIZE_Y = 500
 
+WORLD_SIZE_X = 100000
+WORLD_SIZE_Y = 100000
+
+VIEW_ZOOM_MIN = 0.002
+VIEW_ZOOM_MAX = 8.0
+VIEW_ZOOM_STEP = 1.25
+VIEW_SCROLL_STEP_PX = 60
+
+LOD_CELL_SIZE_PX = 4
+
+BACKGROUND_RENDERING_ENABLED = False
+TILE_CACHE_ENABLED = True
+TILE_SIZE_PX = 256
+TILE_CACHE_MEMORY_BUDGET_MB = 64
+
 RECT_SIZE_X = 100
 RECT_SIZE_Y = 50
 RECT_DEFAULT_COLOR = Qt.GlobalColor.black
 
+SHAPE_COLOR_TABLE = (Qt.GlobalColor.red,
+                     Qt.GlobalColor.green,
+                     Qt.GlobalColor.blue,
+                     Qt.GlobalColor.yellow)
+
+LINK_HIT_TOLERANCE_PX = 4
+LINK_INDEX_CELL_SIZE = 256
+LINK_BATCH_MIN_COUNT = 64
+LINK_SELECTED_COLOR = Qt.GlobalColor.cyan
+LINK_SELECTED_WIDTH = 3
+
+GROUP_FRAME_COLOR = Qt.GlobalColor.darkBlue
+
+DRAG_FRAME_INTERVAL_MS = 16
+
+ANIMATION_FRAME_INTERVAL_MS = 16
+ANIMATION_ORBIT_RADIUS = 30
+ANIMATION_ORBIT_PERIOD_FRAMES = 120
+
+BOX_BATCH_MIN_COUNT = 64
+RELOCATE_DIRTY_CELL_SIZE = 8192
+
+FREE_POSITION_MAX_SEARCH_DISTANCE = 5000
+
+ADAPTIVE_INDEX_ENABLED = True
+ADAPTIVE_INDEX_MIN_SHAPES = 1000
+ADAPTIVE_INDEX_CHECK_INTERVAL = 1000
+ADAPTIVE_INDEX_MAX_SAME_X_RATIO = 0.5
+ADAPTIVE_INDEX_MAX_WIDTH_RATIO = 50
+ADAPTIVE_INDEX_MAX_SCAN_LENGTH = 200
+ADAPTIVE_INDEX_MIGRATION_CHUNK = 2000
+ADAPTIVE_INDEX_GRID_CELL_SIZE_RATIO = 2
+GRID_INDEX_CELL_SIZE = 256
+
+HILBERT_ORDER_ENABLED = False
+HILBERT_ORDER_IDLE_INTERVAL_MS = 500
+HILBERT_ORDER_MIN_CHANGES = 1000
+HILBERT_ORDER_CHUNK = 5000
+HILBERT_ORDER_CURVE_ORDER = 10
+
+BENCHMARK_SHAPES_COUNT = 100000
+BENCHMARK_OPERATIONS_COUNT = 20000
+
+STRESS_OPERATIONS = 1000000
+STRESS_ROUND_LENGTH = 2000
+STRESS_CHECK_INTERVAL = 10
+STRESS_WORLD_SIZE = 2000
+STRESS_COORDINATE_STEP = 10
+STRESS_ADAPTIVE_MIN_SHAPES = 20
+STRESS_ADAPTIVE_CHECK_INTERVAL = 50
+STRESS_ADAPTIVE_MIGRATION_CHUNK = 8
+STRESS_FAILURE_FILE = "stress_failure.jsonl"
+
+ROUTE_MARGIN = 10
+ROUTE_SEARCH_MARGIN = 200
+ROUTE_BEND_PENALTY = 50
+ROUTE_GRID_CELL_SIZE = 512
+ROUTE_OBSTACLE_CELL_SIZE = 64
+ROUTE_MAX_OBSTACLES = 300
+ROUTE_MAX_EXPANSIONS = 5000
+
+INGESTION_FRAME_INTERVAL_MS = 16
+INGESTION_FRAME_BUDGET_MS = 8
+INGESTION_MAX_MESSAGES_PER_FRAME = 5000
+INGESTION_MAX_PENDING_MESSAGES = 20000
+
 ADD_RECT_BUTTON = "New rect"
+ADD_ELLIPSE_BUTTON = "New ellipse"
+ADD_POLYGON_BUTTON = "New hexagon"
 ADD_LINK_BUTTON = "New link"
+ROUTED_LINKS_BUTTON = "Routed links"
+
+FREE_POSITION_BUTTON = "Find free place"
 
 MOVE_SHAPE_BUTTON = "Move shape"
+MOVE_CONNECTED_BUTTON = "Move connected"
+DELETE_REGION_BUTTON = "Delete in area"
+ANIMATE_BUTTON = "Animate"
+GROUP_BUTTON = "Group in area"
+UNGROUP_BUTTON = "Ungroup"
+
+CLEAR_DRAW_AREA_BUTTON = "Clear"
+SAVE_SCENE_BUTTON = "Save"
+LOAD_SCENE_BUTTON = "Load"
+EXPORT_BUTTON = "Export"
+RESET_VIEW_BUTTON = "Reset view"
+
+PERFORMANCE_OVERLAY_BUTTON = "Perf overlay"
+DUMP_METRICS_BUTTON = "Dump metrics"
+TRACE_RECORD_BUTTON = "Record trace"
+
+SCENE_FILE = "scene.json"
+SCENE_FILE_SAVE_INDEX = True
+
+EXPORT_DIRECTORY = "export"
+EXPORT_SCALE = 1.0
+EXPORT_TILE_SIZE_PX = 512
+EXPORT_MAX_IMAGE_SIZE_PX = 4096
 
-CLEAR_DRAW_AREA_BUTTON = "Clear"
\ No newline at end of file
+PERFORMANCE_OVERLAY_WIDTH = 220
+PERFORMANCE_METRICS_FILE = "performance_metrics.json"
+TRACE_FILE = "event_trace.jsonl"
\ No newline at end of file
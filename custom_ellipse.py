@@ -0,0 +1,76 @@
+from typing import List
+
+from PyQt5.QtGui import QPainter, QColor
+from PyQt5.QtCore import QPoint, QRect
+
+from custom_rect import CustomRectRandomColorFactory
+from custom_shape import CustomShape
+from narrow_phase import checkShapesIntersection
+from shape_style import SHAPE_STYLES
+
+# Axis-aligned ellipse inscribed into its bounding box
+class CustomEllipse(CustomShape):
+    def __init__(self, centerPoint: QPoint, styleId: int) -> None:
+        # Bounding box is positioned by QRect itself, same as rectangle
+        self._geometryObject = QRect(QPoint(0, 0), SHAPE_STYLES.getStyle(styleId).size)
+        self._geometryObject.moveCenter(centerPoint)
+        super().__init__(centerPoint, self._geometryObject, styleId)
+
+        # Collision geometry is built on demand and dropped on move
+        self._collisionEllipse: tuple = None
+
+    @property
+    def color(self) -> QColor:
+        return self.style.color
+
+    def setNewCenterPoint(self, point: QPoint) -> None:
+        self._centerPoint = point
+        self._geometryObject.moveCenter(self._centerPoint)
+        self._collisionEllipse = None
+
+    # Center points and rectangles are changed in place, see CustomShape.moveCentersBatch
+    @classmethod
+    def moveCentersBatch(cls, shapes: List["CustomEllipse"], centersX: List[int], centersY: List[int]) -> None:
+        CustomShape._moveGeometryRectsInPlace(shapes, centersX, centersY)
+
+        for shape in shapes:
+            shape._collisionEllipse = None
+
+    def copy(self) -> "CustomEllipse":
+        return CustomEllipse(QPoint(self._centerPoint), self._styleId)
+
+    # Ellipse touches middles of bounding box sides
+    def getLinkPoint(self, shape: CustomShape) -> QPoint:
+        return self._getBoundingBoxLinkPoint(shape)
+
+    def drawGeometry(self, painter: QPainter) -> None:
+        painter.drawEllipse(self._geometryObject)
+
+    def checkIntersectionBoundary(self, shape: CustomShape) -> bool:
+        return self._boundingBox.intersects(shape.boundingBox)
+
+    def checkIntersectionPrecise(self, shape: CustomShape) -> bool:
+        return checkShapesIntersection(self, shape)
+
+    # Pixel is on ellipse if its center is inside ellipse
+    def isPointOnShape(self, point: QPoint) -> bool:
+        if not self._geometryObject.contains(point):
+            return False
+
+        center_x, center_y, radius_x, radius_y = self.getCollisionEllipse()
+
+        return ((point.x() + 0.5 - center_x) / radius_x) ** 2 + ((point.y() + 0.5 - center_y) / radius_y) ** 2 <= 1
+
+    def getCollisionEllipse(self) -> tuple:
+        if self._collisionEllipse is None:
+            radius_x = self._geometryObject.width() / 2
+            radius_y = self._geometryObject.height() / 2
+
+            self._collisionEllipse = (self._geometryObject.left() + radius_x, self._geometryObject.top() + radius_y, radius_x, radius_y)
+
+        return self._collisionEllipse
+
+# Factory which produces ellipses with random colors from the same color table and of the same default size as rectangles
+class CustomEllipseRandomColorFactory(CustomRectRandomColorFactory):
+    def getNewCustomShape(self, centerPoint: QPoint) -> CustomEllipse:
+        return CustomEllipse(centerPoint, self._getRandomStyleId())
@@ -0,0 +1,117 @@
+from typing import Dict, Iterator, List
+
+from PyQt5.QtGui import QPainter, QPen
+from PyQt5.QtCore import Qt, QPoint, QRect, QSize
+
+import constants
+from custom_shape import CustomShape
+from narrow_phase import checkShapesIntersection
+from shape_style import SHAPE_STYLES
+
+# Group of shapes and links between them, which behaves as a single shape
+#
+# Group is stored in shapes collection as single entry with aggregated bounding box,
+# so moving the group is one collection update instead of update of every child
+# Hit tests, collision checks and drawing descend into children only when their bounding boxes are touched
+# Groups could contain other groups
+class CustomGroup(CustomShape):
+    def __init__(self, childShapes: List[CustomShape], links: List = None) -> None:
+        self._childShapes = list(childShapes)
+        # Links between shapes of the group, they move and are deleted together with the group
+        self._links = list(links or [])
+
+        boundingBox = QRect(self._childShapes[0].boundingBox)
+        for child in self._childShapes[1:]:
+            boundingBox = boundingBox.united(child.boundingBox)
+
+        super().__init__(boundingBox.center(), boundingBox, SHAPE_STYLES.getStyleId(constants.GROUP_FRAME_COLOR, QSize()))
+
+        for child in self._childShapes:
+            child._parentGroup = self
+
+    @property
+    def childShapes(self) -> List[CustomShape]:
+        return self._childShapes
+
+    @property
+    def links(self) -> List:
+        return self._links
+
+    def iterShapeTree(self) -> Iterator[CustomShape]:
+        yield self
+
+        for child in self._childShapes:
+            yield from child.iterShapeTree()
+
+    # Children are moved by the same offset, bounding box is moved instead of recalculation
+    def setNewCenterPoint(self, point: QPoint) -> None:
+        delta_x = point.x() - self._centerPoint.x()
+        delta_y = point.y() - self._centerPoint.y()
+
+        for child in self._childShapes:
+            child.setNewCenterPoint(QPoint(child.centerPoint.x() + delta_x, child.centerPoint.y() + delta_y))
+
+        self._centerPoint = point
+        self._boundingBox.translate(delta_x, delta_y)
+
+    # Children and links are copied as well, copied links connect copied children
+    def copy(self) -> "CustomGroup":
+        copies: Dict[CustomShape, CustomShape] = {}
+        childCopies = [child.copy() for child in self._childShapes]
+
+        for child, childCopy in zip(self._childShapes, childCopies):
+            copies.update(zip(child.iterShapeTree(), childCopy.iterShapeTree()))
+
+        return CustomGroup(childCopies, [link.copyWithShapes(copies[link._shape1], copies[link._shape2]) for link in self._links])
+
+    # Releases children, after that they are top-level shapes
+    def ungroup(self) -> List[CustomShape]:
+        for child in self._childShapes:
+            child._parentGroup = None
+
+        return self._childShapes
+
+    def getLinkPoint(self, shape: CustomShape) -> QPoint:
+        return self._getBoundingBoxLinkPoint(shape)
+
+    # Group with everything inside of it: children first, then links and frame on top
+    def drawCustomShape(self, painter: QPainter) -> None:
+        for child in self._childShapes:
+            child.drawCustomShape(painter)
+
+        for link in self._links:
+            link.drawLink(painter)
+
+        self.drawGeometry(painter)
+
+    # Group itself is only a dashed frame around children
+    def drawGeometry(self, painter: QPainter) -> None:
+        painter.setPen(QPen(self.style.color, 0, Qt.PenStyle.DashLine))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRect(self._boundingBox)
+
+    def checkIntersectionBoundary(self, shape: CustomShape) -> bool:
+        return self._boundingBox.intersects(shape.boundingBox)
+
+    def checkIntersectionPrecise(self, shape: CustomShape) -> bool:
+        return checkShapesIntersection(self, shape)
+
+    # Point is on the group if it is on any child, only children which bounding boxes contain the point are checked
+    def isPointOnShape(self, point: QPoint) -> bool:
+        if not self._boundingBox.contains(point):
+            return False
+
+        return any(child.boundingBox.contains(point) and child.isPointOnShape(point) for child in self._childShapes)
+
+# Replaces groups with their children visible in rect, nested groups are expanded the same way
+# Groups themselves stay in result to draw their frames
+def expandGroupsInRect(shapes: List[CustomShape], rect: QRect) -> List[CustomShape]:
+    result = []
+
+    for shape in shapes:
+        result.append(shape)
+
+        if shape.childShapes:
+            result.extend(expandGroupsInRect([child for child in shape.childShapes if child.boundingBox.intersects(rect)], rect))
+
+    return result
@@ -0,0 +1,117 @@
+from typing import Dict, List
+
+from PyQt5.QtGui import QPainter, QColor, QPolygonF
+from PyQt5.QtCore import QPoint, QPointF, QRect
+
+from custom_rect import CustomRectRandomColorFactory
+from custom_shape import CustomShape
+from narrow_phase import CollisionPolygon, checkShapesIntersection
+from shape_style import SHAPE_STYLES
+
+# Convex polygon inscribed into its bounding box
+# Vertices are defined in bounding box relative coordinates: (0, 0) is top-left corner, (1, 1) - bottom-right one
+class CustomPolygon(CustomShape):
+    # Hexagon with horizontal top and bottom edges, it touches middles of all bounding box sides
+    HEXAGON_VERTICES = ((0.0, 0.5), (0.25, 0.0), (0.75, 0.0), (1.0, 0.5), (0.75, 1.0), (0.25, 1.0))
+
+    # Separating axes depend only on vertices and size, so they are shared by polygons of the same form and style
+    _collisionAxesCache: Dict[tuple, List[tuple]] = {}
+
+    def __init__(self, centerPoint: QPoint, styleId: int, relativeVertices: tuple = HEXAGON_VERTICES) -> None:
+        self._relativeVertices = relativeVertices
+
+        # Bounding box is positioned by QRect itself, same as rectangle
+        self._geometryObject = QRect(QPoint(0, 0), SHAPE_STYLES.getStyle(styleId).size)
+        self._geometryObject.moveCenter(centerPoint)
+        super().__init__(centerPoint, self._geometryObject, styleId)
+
+        # Vertices positions are built on demand and dropped on move
+        self._collisionPolygon: CollisionPolygon = None
+
+    @property
+    def color(self) -> QColor:
+        return self.style.color
+
+    # Vertices relative to bounding box, from 0 to 1 on each axis
+    @property
+    def relativeVertices(self) -> tuple:
+        return self._relativeVertices
+
+    def setNewCenterPoint(self, point: QPoint) -> None:
+        self._centerPoint = point
+        self._geometryObject.moveCenter(self._centerPoint)
+        self._collisionPolygon = None
+
+    # Center points and rectangles are changed in place, see CustomShape.moveCentersBatch
+    @classmethod
+    def moveCentersBatch(cls, shapes: List["CustomPolygon"], centersX: List[int], centersY: List[int]) -> None:
+        CustomShape._moveGeometryRectsInPlace(shapes, centersX, centersY)
+
+        for shape in shapes:
+            shape._collisionPolygon = None
+
+    def copy(self) -> "CustomPolygon":
+        return CustomPolygon(QPoint(self._centerPoint), self._styleId, self._relativeVertices)
+
+    # Link point is placed on bounding box, polygon should touch middles of its sides (e.g. hexagon) for link to touch the shape
+    def getLinkPoint(self, shape: CustomShape) -> QPoint:
+        return self._getBoundingBoxLinkPoint(shape)
+
+    def drawGeometry(self, painter: QPainter) -> None:
+        painter.drawPolygon(QPolygonF([QPointF(x, y) for x, y in self.getCollisionPolygon().vertices]))
+
+    def checkIntersectionBoundary(self, shape: CustomShape) -> bool:
+        return self._boundingBox.intersects(shape.boundingBox)
+
+    def checkIntersectionPrecise(self, shape: CustomShape) -> bool:
+        return checkShapesIntersection(self, shape)
+
+    # Pixel is on polygon if its center is on the inner side of every edge
+    def isPointOnShape(self, point: QPoint) -> bool:
+        if not self._geometryObject.contains(point):
+            return False
+
+        x = point.x() + 0.5
+        y = point.y() + 0.5
+        vertices = self.getCollisionPolygon().vertices
+
+        hasPositive = False
+        hasNegative = False
+
+        for index, (x_1, y_1) in enumerate(vertices):
+            x_2, y_2 = vertices[(index + 1) % len(vertices)]
+            cross = (x_2 - x_1) * (y - y_1) - (y_2 - y_1) * (x - x_1)
+
+            hasPositive = hasPositive or cross > 0
+            hasNegative = hasNegative or cross < 0
+
+        return not (hasPositive and hasNegative)
+
+    def getCollisionPolygon(self) -> CollisionPolygon:
+        if self._collisionPolygon is None:
+            vertices = self.__getVertices()
+
+            axesKey = (self._relativeVertices, self._styleId)
+            axes = CustomPolygon._collisionAxesCache.get(axesKey)
+
+            if axes is None:
+                axes = CollisionPolygon.getAxes(vertices)
+                CustomPolygon._collisionAxesCache[axesKey] = axes
+
+            self._collisionPolygon = CollisionPolygon(vertices, axes)
+
+        return self._collisionPolygon
+
+    # Vertices in world coordinates
+    def __getVertices(self) -> List[tuple]:
+        left = self._geometryObject.left()
+        top = self._geometryObject.top()
+        width = self._geometryObject.width()
+        height = self._geometryObject.height()
+
+        return [(left + x * width, top + y * height) for x, y in self._relativeVertices]
+
+# Factory which produces hexagons with random colors from the same color table and of the same default size as rectangles
+class CustomPolygonRandomColorFactory(CustomRectRandomColorFactory):
+    def getNewCustomShape(self, centerPoint: QPoint) -> CustomPolygon:
+        return CustomPolygon(centerPoint, self._getRandomStyleId())
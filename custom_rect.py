@@ -1,23 +1,30 @@
 from random import randint
 from math import ceil
+from typing import List
 
 from PyQt5.QtGui import QPainter, QColor
-from PyQt5.QtCore import Qt, QPoint, QRect, QSize
+from PyQt5.QtCore import QPoint, QRect, QSize
 
 import constants
 from custom_shape import CustomShape, CustomShapeBaseFactory
+from narrow_phase import CollisionPolygon, checkShapesIntersection
+from shape_style import SHAPE_STYLES
 
-# CustomRect has additional Color property
+# CustomRect has additional Color property, color and size are defined by style
 class CustomRect(CustomShape):
-    def __init__(self, centerPoint: QPoint, size: QSize, color: QColor) -> None:
-        self._size = size
-        self._color = color
-        self._geometryObject = QRect(CustomRect.__calculateAnchorPoint(centerPoint, size), self._size)
-        super().__init__(centerPoint, self._geometryObject)
+    # Separating axes are the same for all rectangles
+    COLLISION_AXES = [(1.0, 0.0), (0.0, 1.0)]
+
+    def __init__(self, centerPoint: QPoint, styleId: int) -> None:
+        size = SHAPE_STYLES.getStyle(styleId).size
+        # Collision geometry is built on demand and dropped on move
+        self._collisionPolygon: CollisionPolygon = None
+        self._geometryObject = QRect(CustomRect.__calculateAnchorPoint(centerPoint, size), size)
+        super().__init__(centerPoint, self._geometryObject, styleId)
 
     @property
     def color(self) -> QColor:
-        return self._color
+        return self.style.color
 
     # Internal method to calculate top-left corner of rectangle based on provided center point
     def __calculateAnchorPoint(centerPoint: QPoint, size: QSize) -> QPoint:
@@ -31,68 +38,55 @@ class CustomRect(CustomShape):
     def setNewCenterPoint(self, point: QPoint) -> None:
         self._centerPoint = point
         self._geometryObject.moveCenter(self._centerPoint)
+        self._collisionPolygon = None
+
+    # Center points and rectangles are changed in place, see CustomShape.moveCentersBatch
+    @classmethod
+    def moveCentersBatch(cls, shapes: List["CustomRect"], centersX: List[int], centersY: List[int]) -> None:
+        CustomShape._moveGeometryRectsInPlace(shapes, centersX, centersY)
+
+        for shape in shapes:
+            shape._collisionPolygon = None
+
+    # Returns independent copy of rectangle
+    def copy(self) -> "CustomRect":
+        return CustomRect(QPoint(self._centerPoint), self._styleId)
 
     # Returns optimal point to start the link to specified shape
     def getLinkPoint(self, shape: CustomShape) -> QPoint:
-        linkPoint = QPoint()
-
-        # Initially deltas between shape borders are 0
-        borderDeltaX = 0
-        borderDeltaY = 0
-
-        # Calculate delta between closest vertical borders of shapes
-        # if closest vertical border of shape 2 is located between left and right borders of current shape - delta is 0
-        if shape.centerPoint.x() > self.centerPoint.x():
-            if shape.getBottomLeftBound().x() > self.getBottomRightBound().x():
-                borderDeltaX = shape.getBottomLeftBound().x() - self.getBottomRightBound().x()
-        else:
-            if shape.getBottomRightBound().x() < self.getBottomLeftBound().x():
-                borderDeltaX = shape.getBottomRightBound().x() - self.getBottomLeftBound().x()
-
-        # Same calculation for vertical borders
-        if shape.centerPoint.y() > self.centerPoint.y():
-            if shape.getTopRightBound().y() > self.getBottomRightBound().y():
-                borderDeltaY = shape.getTopRightBound().y() - self.getBottomRightBound().y()
-        else:
-            if shape.getBottomRightBound().y() < self.getTopRightBound().y():
-                borderDeltaY = shape.getBottomRightBound().y() - self.getTopRightBound().y()
-
-        # Select biggest delta to make angle between edge and link as close to 90 degrees as possible
-        if abs(borderDeltaX) > abs(borderDeltaY):
-            # If biggest delta is on X, then plase the point in the middle of side enge usin center point's Y coord
-            linkPoint.setY(self._centerPoint.y())
-
-            # Place point on closest side to target shape
-            if borderDeltaX > 0:
-                linkPoint.setX(self.getBottomRightBound().x())
-            else:
-                linkPoint.setX(self.getBottomLeftBound().x())
-        
-        # Same for other axis
-        else:
-            linkPoint.setX(self._centerPoint.x())
-
-            if borderDeltaY > 0:
-                linkPoint.setY(self.getBottomRightBound().y())
-            else:
-                linkPoint.setY(self.getTopRightBound().y())
-
-        return linkPoint
-
-    # Draw shape - for CustomRect it is just a rectangle without borders and with specific fill color
-    def drawCustomShape(self, painter: QPainter) -> None:
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(self.color)
+        return self._getBoundingBoxLinkPoint(shape)
+
+    # Draw shape - for CustomRect it is just a rectangle, borders and fill are defined by style
+    def drawGeometry(self, painter: QPainter) -> None:
         painter.drawRect(self._geometryObject)
 
+    # All rectangles of the group are passed to painter at once
+    @classmethod
+    def drawGeometryBatch(cls, painter: QPainter, shapes: List["CustomRect"]) -> None:
+        painter.drawRects([shape._geometryObject for shape in shapes])
+
     # Boundary intersection check
     def checkIntersectionBoundary(self, shape: CustomShape) -> bool:
         return self._boundingBox.intersects(shape.boundingBox)
     
     # Precise intersection check
-    # TODO: For now it is simplified to be same as boundary
+    # Rectangle is its own bounding box, so intersection with other rectangle is boundary check
     def checkIntersectionPrecise(self, shape: CustomShape) -> bool:
-        return self._boundingBox.intersects(shape.boundingBox)
+        if isinstance(shape, CustomRect):
+            return self._boundingBox.intersects(shape.boundingBox)
+
+        return checkShapesIntersection(self, shape)
+
+    def getCollisionPolygon(self) -> CollisionPolygon:
+        if self._collisionPolygon is None:
+            left = self._boundingBox.left()
+            top = self._boundingBox.top()
+            right = self._boundingBox.right() + 1
+            bottom = self._boundingBox.bottom() + 1
+
+            self._collisionPolygon = CollisionPolygon([(left, top), (right, top), (right, bottom), (left, bottom)], CustomRect.COLLISION_AXES)
+
+        return self._collisionPolygon
 
     # Check if point is located on shape
     def isPointOnShape(self, point: QPoint) -> bool:
@@ -103,26 +97,25 @@ class CustomRect(CustomShape):
 class CustomRectBaseFactory(CustomShapeBaseFactory):
     def __init__(self) -> None:
         self._defaultSize: QSize = QSize(constants.RECT_SIZE_X, constants.RECT_SIZE_Y)
-        self.__defaultColor: QColor = constants.RECT_DEFAULT_COLOR
+        self.__defaultStyleId: int = SHAPE_STYLES.getStyleId(constants.RECT_DEFAULT_COLOR, self._defaultSize)
         super().__init__()
 
     def getNewCustomRect(self, centerPoint: QPoint, size: QSize, color: QColor) -> CustomRect:
-        return CustomRect(centerPoint, size, color)
+        return CustomRect(centerPoint, SHAPE_STYLES.getStyleId(color, size))
     
     def getNewCustomShape(self, centerPoint: QPoint) -> CustomRect:
-        return CustomRect(centerPoint, self._defaultSize, self.__defaultColor)
+        return CustomRect(centerPoint, self.__defaultStyleId)
     
-# Factory which produces rectangles with random colors
-# TODO: Make color table configurable
+# Factory which produces rectangles with random colors from color table
+# Styles for all colors are registered once, new shapes only get style id
 class CustomRectRandomColorFactory(CustomRectBaseFactory):
-    def __init__(self) -> None:
-        self.__colorTable = (Qt.GlobalColor.red,
-                             Qt.GlobalColor.green,
-                             Qt.GlobalColor.blue,
-                             Qt.GlobalColor.yellow)
+    def __init__(self, colorTable: tuple = constants.SHAPE_COLOR_TABLE) -> None:
         super().__init__()
+        self.__styleIds = tuple(SHAPE_STYLES.getStyleId(color, self._defaultSize) for color in colorTable)
 
     # Instead of default color returns random color, still uses default size
     def getNewCustomShape(self, centerPoint: QPoint) -> CustomRect:
-        color = self.__colorTable[randint(0, len(self.__colorTable) - 1)]
-        return CustomRect(centerPoint, self._defaultSize, color)
\ No newline at end of file
+        return CustomRect(centerPoint, self._getRandomStyleId())
+
+    def _getRandomStyleId(self) -> int:
+        return self.__styleIds[randint(0, len(self.__styleIds) - 1)]
\ No newline at end of file
@@ -1,18 +1,28 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from operator import attrgetter
+
+from typing import Iterator, List
 
 from PyQt5.QtGui import QPainter
 from PyQt5.QtCore import QPoint, QRect
 
+from shape_style import SHAPE_STYLES, ShapeStyle
+
 # Base class for all shapes being drawn
 # Should have:
 # - Center point as it's defining point
 # - Boundary rect will be used to calculate collisions for different shapes
+# - Style id - index in shared styles table, which defines shape's color and size
+# Shapes could be combined into groups (see CustomGroup), grouped shape knows its group
 class CustomShape(ABC):
     @abstractmethod
-    def __init__(self, centerPoint: QPoint, boundingBox: QRect) -> None:
+    def __init__(self, centerPoint: QPoint, boundingBox: QRect, styleId: int) -> None:
         super().__init__()
         self._centerPoint = centerPoint
         self._boundingBox = boundingBox
+        self._styleId = styleId
+        self._parentGroup: "CustomShape" = None
         
     @property
     def centerPoint(self) -> QPoint:
@@ -21,21 +31,126 @@ class CustomShape(ABC):
     @property
     def boundingBox(self) -> QRect:
         return self._boundingBox
+
+    @property
+    def styleId(self) -> int:
+        return self._styleId
+
+    @property
+    def style(self) -> ShapeStyle:
+        return SHAPE_STYLES.getStyle(self._styleId)
+
+    # Group containing the shape or None for top-level shape
+    @property
+    def parentGroup(self) -> "CustomShape":
+        return self._parentGroup
+
+    # Shapes inside of the shape, only groups have them
+    @property
+    def childShapes(self) -> List["CustomShape"]:
+        return []
+
+    # Iterates the shape and all shapes inside of it
+    def iterShapeTree(self) -> Iterator["CustomShape"]:
+        yield self
     
     @abstractmethod
     def setNewCenterPoint(self, point: QPoint) -> None:
         pass
 
+    # Returns independent copy of the shape, e.g. to be used by other threads
+    @abstractmethod
+    def copy(self) -> "CustomShape":
+        pass
+
     # Returns optimal point on shape to position link to specified shape
     @abstractmethod
     def getLinkPoint(self, shape: "CustomShape") -> QPoint:
         pass
 
+    # Link point in the middle of bounding box side closest to specified shape
+    # Suitable for any shape which touches middles of its bounding box sides (rectangle, ellipse, etc.)
+    def _getBoundingBoxLinkPoint(self, shape: "CustomShape") -> QPoint:
+        linkPoint = QPoint()
+
+        # Initially deltas between shape borders are 0
+        borderDeltaX = 0
+        borderDeltaY = 0
+
+        # Calculate delta between closest vertical borders of shapes
+        # if closest vertical border of shape 2 is located between left and right borders of current shape - delta is 0
+        if shape.centerPoint.x() > self.centerPoint.x():
+            if shape.getBottomLeftBound().x() > self.getBottomRightBound().x():
+                borderDeltaX = shape.getBottomLeftBound().x() - self.getBottomRightBound().x()
+        else:
+            if shape.getBottomRightBound().x() < self.getBottomLeftBound().x():
+                borderDeltaX = shape.getBottomRightBound().x() - self.getBottomLeftBound().x()
+
+        # Same calculation for vertical borders
+        if shape.centerPoint.y() > self.centerPoint.y():
+            if shape.getTopRightBound().y() > self.getBottomRightBound().y():
+                borderDeltaY = shape.getTopRightBound().y() - self.getBottomRightBound().y()
+        else:
+            if shape.getBottomRightBound().y() < self.getTopRightBound().y():
+                borderDeltaY = shape.getBottomRightBound().y() - self.getTopRightBound().y()
+
+        # Select biggest delta to make angle between edge and link as close to 90 degrees as possible
+        if abs(borderDeltaX) > abs(borderDeltaY):
+            # If biggest delta is on X, then plase the point in the middle of side enge usin center point's Y coord
+            linkPoint.setY(self._centerPoint.y())
+
+            # Place point on closest side to target shape
+            if borderDeltaX > 0:
+                linkPoint.setX(self.getBottomRightBound().x())
+            else:
+                linkPoint.setX(self.getBottomLeftBound().x())
+        
+        # Same for other axis
+        else:
+            linkPoint.setX(self._centerPoint.x())
+
+            if borderDeltaY > 0:
+                linkPoint.setY(self.getBottomRightBound().y())
+            else:
+                linkPoint.setY(self.getTopRightBound().y())
+
+        return linkPoint
+
     # Draws the shape using specified QPainter
-    @abstractmethod
     def drawCustomShape(self, painter: QPainter) -> None:
+        SHAPE_STYLES.getStyle(self._styleId).applyToPainter(painter)
+        self.drawGeometry(painter)
+
+    # Draws the shape with pen and brush painter is already set to
+    @abstractmethod
+    def drawGeometry(self, painter: QPainter) -> None:
         pass
 
+    # Draws several shapes of this type with pen and brush painter is already set to
+    # Shape types could override it to draw the whole group with single painter call
+    @classmethod
+    def drawGeometryBatch(cls, painter: QPainter, shapes: List["CustomShape"]) -> None:
+        for shape in shapes:
+            shape.drawGeometry(painter)
+
+    # Moves several shapes of this type to new centers, e.g. all shapes of one animation frame
+    # Shape types could override it to change center points of shapes in place instead of creating new points,
+    # which is the most expensive part of moving many shapes, so caller should make sure shapes own their center points
+    @classmethod
+    def moveCentersBatch(cls, shapes: List["CustomShape"], centersX: List[int], centersY: List[int]) -> None:
+        for shape, x, y in zip(shapes, centersX, centersY):
+            shape.setNewCenterPoint(QPoint(x, y))
+
+    # Changes center points of shapes in place and moves geometry rects of shapes to them, for overrides of moveCentersBatch
+    # Methods are mapped over all shapes, so there is no Python loop
+    @staticmethod
+    def _moveGeometryRectsInPlace(shapes: List["CustomShape"], centersX: List[int], centersY: List[int]) -> None:
+        centerPoints = list(map(attrgetter("_centerPoint"), shapes))
+
+        deque(map(QPoint.setX, centerPoints, centersX), 0)
+        deque(map(QPoint.setY, centerPoints, centersY), 0)
+        deque(map(QRect.moveCenter, map(attrgetter("_geometryObject"), shapes), centerPoints), 0)
+
     # These methods return points defining boundary rect of shape
     def getTopLeftBound(self) -> QPoint:
         return self._boundingBox.topLeft()
@@ -59,6 +174,16 @@ class CustomShape(ABC):
     def checkIntersectionPrecise(self, shape: "CustomShape") -> bool:
         pass
 
+    # Geometry used by precise intersection checks, in continuous world coordinates
+    # Pixel (x, y) of bounding box covers area from x to x + 1 and from y to y + 1
+    # Polygonal shapes return convex polygon and no ellipse, curved shapes - vice versa
+    def getCollisionPolygon(self) -> "CollisionPolygon":
+        return None
+
+    # Returns (center x, center y, radius x, radius y) of axis-aligned ellipse
+    def getCollisionEllipse(self) -> tuple:
+        return None
+
     # This method checks if specific point is located on the shape
     @abstractmethod
     def isPointOnShape(self, point: QPoint) -> bool:
@@ -1,19 +1,36 @@
-from typing import Union, List
+import random
+import sys
+import threading
+from typing import Callable, Union, List
 from enum import Enum, auto
 
 from PyQt5 import QtWidgets
-from PyQt5.QtGui import QMouseEvent, QPaintEvent, QPainter
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtWidgets import QAction
+from PyQt5.QtGui import QMouseEvent, QPaintEvent, QPainter, QColor, QWheelEvent, QKeyEvent
+from PyQt5.QtCore import Qt, QPoint, QRect, QSize, QTimer
 
+import constants
+from animation_engine import AnimationEngine, orbitTrajectory
+from custom_ellipse import CustomEllipseRandomColorFactory
+from custom_polygon import CustomPolygonRandomColorFactory
 from custom_rect import CustomRectRandomColorFactory
+from custom_shape import CustomShapeBaseFactory
+from event_trace import EventTraceRecorder
+from performance_monitor import PERF_MONITOR
 
 from shapes_link import ShapesLinkBase, ShapesLinkLine
 from geometry_controller import GeometryController
+from ingestion_server import IngestionServer
+from render_worker import BackgroundRenderer, RenderJob
+from scene_file import readSceneFile, writeSceneFile
+from scene_export import SceneExporter
+from tile_cache import TileCache
+from view_transform import ViewTransform
 
 class DrawAreaActions(Enum):
     NO_ACTION = auto()
     DELETE_SHAPE = auto()
-    CREATE_RECT_AT_POINT = auto()
+    CREATE_SHAPE_AT_POINT = auto()
     SELECT_FOR_LINKING_LMB = auto()
     CREATE_LINK_LMB = auto()
     CREATE_LINK_MMB = auto()
@@ -21,22 +38,83 @@ class DrawAreaActions(Enum):
     MOVE_TO_POINT = auto()
     SHAPE_SELECTED_FOR_DRAG = auto()
     SHAPE_DRAG = auto()
+    SELECT_REGION = auto()
+    REGION_DRAG = auto()
+    UNGROUP_SHAPE = auto()
 
 class DrawArea(QtWidgets.QWidget):
     def __init__(self, parent: QtWidgets.QWidget = None, flags: Union[Qt.WindowFlags, Qt.WindowType] = Qt.WindowFlags()) -> None:
         super().__init__(parent, flags)
 
+        # World is bigger than draw area, draw area shows part of it with zoom and pan
+        self._viewTransform = ViewTransform(QSize(constants.WORLD_SIZE_X, constants.WORLD_SIZE_Y))
+
         # Geometry controller handles shapes behavior logic
         self._geometryController = GeometryController(self)
 
+        # Scene could be rendered in background thread or from pre-rendered tiles
+        # In both cases selected shape is drawn on top separately
+        self._backgroundRenderer: BackgroundRenderer = None
+        self._tileCache: TileCache = None
+
+        if constants.BACKGROUND_RENDERING_ENABLED:
+            self._backgroundRenderer = BackgroundRenderer(self.__createRenderJob, self.update)
+            self._geometryController.addChangeListener(self._backgroundRenderer.changeListener)
+            QtWidgets.QApplication.instance().aboutToQuit.connect(self._backgroundRenderer.stop)
+        elif constants.TILE_CACHE_ENABLED:
+            self._tileCache = TileCache(lambda painter, rect, scale: self._geometryController.drawGeometryInRect(painter, rect, scale, False))
+            self._geometryController.addChangeListener(self._tileCache)
+
+        # Moves many shapes at once along trajectories
+        self._animationEngine = AnimationEngine(self._geometryController, self.update)
+
         # Creates rectangles with random colors
         self._customRectFactory = CustomRectRandomColorFactory()
+        # Factories for other shapes, they are used only from toolbar
+        self._customEllipseFactory = CustomEllipseRandomColorFactory()
+        self._customPolygonFactory = CustomPolygonRandomColorFactory()
+        # Factory used by shape creation with single click
+        self._creationFactory: CustomShapeBaseFactory = self._customRectFactory
+
+        # If enabled, dragged shape moves together with all shapes linked with it
+        self._moveConnected = False
+        # State of animation toggle, shapes present when it is switched on move along circles
+        self._animationEnabled = False
 
         # Last mouse position to keep it on the shape if it cannot be moved
         self._lastMousePos: QPoint = None
         # Current action being performed - it is used to determine what to do with click
         self._currentAction: DrawAreaActions = DrawAreaActions.NO_ACTION
 
+        # Corners of area selected by LMB drag, in world coordinates, and action applied to selected area
+        self._regionStart: QPoint = None
+        self._regionEnd: QPoint = None
+        self._regionAction: Callable[[QRect], object] = None
+
+        # Drag is processed once per display frame, mouse moves between frames are coalesced
+        self._pendingDragPos: QPoint = None
+        self._dragFrameTimer = QTimer(self)
+        self._dragFrameTimer.setInterval(constants.DRAG_FRAME_INTERVAL_MS)
+        self._dragFrameTimer.timeout.connect(self.__onDragFrame)
+
+        # Shapes collection is reordered along Hilbert curve by small steps in idle time
+        # While reordering is not finished, steps follow each other whenever event queue is empty
+        self._shapeOrderTimer = QTimer(self)
+        self._shapeOrderTimer.setInterval(constants.HILBERT_ORDER_IDLE_INTERVAL_MS)
+        self._shapeOrderTimer.timeout.connect(self.__onShapeOrderTimer)
+
+        if constants.HILBERT_ORDER_ENABLED:
+            self._shapeOrderTimer.start()
+
+        # Records processed input events to trace file when enabled
+        self._traceRecorder: EventTraceRecorder = None
+
+        # Performance overlay is drawn on top of geometry when enabled
+        self._showPerformanceOverlay = False
+
+        # Keyboard focus is needed to delete selected link with Delete key
+        self.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+
         # Set background color to gray
         # TODO: Configurable background?
         self.setAutoFillBackground(True)
@@ -46,10 +124,18 @@ class DrawArea(QtWidgets.QWidget):
 
     # Double click
     def mouseDoubleClickEvent(self, a0: QMouseEvent | None) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        if self._traceRecorder:
+            self._traceRecorder.recordMouseEvent("double_click", a0)
+
+        # Event position is converted to world coordinates
+        point = self._viewTransform.mapToWorld(a0.pos())
+
         match a0.button():
-            # Doubleclick with RMB - delete shape under cursor
+            # Doubleclick with RMB - delete shape under cursor, or link if there is no shape
             case Qt.MouseButton.RightButton:
-                self._geometryController.tryDeleteShapeAtPoint(a0.pos())
+                self.__deleteShapeOrLinkAtPoint(point)
                 self.update()
             
             # Doubleclick with LMB - create shape with center under cursor
@@ -57,70 +143,110 @@ class DrawArea(QtWidgets.QWidget):
                 # Doubleclick resets any started actions
                 self.__resetCurrentAction()
 
-                self._geometryController.tryCreateShape(a0.pos(), self._customRectFactory)
+                self._geometryController.tryCreateShape(point, self._customRectFactory)
                 self.update()
-        
+
+        self.__stopEventTimer("event.double_click", timerStart)
         return super().mouseDoubleClickEvent(a0)
     
     # Mouse button press
     def mousePressEvent(self, a0: QMouseEvent | None) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        if self._traceRecorder:
+            self._traceRecorder.recordMouseEvent("press", a0)
+
+        # Event position is converted to world coordinates
+        point = self._viewTransform.mapToWorld(a0.pos())
+
         # Save cursor position as global to handle keeping cursor on shape
         self._lastMousePos = a0.globalPos()
 
         match a0.button():
             case Qt.MouseButton.LeftButton:
-                clickedOnShape = self._geometryController.checkShapeAtPoint(a0.pos())
+                clickedOnShape = self._geometryController.checkShapeAtPoint(point)
 
                 match self._currentAction:
                     # If there were no actions, or user was creating link via MMB - try to switch to shape drag
                     case DrawAreaActions.NO_ACTION | DrawAreaActions.CREATE_LINK_MMB :
                         # Switch to drag only if click was on shape, select this shape for dragging
                         if clickedOnShape:
-                            self._geometryController.trySelectShape(a0.pos())
+                            self._geometryController.clearSelectedLink()
+                            self._geometryController.trySelectShape(point)
                             self._currentAction = DrawAreaActions.SHAPE_SELECTED_FOR_DRAG
+                        # Click outside of shapes selects link under cursor, if any
+                        else:
+                            self._geometryController.trySelectLink(point, self.__linkHitTolerance())
+                            self.update()
+                    # Start of area selection
+                    case DrawAreaActions.SELECT_REGION:
+                        self._regionStart = point
+                        self._regionEnd = point
+                        self._currentAction = DrawAreaActions.REGION_DRAG
 
+        self.__stopEventTimer("event.press", timerStart)
         return super().mousePressEvent(a0)
 
     # Mouse button release
     def mouseReleaseEvent(self, a0: QMouseEvent | None) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        if self._traceRecorder:
+            self._traceRecorder.recordMouseEvent("release", a0)
+
+        # Event position is converted to world coordinates
+        point = self._viewTransform.mapToWorld(a0.pos())
+
         match a0.button():
             # Left button behavior depends on current action
             # Most of this is intended to be used with toolbar/context menus
             # E.g. "Move shape" button -> click on shape -> click where to move selected shape
             case Qt.MouseButton.LeftButton:
                 match self._currentAction:
-                    # Create rectangle with center at cursor after single click
-                    case DrawAreaActions.CREATE_RECT_AT_POINT:
-                        self._geometryController.tryCreateShape(a0.pos(), self._customRectFactory)
+                    # Create shape with center at cursor after single click
+                    case DrawAreaActions.CREATE_SHAPE_AT_POINT:
+                        self._geometryController.tryCreateShape(point, self._creationFactory)
                         self._currentAction = DrawAreaActions.NO_ACTION
                         self.update()
                     # Link creation process - start link creation via LMB
                     case DrawAreaActions.SELECT_FOR_LINKING_LMB:
-                        if self.__beginLinkCreation(a0.pos()):
+                        if self.__beginLinkCreation(point):
                             self._currentAction = DrawAreaActions.CREATE_LINK_LMB
                     # Link creation process - end link creation via LMB
                     case DrawAreaActions.CREATE_LINK_LMB:
-                        if self.__finishLinkCreation(a0.pos()):
+                        if self.__finishLinkCreation(point):
                             self._currentAction = DrawAreaActions.NO_ACTION
                             self.update()
-                    # Delete shape under cursor
+                    # Delete shape or link under cursor
                     case DrawAreaActions.DELETE_SHAPE:
-                        self._geometryController.tryDeleteShapeAtPoint(a0.pos())
+                        self.__deleteShapeOrLinkAtPoint(point)
                         self._currentAction = DrawAreaActions.NO_ACTION
                         self.update()
                     # Select shape to move to specific point
                     # Selection mode remains active until the shape is selected
                     case DrawAreaActions.SELECT_FOR_MOVE:
-                        if self._geometryController.trySelectShape(a0.pos()):
+                        if self._geometryController.trySelectShape(point):
                             self._currentAction = DrawAreaActions.MOVE_TO_POINT
                     # Try to move selected shape to selected point, unselect shape after attempt
                     case DrawAreaActions.MOVE_TO_POINT:
-                        self._geometryController.tryMoveSelectedShape(a0.pos())
+                        self._geometryController.tryMoveSelectedShape(point)
                         self._geometryController.clearSelectedShape()
                         self._currentAction = DrawAreaActions.NO_ACTION
                         self.update()
-                    # End of shape drag process
+                    # End of shape drag process, movement left from the last frame is applied first
                     case DrawAreaActions.SHAPE_DRAG:
+                        self.flushPendingDrag()
+                        self._dragFrameTimer.stop()
+                        self._geometryController.setRoutingDeferred(False)
+                        self._currentAction = DrawAreaActions.NO_ACTION
+                        self.update()
+                    # End of area selection - apply selected action to shapes inside of it
+                    case DrawAreaActions.REGION_DRAG:
+                        self._regionAction(self.__getSelectedRegion())
+                        self.__resetCurrentAction()
+                    # Split group under cursor
+                    case DrawAreaActions.UNGROUP_SHAPE:
+                        self._geometryController.tryUngroupShapeAtPoint(point)
                         self._currentAction = DrawAreaActions.NO_ACTION
                         self.update()
                     # If no action specified - clear actions
@@ -132,61 +258,262 @@ class DrawArea(QtWidgets.QWidget):
                 match self._currentAction:
                     # Second MMB click - create link
                     case DrawAreaActions.CREATE_LINK_MMB:
-                        if self.__finishLinkCreation(a0.pos()):
+                        if self.__finishLinkCreation(point):
                             self._currentAction = DrawAreaActions.NO_ACTION
                             self.update()
                     # No actions specified and first MMB click - start link creation via MMB
                     case DrawAreaActions.NO_ACTION:
-                        if self.__beginLinkCreation(a0.pos()):
+                        if self.__beginLinkCreation(point):
                             self._currentAction = DrawAreaActions.CREATE_LINK_MMB
 
             # RMB resets any current action
             case Qt.MouseButton.RightButton:
                 self.__resetCurrentAction()
 
+        self.__stopEventTimer("event.release", timerStart)
         return super().mouseReleaseEvent(a0)
     
     # Mouse move
     def mouseMoveEvent(self, a0: QMouseEvent | None) -> None:
-        # Calculate deltas to properly drag shape
-        delta_x = a0.globalPos().x() - self._lastMousePos.x()
-        delta_y = a0.globalPos().y() - self._lastMousePos.y()
+        timerStart = PERF_MONITOR.startTimer()
 
-        # If shape has been moved - update cursor position
-        if self.__processDragAction(delta_x, delta_y):
-            self._lastMousePos = a0.globalPos()
+        if self._traceRecorder:
+            self._traceRecorder.recordMouseEvent("move", a0)
+
+        # If shape was selected for drag - start dragging process
+        # Links are not re-routed until the drag is over, so drag frames do not wait for route search
+        if self._currentAction == DrawAreaActions.SHAPE_SELECTED_FOR_DRAG:
+            self._currentAction = DrawAreaActions.SHAPE_DRAG
+            self._geometryController.setRoutingDeferred(True)
+
+        # While dragging only the latest cursor position is saved, shape is moved once per frame
+        if self._currentAction == DrawAreaActions.SHAPE_DRAG:
+            self._pendingDragPos = a0.globalPos()
+
+            if not self._dragFrameTimer.isActive():
+                self._dragFrameTimer.start()
+        # While selecting area its frame follows the cursor
+        elif self._currentAction == DrawAreaActions.REGION_DRAG:
+            self._regionEnd = self._viewTransform.mapToWorld(a0.pos())
             self.update()
-        # If shape met obstacle - keep cursor locked in place with the shape
         else:
-            self.cursor().setPos(self._lastMousePos)
+            self._lastMousePos = a0.globalPos()
 
+        self.__stopEventTimer("event.move", timerStart)
         return super().mouseMoveEvent(a0)
     
+    # Delete key removes selected link
+    def keyPressEvent(self, a0: QKeyEvent | None) -> None:
+        if self._traceRecorder:
+            self._traceRecorder.recordKeyEvent(a0)
+
+        if a0.key() == Qt.Key.Key_Delete and self._geometryController.selectedLink:
+            self._geometryController.deleteLink(self._geometryController.selectedLink)
+            self.update()
+
+        return super().keyPressEvent(a0)
+
+    # Mouse wheel scrolls the world, with Shift - horizontally, with Ctrl - zooms around cursor
+    def wheelEvent(self, a0: QWheelEvent | None) -> None:
+        if self._traceRecorder:
+            self._traceRecorder.recordWheelEvent(a0)
+
+        steps = a0.angleDelta().y() / 120
+
+        if a0.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            self._viewTransform.zoomAt(a0.pos(), constants.VIEW_ZOOM_STEP ** steps, self.size())
+        elif a0.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+            self._viewTransform.pan(round(-steps * constants.VIEW_SCROLL_STEP_PX), 0, self.size())
+        else:
+            self._viewTransform.pan(0, round(-steps * constants.VIEW_SCROLL_STEP_PX), self.size())
+
+        self.__onViewChanged()
+        a0.accept()
+
+    # Size of the world shapes are placed in
+    def worldSize(self) -> QSize:
+        return self._viewTransform.worldSize
+
     # Widget painting
     def paintEvent(self, a0: QPaintEvent | None) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        if self._traceRecorder:
+            self._traceRecorder.recordEvent("paint")
+
         # Define painter
         qp = QPainter(self)
 
         # Clear painting area
         qp.eraseRect(0, 0, self.width(), self.height())
 
-        # Draw current geometry
-        self._geometryController.drawGeomerty(qp)
+        # Draw visible part of the world
+        qp.save()
+        self._viewTransform.applyToPainter(qp)
+
+        qp.setPen(Qt.GlobalColor.darkGray)
+        qp.setBrush(Qt.BrushStyle.NoBrush)
+        qp.drawRect(QRect(QPoint(0, 0), self.worldSize()))
+
+        if self._backgroundRenderer or self._tileCache:
+            qp.restore()
+
+            if self._backgroundRenderer:
+                self._backgroundRenderer.drawFrame(qp, self._viewTransform)
+            else:
+                self._tileCache.drawTiles(qp, self._viewTransform, self.size())
+
+            qp.save()
+            self._viewTransform.applyToPainter(qp)
+            self._geometryController.drawSelectedShape(qp)
+            self._geometryController.drawSelectedLink(qp)
+        else:
+            self._geometryController.drawGeometryInRect(qp, self._viewTransform.visibleWorldRect(self.size()), self._viewTransform.scale)
+
+        if self._currentAction == DrawAreaActions.REGION_DRAG:
+            qp.setPen(Qt.PenStyle.DashLine)
+            qp.setBrush(Qt.BrushStyle.NoBrush)
+            qp.drawRect(self.__getSelectedRegion())
+
+        qp.restore()
+
+        PERF_MONITOR.stopTimer("paint", timerStart)
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.recordFrame()
+
+        if self._showPerformanceOverlay:
+            self.__drawPerformanceOverlay(qp)
         
         return super().paintEvent(a0)
+
+    # Captures visible part of the scene for background rendering
+    # Snapshot is taken in O(1), all filtering is done by render thread
+    def __createRenderJob(self) -> RenderJob:
+        selectedShapeId = self._geometryController.getShapeId(self._geometryController.selectedShape)
+
+        return RenderJob(self._geometryController.takeSnapshot(),
+                         self._viewTransform.visibleWorldRect(self.size()),
+                         selectedShapeId,
+                         self._viewTransform.worldOrigin(),
+                         self._viewTransform.scale,
+                         self.size())
+
+    # View change requires new background frame
+    def __onViewChanged(self) -> None:
+        if self._backgroundRenderer:
+            self._backgroundRenderer.markDirty()
+        self.update()
+
+    # Draws box with FPS, event latencies and query statistics in top-left corner
+    def __drawPerformanceOverlay(self, painter: QPainter) -> None:
+        events = PERF_MONITOR.getHistogram("event")
+        paint = PERF_MONITOR.getHistogram("paint")
+        scanLength = PERF_MONITOR.getHistogram("query.scan_length")
+        candidates = PERF_MONITOR.getHistogram("query.candidates")
+
+        lines = [f"FPS: {PERF_MONITOR.getFps()}",
+                 f"Event p50/p99: {events.percentile(50) / 1000:.0f}/{events.percentile(99) / 1000:.0f} us",
+                 f"Paint p50/p99: {paint.percentile(50) / 1000:.0f}/{paint.percentile(99) / 1000:.0f} us",
+                 f"Queries: {PERF_MONITOR.getCounter('query.calls')}",
+                 f"Scan length p50/max: {scanLength.percentile(50):.0f}/{scanLength.maxValue}",
+                 f"Candidates p50/max: {candidates.percentile(50):.0f}/{candidates.maxValue}",
+                 f"Culled broad/narrow: {PERF_MONITOR.getCounter('collision.broad_culled')}/{PERF_MONITOR.getCounter('collision.narrow_culled')}"]
+
+        # Linked shapes of selected shape, they are moved together with it in "Move connected" mode
+        if self._geometryController.selectedShape:
+            component = self._geometryController.getComponentStatistics(self._geometryController.selectedShape)
+            lines.append(f"Component shapes/links: {component['shapes']}/{component['links']}")
+
+        lineHeight = painter.fontMetrics().height()
+        overlayRect = QRect(0, 0, constants.PERFORMANCE_OVERLAY_WIDTH, lineHeight * len(lines) + lineHeight // 2)
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 160))
+        painter.drawRect(overlayRect)
+
+        painter.setPen(Qt.GlobalColor.white)
+        for index, line in enumerate(lines):
+            painter.drawText(lineHeight // 4, lineHeight * (index + 1), line)
+
+    # Records event handler latency both separately and to common events histogram
+    def __stopEventTimer(self, name: str, timerStart: int) -> None:
+        if timerStart and PERF_MONITOR.enabled:
+            PERF_MONITOR.stopTimer(name, timerStart)
+            PERF_MONITOR.stopTimer("event", timerStart)
     
-    # Moving shape via dragging and return operation result
-    def __processDragAction(self, delta_x: int, delta_y: int) -> bool:
-        # If shape was selected for drag - start dragging process
-        if self._currentAction == DrawAreaActions.SHAPE_SELECTED_FOR_DRAG:
-            self._currentAction = DrawAreaActions.SHAPE_DRAG
+    # Steps are skipped while shapes are dragged or animated, collection changes every frame then anyway
+    def __onShapeOrderTimer(self) -> None:
+        if self._dragFrameTimer.isActive() or self._animationEngine.animatedShapesCount:
+            self._shapeOrderTimer.setInterval(constants.HILBERT_ORDER_IDLE_INTERVAL_MS)
+            return
 
-        # If dragging is in progress - try update the shape position
-        if self._currentAction == DrawAreaActions.SHAPE_DRAG:
-            return self._geometryController.tryMoveSelectedShapeByDelta(delta_x, delta_y)
-        
-        # Default is True to avoid cursor blocking
-        return True
+        moreSteps = self._geometryController.runShapeOrderStep()
+        self._shapeOrderTimer.setInterval(0 if moreSteps else constants.HILBERT_ORDER_IDLE_INTERVAL_MS)
+
+    # Drag frames are recorded to trace, since replay has no timers running
+    def __onDragFrame(self) -> None:
+        if self._traceRecorder:
+            self._traceRecorder.recordEvent("drag_frame")
+
+        self.flushPendingDrag()
+
+    # Applies accumulated drag movement with single collision check
+    # Called by frame timer, timer stops itself when there were no mouse moves during the frame
+    def flushPendingDrag(self) -> None:
+        if not self._pendingDragPos or self._currentAction != DrawAreaActions.SHAPE_DRAG:
+            self._pendingDragPos = None
+            self._dragFrameTimer.stop()
+            return
+
+        timerStart = PERF_MONITOR.startTimer()
+
+        # Calculate deltas to properly drag shape, cursor deltas are converted to world units
+        # Movement smaller than world unit is kept in cursor position until it accumulates
+        delta_x = round((self._pendingDragPos.x() - self._lastMousePos.x()) / self._viewTransform.scale)
+        delta_y = round((self._pendingDragPos.y() - self._lastMousePos.y()) / self._viewTransform.scale)
+
+        if delta_x or delta_y:
+            if self._moveConnected:
+                moved = self._geometryController.tryMoveSelectedShapeWithConnectedByDelta(delta_x, delta_y)
+            else:
+                moved = self._geometryController.tryMoveSelectedShapeByDelta(delta_x, delta_y)
+
+            # If shape has been moved - update cursor position
+            if moved:
+                self._lastMousePos = self._pendingDragPos
+                self.update()
+            # If shape met obstacle - keep cursor locked in place with the shape
+            else:
+                self.cursor().setPos(self._lastMousePos)
+
+        self._pendingDragPos = None
+        self.__stopEventTimer("event.drag_frame", timerStart)
+
+    # Deletes shape at point, if there is no shape - deletes link near the point
+    def __deleteShapeOrLinkAtPoint(self, point: QPoint) -> None:
+        if not self._geometryController.tryDeleteShapeAtPoint(point):
+            self._geometryController.tryDeleteLinkAtPoint(point, self.__linkHitTolerance())
+
+    # Area selected by LMB drag, corners could be selected in any order
+    def __getSelectedRegion(self) -> QRect:
+        return QRect(self._regionStart, self._regionEnd).normalized()
+
+    # Internal method to start area selection, action is applied to selected area
+    def __startRegionSelection(self, action: Callable[[QRect], object]) -> None:
+        self._regionAction = action
+        self._currentAction = DrawAreaActions.SELECT_REGION
+        self._geometryController.clearSelectedShape()
+
+    # Link hit tolerance is defined in pixels, so it is converted to world units for current zoom
+    def __linkHitTolerance(self) -> float:
+        return constants.LINK_HIT_TOLERANCE_PX / self._viewTransform.scale
+
+    # Internal method to start shape creation with specified factory
+    def __startShapeCreation(self, factory: CustomShapeBaseFactory) -> None:
+        self._creationFactory = factory
+        self._currentAction = DrawAreaActions.CREATE_SHAPE_AT_POINT
+        self._geometryController.clearSelectedShape()
 
     # Internal method to properly start link creation
     def __beginLinkCreation(self, point: QPoint) -> bool:
@@ -198,19 +525,46 @@ class DrawArea(QtWidgets.QWidget):
 
     # Internal method to reset current actions
     def __resetCurrentAction(self) -> None:
+        self._pendingDragPos = None
+        self._dragFrameTimer.stop()
+        self._geometryController.setRoutingDeferred(False)
         self._currentAction = DrawAreaActions.NO_ACTION
+        self._regionStart = None
+        self._regionEnd = None
+        self._regionAction = None
         self._geometryController.clearSelectedShape()
+        self._geometryController.clearSelectedLink()
+        self.update()
 
     # Slot which starts rectangle creation by single click
     def startRectCreation(self) -> None:
-        self._currentAction = DrawAreaActions.CREATE_RECT_AT_POINT
-        self._geometryController.clearSelectedShape()
+        self.__startShapeCreation(self._customRectFactory)
+
+    # Slot which starts ellipse creation by single click
+    def startEllipseCreation(self) -> None:
+        self.__startShapeCreation(self._customEllipseFactory)
+
+    # Slot which starts hexagon creation by single click
+    def startPolygonCreation(self) -> None:
+        self.__startShapeCreation(self._customPolygonFactory)
 
     # Slot which starts link creation by LMB clicks
     def startLinkCreation(self) -> None:
         self._currentAction = DrawAreaActions.SELECT_FOR_LINKING_LMB
         self._geometryController.clearSelectedShape()
 
+    # Slot which switches placing of colliding shapes to the nearest free position
+    def setFindFreePosition(self, enabled: bool) -> None:
+        self._geometryController.setFindFreePositionEnabled(enabled)
+
+    # Slot which switches dragging of selected shape together with shapes linked with it
+    def setMoveConnected(self, enabled: bool) -> None:
+        self._moveConnected = enabled
+
+    # Slot which switches type of new links between routed and straight
+    def setRoutedLinks(self, enabled: bool) -> None:
+        self._geometryController.setRoutedLinksEnabled(enabled)
+
     # Slot which starts rectangle move by pointing the new location
     def startRectMove(self) -> None:
         self._currentAction = DrawAreaActions.SELECT_FOR_MOVE
@@ -221,6 +575,134 @@ class DrawArea(QtWidgets.QWidget):
         self._currentAction = DrawAreaActions.DELETE_SHAPE
         self._geometryController.clearSelectedShape()
 
+    # Slot which starts deletion of all shapes inside of area selected by LMB drag
+    def deleteShapesInRegion(self) -> None:
+        self.__startRegionSelection(self._geometryController.deleteShapesInRect)
+
+    # Slot which starts grouping of all shapes inside of area selected by LMB drag
+    def groupShapesInRegion(self) -> None:
+        self.__startRegionSelection(self._geometryController.groupShapesInRect)
+
+    # Slot which starts splitting of group by LMB click
+    def ungroupShape(self) -> None:
+        self._currentAction = DrawAreaActions.UNGROUP_SHAPE
+        self._geometryController.clearSelectedShape()
+
+    # Moves animated shapes to their next points at once, called by replay instead of animation timer
+    def processAnimationFrame(self) -> None:
+        self._animationEngine.processFrame()
+
+    # Slot which starts or stops moving all shapes along circles, shapes wait while path is blocked
+    def setAnimationEnabled(self, enabled: bool) -> None:
+        self._animationEnabled = enabled
+
+        if not enabled:
+            self._animationEngine.stopAll()
+            return
+
+        for shape in self._geometryController.getAllShapes():
+            self._animationEngine.animateShape(shape, orbitTrajectory(shape.centerPoint,
+                                                                      constants.ANIMATION_ORBIT_RADIUS,
+                                                                      constants.ANIMATION_ORBIT_PERIOD_FRAMES,
+                                                                      random.random()))
+
+    # Starts server which applies scene updates received via local socket
+    def startIngestionServer(self, socketPath: str) -> None:
+        server = IngestionServer(self._geometryController, self._customRectFactory, socketPath, self.update)
+        server.start()
+        QtWidgets.QApplication.instance().aboutToQuit.connect(server.stop)
+
+    # Slot which returns view to initial scale and position
+    def resetView(self) -> None:
+        self._viewTransform.reset()
+        self.__onViewChanged()
+
+    # Slot which shows or hides performance overlay, metrics are collected only while overlay is shown
+    def togglePerformanceOverlay(self) -> None:
+        self._showPerformanceOverlay = not self._showPerformanceOverlay
+        PERF_MONITOR.enabled = self._showPerformanceOverlay
+        self.update()
+
+    # Slot which saves collected performance metrics to file
+    def dumpPerformanceMetrics(self) -> None:
+        PERF_MONITOR.dumpMetrics(constants.PERFORMANCE_METRICS_FILE)
+
+    # Slot which saves all shapes and links to SCENE_FILE, with index of shapes if SCENE_FILE_SAVE_INDEX is set
+    # Exception in slot would abort the program, so failure is only reported
+    def saveScene(self) -> None:
+        self.__resetCurrentAction()
+        shapes, links, index = self._geometryController.getSceneContent()
+
+        try:
+            writeSceneFile(constants.SCENE_FILE, shapes, links, index if constants.SCENE_FILE_SAVE_INDEX else None)
+        except OSError as error:
+            print(f"Scene could not be saved to {constants.SCENE_FILE}: {error}", file=sys.stderr)
+
+    # Slot which replaces current scene with scene from SCENE_FILE
+    def loadScene(self) -> None:
+        self.loadSceneFile(constants.SCENE_FILE)
+
+    # Replaces current scene with scene from file, returns result
+    # If file is missing, damaged or has other version, failure is reported and current scene stays as is
+    def loadSceneFile(self, filePath: str) -> bool:
+        try:
+            sceneContent = readSceneFile(filePath)
+        except (OSError, ValueError) as error:
+            print(f"Scene could not be loaded from {filePath}: {error}", file=sys.stderr)
+            return False
+
+        self.__resetCurrentAction()
+        self._geometryController.loadSceneContent(*sceneContent)
+        self.update()
+
+        return True
+
+    # Slot which exports all shapes to EXPORT_DIRECTORY, export runs in background and does not block the window
+    def exportScene(self) -> None:
+        sceneRect = self._geometryController.getSceneBoundingBox()
+
+        if sceneRect.isEmpty():
+            return
+
+        # Snapshot is immutable, so it could be exported while scene is being changed
+        exporter = SceneExporter(sceneRect, constants.EXPORT_SCALE)
+        threading.Thread(target=exporter.exportToDirectory,
+                         args=(self._geometryController.takeSnapshot(), constants.EXPORT_DIRECTORY),
+                         daemon=True).start()
+
+    # Slot which starts or stops recording of input events to TRACE_FILE
+    # Recording starts from empty area and initial view, so replay builds the same scene
+    def setTraceRecording(self, enabled: bool) -> None:
+        if self._traceRecorder:
+            self._traceRecorder.close()
+            self._traceRecorder = None
+
+        if enabled:
+            seed = random.randrange(2 ** 32)
+            self.resetForTrace(seed)
+            self._traceRecorder = EventTraceRecorder(constants.TRACE_FILE, self.size(), seed, self.getToggleStates())
+
+        self._animationEngine.setTraceRecorder(self._traceRecorder)
+
+    # Slot which records toolbar action to trace, actions which do not change the scene are skipped
+    def recordToolbarAction(self, action: QAction) -> None:
+        if self._traceRecorder and action.text() not in (constants.TRACE_RECORD_BUTTON, constants.EXPORT_BUTTON, constants.DUMP_METRICS_BUTTON):
+            self._traceRecorder.recordEvent("action", text=action.text(), checked=action.isChecked())
+
+    # States of toolbar toggles by their texts, they are written to trace header, so replay starts with the same toggles
+    def getToggleStates(self) -> dict:
+        return {constants.ROUTED_LINKS_BUTTON: self._geometryController.routedLinksEnabled,
+                constants.MOVE_CONNECTED_BUTTON: self._moveConnected,
+                constants.FREE_POSITION_BUTTON: self._geometryController.findFreePositionEnabled,
+                constants.ANIMATE_BUTTON: self._animationEnabled}
+
+    # Resets area to the state trace recording starts from, random colors and phases are seeded as well
+    def resetForTrace(self, seed: int) -> None:
+        self.__resetCurrentAction()
+        self.clearArea()
+        self.resetView()
+        random.seed(seed)
+
     # Slot and method which clears the draw area
     def clearArea(self) -> None:
         self._geometryController.clearGeometry()
@@ -0,0 +1,157 @@
+import json
+from time import perf_counter_ns, sleep
+from typing import Dict
+
+from PyQt5.QtWidgets import QToolBar, QWidget
+from PyQt5.QtGui import QMouseEvent, QWheelEvent, QKeyEvent
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF, QSize
+
+from performance_monitor import Histogram
+
+# Trace of input events processed by draw area, to reproduce user session exactly
+#
+# Trace is a file with JSON object on each line:
+#   {"type": "header", "version": 2, "seed": 123, "width": 1000, "height": 700, "toggles": {"Routed links": true, ...}}
+#   {"type": "press", "t": 1500000, "x": 10, "y": 20, "gx": 110, "gy": 220, "button": 1, "buttons": 1, "modifiers": 0}
+#   {"type": "action", "t": 2500000, "text": "New rect", "checked": false}
+# "t" is time from the start of recording in nanoseconds, "toggles" are states of toolbar toggles when recording started
+# Besides mouse, wheel and key events, trace contains toolbar actions, drag and animation frames and paints,
+# since they are driven by timers and window system and would not happen during replay by themselves
+TRACE_VERSION = 2
+
+# Mouse event types and handlers they are replayed with
+MOUSE_EVENTS = {"press": (QEvent.Type.MouseButtonPress, "mousePressEvent"),
+                "release": (QEvent.Type.MouseButtonRelease, "mouseReleaseEvent"),
+                "double_click": (QEvent.Type.MouseButtonDblClick, "mouseDoubleClickEvent"),
+                "move": (QEvent.Type.MouseMove, "mouseMoveEvent")}
+
+# Writes events to trace file as they are processed
+# File is buffered, so recording costs little more than JSON formatting of event
+class EventTraceRecorder():
+    def __init__(self, filePath: str, viewSize: QSize, seed: int, toggles: Dict[str, bool]) -> None:
+        self._file = open(filePath, "w", encoding="utf-8")
+        self._startTimestamp = perf_counter_ns()
+
+        self.__writeRecord({"type": "header", "version": TRACE_VERSION, "seed": seed,
+                            "width": viewSize.width(), "height": viewSize.height(), "toggles": toggles})
+
+    def recordMouseEvent(self, eventType: str, event: QMouseEvent) -> None:
+        self.recordEvent(eventType, x=event.pos().x(), y=event.pos().y(),
+                         gx=event.globalPos().x(), gy=event.globalPos().y(),
+                         button=int(event.button()), buttons=int(event.buttons()), modifiers=int(event.modifiers()))
+
+    def recordWheelEvent(self, event: QWheelEvent) -> None:
+        self.recordEvent("wheel", x=event.pos().x(), y=event.pos().y(),
+                         gx=event.globalPos().x(), gy=event.globalPos().y(),
+                         dx=event.angleDelta().x(), dy=event.angleDelta().y(),
+                         buttons=int(event.buttons()), modifiers=int(event.modifiers()))
+
+    def recordKeyEvent(self, event: QKeyEvent) -> None:
+        self.recordEvent("key", key=event.key(), modifiers=int(event.modifiers()))
+
+    def recordEvent(self, eventType: str, **fields) -> None:
+        self.__writeRecord({"type": eventType, "t": perf_counter_ns() - self._startTimestamp, **fields})
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __writeRecord(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+
+# Replays trace through the same draw area handlers and toolbar actions as user session
+# Time of every handler and paint is measured, report contains latency percentiles per event type
+class EventTraceReplayer():
+    def __init__(self, drawArea: QWidget, toolbar: QToolBar) -> None:
+        self._drawArea = drawArea
+        self._toolbarActions = {action.text(): action for action in toolbar.actions() if action.text()}
+        self._histograms: Dict[str, Histogram] = {}
+
+    # Replays trace file, events are processed as fast as possible unless realtime is set
+    # With realtime replay waits between events the same time as user did
+    def replay(self, filePath: str, realtime: bool = False) -> dict:
+        self._histograms.clear()
+
+        with open(filePath, encoding="utf-8") as traceFile:
+            records = [json.loads(line) for line in traceFile if line.strip()]
+
+        header = records[0]
+        if header.get("type") != "header" or header.get("version") != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace file: {filePath}")
+
+        # Replay starts from the same state as recording did, toggles are set through actions, so their slots are called
+        self._drawArea.resetForTrace(header["seed"])
+
+        for text, checked in header["toggles"].items():
+            self._toolbarActions[text].setChecked(checked)
+        replayStart = perf_counter_ns()
+
+        for record in records[1:]:
+            if realtime:
+                delay = record["t"] - (perf_counter_ns() - replayStart)
+                if delay > 0:
+                    sleep(delay / 1_000_000_000)
+
+            timerStart = perf_counter_ns()
+            self.__replayRecord(record)
+            self.__getHistogram(record["type"]).addSample(perf_counter_ns() - timerStart)
+
+        return self.getReport()
+
+    # Latencies in nanoseconds for every event type
+    def getReport(self) -> dict:
+        return {eventType: {"count": histogram.count,
+                            "mean": histogram.mean,
+                            "p50": histogram.percentile(50),
+                            "p95": histogram.percentile(95),
+                            "p99": histogram.percentile(99),
+                            "max": histogram.maxValue}
+                for eventType, histogram in sorted(self._histograms.items())}
+
+    def __replayRecord(self, record: dict) -> None:
+        match record["type"]:
+            case eventType if eventType in MOUSE_EVENTS:
+                qtEventType, handlerName = MOUSE_EVENTS[eventType]
+                event = QMouseEvent(qtEventType, QPointF(record["x"], record["y"]), QPointF(record["x"], record["y"]),
+                                    QPointF(record["gx"], record["gy"]), Qt.MouseButton(record["button"]),
+                                    Qt.MouseButtons(record["buttons"]), Qt.KeyboardModifiers(record["modifiers"]))
+                getattr(self._drawArea, handlerName)(event)
+            case "wheel":
+                self._drawArea.wheelEvent(QWheelEvent(QPointF(record["x"], record["y"]), QPointF(record["gx"], record["gy"]),
+                                                      QPoint(), QPoint(record["dx"], record["dy"]),
+                                                      Qt.MouseButtons(record["buttons"]), Qt.KeyboardModifiers(record["modifiers"]),
+                                                      Qt.ScrollPhase.NoScrollPhase, False))
+            case "key":
+                self._drawArea.keyPressEvent(QKeyEvent(QEvent.Type.KeyPress, record["key"], Qt.KeyboardModifiers(record["modifiers"])))
+            case "drag_frame":
+                self._drawArea.flushPendingDrag()
+            case "animation_frame":
+                self._drawArea.processAnimationFrame()
+            # Paint is done immediately, not scheduled as update() does
+            case "paint":
+                self._drawArea.repaint()
+            # Toggle actions are set to recorded state, so their slots get the same argument
+            case "action":
+                action = self._toolbarActions[record["text"]]
+
+                if action.isCheckable():
+                    action.setChecked(record["checked"])
+                else:
+                    action.trigger()
+
+    def __getHistogram(self, eventType: str) -> Histogram:
+        histogram = self._histograms.get(eventType)
+
+        if histogram is None:
+            histogram = Histogram()
+            self._histograms[eventType] = histogram
+
+        return histogram
+
+# Prints replay report as table with latencies in microseconds
+def printReplayReport(report: dict) -> None:
+    print(f"{'event':<14}{'count':>8}{'p50 us':>12}{'p95 us':>12}{'p99 us':>12}{'max us':>12}")
+
+    for eventType, latencies in report.items():
+        print(f"{eventType:<14}{latencies['count']:>8}"
+              f"{latencies['p50'] / 1000:>12.1f}{latencies['p95'] / 1000:>12.1f}"
+              f"{latencies['p99'] / 1000:>12.1f}{latencies['max'] / 1000:>12.1f}")
@@ -0,0 +1,196 @@
+import heapq
+from typing import Callable, Iterator, List
+
+from PyQt5.QtCore import QPoint, QRect, QSize
+
+import constants
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+
+# Search of the nearest position where shape could be placed without collisions
+#
+# For shape of fixed size, obstacles could be expanded by shape's half-size (Minkowski sum),
+# then shape center is free if it is outside of all expanded obstacles and inside world borders shrunk the same way
+# Nearest free center is either desired point itself, or lies on expanded obstacles borders
+# Its Y is desired Y or next to top or bottom border of some expanded obstacle, otherwise it could be moved closer vertically
+#
+# So only these candidate rows are checked, in order of distance from desired point, until rows are farther than found place
+# Rows are swept from desired point up and down, keeping obstacles which cross current row,
+# in each row forbidden ranges are merged and the nearest free X is taken at ends of range which covers desired X
+#
+# Only obstacles near desired point are taken from collection index, search area grows until free place is found
+class FreePositionFinder():
+    def __init__(self, shapesCollection, collisionChecker, worldSize: QSize) -> None:
+        self._shapesCollection = shapesCollection
+        # Final check of found position is done by regular collision checker
+        self._collisionChecker = collisionChecker
+        self._worldSize = worldSize
+
+    # Returns nearest to desired point center, where shape fits, or None if there is no such place within search distance
+    # Shape is not moved, but it should not be in collection
+    # Other obstacles are shapes which are not in collection, but should be avoided too, e.g. selected shape
+    def findNearestFreeCenter(self, shape: CustomShape, desiredCenter: QPoint, otherObstacles: List[CustomShape] = ()) -> QPoint:
+        timerStart = PERF_MONITOR.startTimer()
+
+        # Distances from center to bounding box borders
+        boundingBox = shape.boundingBox
+        offsetLeft = shape.centerPoint.x() - boundingBox.left()
+        offsetRight = boundingBox.right() - shape.centerPoint.x()
+        offsetTop = shape.centerPoint.y() - boundingBox.top()
+        offsetBottom = boundingBox.bottom() - shape.centerPoint.y()
+
+        # Range of centers which keep shape inside the world
+        minX = offsetLeft
+        maxX = self._worldSize.width() - offsetRight
+        minY = offsetTop
+        maxY = self._worldSize.height() - offsetBottom
+
+        if minX > maxX or minY > maxY:
+            return None
+
+        targetX = min(max(desiredCenter.x(), minX), maxX)
+        targetY = min(max(desiredCenter.y(), minY), maxY)
+
+        otherObstacles = [obstacle for obstacle in otherObstacles if obstacle is not shape]
+
+        result = None
+        checkedCount = 0
+        searchDistance = max(boundingBox.width(), boundingBox.height())
+
+        while result is None:
+            searchDistance = min(searchDistance, constants.FREE_POSITION_MAX_SEARCH_DISTANCE)
+            maxDistanceSquared = searchDistance * searchDistance
+
+            # Any obstacle which could touch shape centered not further than search distance
+            searchArea = QRect(QPoint(targetX - searchDistance - offsetLeft, targetY - searchDistance - offsetTop),
+                               QPoint(targetX + searchDistance + offsetRight, targetY + searchDistance + offsetBottom))
+
+            obstacles = self._shapesCollection.getShapesInRect(searchArea) + [obstacle for obstacle in otherObstacles
+                                                                                if obstacle.boundingBox.intersects(searchArea)]
+
+            # Forbidden ranges of center coordinates for each obstacle, by its bounding box
+            forbiddenAreas = [(left - offsetRight, right + offsetLeft, top - offsetBottom, bottom + offsetTop)
+                              for left, top, right, bottom in (obstacle.boundingBox.getCoords() for obstacle in obstacles)]
+
+            # Free places found in rows, rows are visited by distance, so place is taken only when no closer row is left
+            candidates = []
+
+            for y, rowAreas in FreePositionFinder.__iterRows(forbiddenAreas, targetY, minY, maxY):
+                rowDistanceSquared = (y - targetY) ** 2
+
+                if rowDistanceSquared > maxDistanceSquared:
+                    break
+
+                result, checked = self.__takeCandidate(shape, candidates, rowDistanceSquared, otherObstacles)
+                checkedCount += checked
+
+                if result is not None:
+                    break
+
+                for x in FreePositionFinder.__getNearestFreeXs(rowAreas, targetX, minX, maxX):
+                    heapq.heappush(candidates, ((x - targetX) ** 2 + rowDistanceSquared, x, y))
+
+            # Farther candidates could collide with obstacles which were not requested yet
+            if result is None:
+                result, checked = self.__takeCandidate(shape, candidates, maxDistanceSquared + 1, otherObstacles)
+                checkedCount += checked
+
+            if searchDistance >= constants.FREE_POSITION_MAX_SEARCH_DISTANCE:
+                break
+
+            searchDistance *= 2
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.stopTimer("free_position.search", timerStart)
+            PERF_MONITOR.addSample("free_position.checked", checkedCount)
+
+        return result
+
+    # Checks found places closer than given distance, closest first, returns first fitting place and number of checked places
+    def __takeCandidate(self, shape: CustomShape, candidates: List[tuple], distanceSquaredLimit: int, otherObstacles: List[CustomShape]) -> tuple:
+        checkedCount = 0
+
+        while candidates and candidates[0][0] < distanceSquaredLimit:
+            _, x, y = heapq.heappop(candidates)
+
+            checkedCount += 1
+            if self.__checkPosition(shape, QPoint(x, y), otherObstacles):
+                return QPoint(x, y), checkedCount
+
+        return None, checkedCount
+
+    # Bounding boxes are conservative for non-rectangular shapes, so exact check is done by collision checker
+    def __checkPosition(self, shape: CustomShape, center: QPoint, otherObstacles: List[CustomShape]) -> bool:
+        oldCenter = shape.centerPoint
+        shape.setNewCenterPoint(center)
+
+        result = self._collisionChecker.completeCollisionCheck(shape) and \
+            not any(shape.checkIntersectionBoundary(obstacle) and obstacle.checkIntersectionPrecise(shape) for obstacle in otherObstacles)
+
+        shape.setNewCenterPoint(oldCenter)
+        return result
+
+    # Yields candidate rows inside of world, ordered by distance from target row, with forbidden areas crossing each row
+    # Rows below and above target are swept separately, areas enter and leave the sweep by their borders
+    @staticmethod
+    def __iterRows(forbiddenAreas: List[tuple], targetY: int, minY: int, maxY: int) -> Iterator[tuple]:
+        rowsY = {targetY}
+        rowsY.update([area[2] - 1 for area in forbiddenAreas])
+        rowsY.update([area[3] + 1 for area in forbiddenAreas])
+
+        rowsBelow = sorted(y for y in rowsY if targetY <= y <= maxY)
+        rowsAbove = sorted((y for y in rowsY if minY <= y < targetY), reverse=True)
+
+        # Areas ordered by border, which is crossed first when moving away from target row
+        areasBelow = sorted(forbiddenAreas, key=lambda area: area[2])
+        areasAbove = sorted(forbiddenAreas, key=lambda area: area[3], reverse=True)
+
+        sweepBelow = FreePositionFinder.__sweepRows(rowsBelow, areasBelow, lambda area, y: area[2] <= y, lambda area, y: area[3] >= y)
+        sweepAbove = FreePositionFinder.__sweepRows(rowsAbove, areasAbove, lambda area, y: area[3] >= y, lambda area, y: area[2] <= y)
+
+        # Merge of two sweeps by distance from target row
+        rowBelow = next(sweepBelow, None)
+        rowAbove = next(sweepAbove, None)
+
+        while rowBelow is not None or rowAbove is not None:
+            if rowAbove is None or (rowBelow is not None and rowBelow[0] - targetY <= targetY - rowAbove[0]):
+                yield rowBelow
+                rowBelow = next(sweepBelow, None)
+            else:
+                yield rowAbove
+                rowAbove = next(sweepAbove, None)
+
+    # Sweeps rows in given order, area is added when row reaches it and removed when row leaves it
+    @staticmethod
+    def __sweepRows(rowsY: List[int], areas: List[tuple], isReached: Callable[[tuple, int], bool], isNotLeft: Callable[[tuple, int], bool]) -> Iterator[tuple]:
+        activeAreas = []
+        nextArea = 0
+
+        for y in rowsY:
+            while nextArea < len(areas) and isReached(areas[nextArea], y):
+                activeAreas.append(areas[nextArea])
+                nextArea += 1
+
+            activeAreas = [area for area in activeAreas if isNotLeft(area, y)]
+            yield y, activeAreas
+
+    # Free X nearest to target on the left and on the right in row, or target itself, if it is free
+    @staticmethod
+    def __getNearestFreeXs(rowAreas: List[tuple], targetX: int, minX: int, maxX: int) -> List[int]:
+        rangeLeft = rangeRight = None
+
+        # Ranges which touch each other are merged, centers are integer
+        for left, right, _, _ in sorted(rowAreas):
+            if rangeRight is not None and left <= rangeRight + 1:
+                rangeRight = max(rangeRight, right)
+                continue
+
+            if rangeRight is not None and rangeLeft <= targetX <= rangeRight:
+                break
+
+            rangeLeft, rangeRight = left, right
+
+        if rangeRight is None or not rangeLeft <= targetX <= rangeRight:
+            return [targetX]
+
+        return [x for x in (rangeLeft - 1, rangeRight + 1) if minX <= x <= maxX]
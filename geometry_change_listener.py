@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+from PyQt5.QtCore import QPoint, QRect
+
+# Base class for objects which should react on geometry changes
+# Rect and segments are in world coordinates and cover both old and new state of changed geometry
+class GeometryChangeListener(ABC):
+    # Area covered by shape has changed
+    @abstractmethod
+    def onRectChanged(self, rect: QRect) -> None:
+        pass
+
+    # Area covered by link segment has changed
+    @abstractmethod
+    def onSegmentChanged(self, point_1: QPoint, point_2: QPoint) -> None:
+        pass
+
+    # All geometry was removed
+    @abstractmethod
+    def onGeometryCleared(self) -> None:
+        pass
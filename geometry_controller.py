@@ -1,25 +1,71 @@
-from typing import List
+from typing import Callable, Iterable, List, Dict
 
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtGui import QPainter
-from PyQt5.QtCore import QPoint
+from PyQt5.QtCore import QPoint, QRect
 
+import constants
+from custom_group import CustomGroup, expandGroupsInRect
 from custom_rect import CustomRect
 from custom_shape import CustomShape, CustomShapeBaseFactory
-# TODO: Test which positioning helper is actually more effective
-from positioning_helper_v2 import ShapesCollection, CollisionProcessor
-# from positioning_helper_ineffective import ShapesCollection, CollisionProcessor
-from shapes_link import ShapesLinkBase, ShapesLinkLine
+from free_space import FreePositionFinder
+from geometry_change_listener import GeometryChangeListener
+from level_of_detail import DensityGridCache
+from link_components import ConnectedComponents
+from link_index import LinkSegmentIndex
+from link_router import LinkRouter
+from performance_monitor import PERF_MONITOR
+from positioning_backends import createPositioningBackend
+from scene_snapshot import SceneStore, SceneSnapshot
+from shape_boxes import ShapeBatch, ShapeBoxes
+from shape_order import HilbertOrderMaintainer
+from shape_style import drawShapesGrouped
+from shapes_link import ShapesLinkBase, ShapesLinkLine, ShapesLinkRouted, drawLinksBatched
 
 class GeometryController():
-    def __init__(self, drawArea: QWidget) -> None:
-        # Collections for shapes and links
-        self._shapesCollection = ShapesCollection()
+    # Positioning backend is taken from registry of positioning_backends by name
+    # By default adaptive collection is used, which switches index if shapes distribution is bad for sorted list
+    def __init__(self, drawArea: QWidget, positioningBackend: str = None) -> None:
+        if positioningBackend is None:
+            positioningBackend = "adaptive" if constants.ADAPTIVE_INDEX_ENABLED else "v2"
+
+        # Collections for shapes and links, checker for collisions of shapes with each other and with world borders
+        self._shapesCollection, self._collisionChecker = createPositioningBackend(positioningBackend, drawArea.worldSize())
         self._shapeLinksCollection: List[ShapesLinkBase] = []           # TODO: Should restrict duplicate link creation (WHAT IS a duplicate link?)
+        # Links of each shape for fast access on shape move and deletion
+        self._shapeLinksMap: Dict[CustomShape, List[ShapesLinkBase]] = {}
+        # Connected components of shapes by links and groups, for moving linked shapes together
+        self._linkComponents = ConnectedComponents()
 
-        # Checker for collisions
-        # TODO: Find better solution, had to pass drawArea as QWidget due to dynamic size
-        self._collisionChecker = CollisionProcessor(drawArea, self._shapesCollection)
+        # Copy-on-write copy of shapes and links for readers from other threads
+        self._sceneStore = SceneStore()
+
+        # Listeners which are notified about changed parts of geometry (e.g. for cached rendering)
+        self._changeListeners: List[GeometryChangeListener] = []
+
+        # If enabled, shapes which collide on creation or move are placed to the nearest free position instead
+        self._freePositionFinder = FreePositionFinder(self._shapesCollection, self._collisionChecker, drawArea.worldSize())
+        self._findFreePositionEnabled = False
+
+        # Aggregated shapes for zoomed-out drawing
+        self._densityGridCache = DensityGridCache()
+
+        # Maintenance pass which keeps shapes collection in spatial order
+        self._shapeOrderMaintainer = HilbertOrderMaintainer(self._shapesCollection, drawArea.worldSize())
+
+        # Router for links going around shapes, it should be notified before other listeners
+        self._linkRouter = LinkRouter(self.__getRouteObstacles)
+        self.addChangeListener(self._linkRouter)
+        # New links are created routed if enabled
+        self._routedLinksEnabled = False
+
+        # Index of link segments for link hit testing
+        self._linkIndex = LinkSegmentIndex()
+        # Link selected by user, it stays in all collections unlike selected shape
+        self._selectedLink: ShapesLinkBase = None
+
+        # Centers and boxes of shapes relocated by the last tryRelocateShapeList call, e.g. of animated shapes
+        self._shapeBatch: ShapeBatch = None
 
         # Selected shape is being excluded from _shapesCollection to optimize shape update during movement
         self._selectedShape: CustomRect = None
@@ -28,6 +74,94 @@ class GeometryController():
     def selectedShape(self) -> CustomShape:
         return self._selectedShape
 
+    @property
+    def selectedLink(self) -> ShapesLinkBase:
+        return self._selectedLink
+
+    @property
+    def findFreePositionEnabled(self) -> bool:
+        return self._findFreePositionEnabled
+
+    @property
+    def routedLinksEnabled(self) -> bool:
+        return self._routedLinksEnabled
+
+    # Returns new list of all shapes, including selected one
+    def getAllShapes(self) -> List[CustomShape]:
+        shapes = list(self._shapesCollection.shapesList)
+
+        if self._selectedShape:
+            shapes.append(self._selectedShape)
+
+        return shapes
+
+    # Scene id of shape, which stays the same while shape exists
+    # Ids of deleted shapes could be reused for new ones
+    def getShapeId(self, shape: CustomShape) -> int:
+        return self._sceneStore.getShapeId(shape)
+
+    # Shapes of the list, which are not in the scene anymore, e.g. deleted or grouped ones
+    def getMissingShapes(self, shapes: Iterable[CustomShape]) -> List[CustomShape]:
+        return self._sceneStore.getMissingShapes(shapes)
+
+    # Returns shape by scene id or None, if there is no such shape
+    def getShapeById(self, shapeId: int) -> CustomShape:
+        return self._sceneStore.getLiveShape(shapeId)
+
+    # Returns rect containing all shapes and links, it is empty if there are no shapes
+    def getSceneBoundingBox(self) -> QRect:
+        result = QRect()
+
+        for shape in self.getAllShapes():
+            result = result.united(shape.boundingBox)
+
+        for link in self._shapeLinksCollection:
+            result = result.united(link.boundingBox)
+
+        return result
+
+    # Returns consistent state of shapes and links, which could be read from any thread
+    # O(1), except for copying of shapes moved by batches since previous snapshot
+    def takeSnapshot(self) -> SceneSnapshot:
+        return self._sceneStore.snapshot()
+
+    # Registers listener to be notified about geometry changes
+    def addChangeListener(self, listener: GeometryChangeListener) -> None:
+        self._changeListeners.append(listener)
+
+    # Defines if colliding shapes are placed to the nearest free position or creation/move fails
+    def setFindFreePositionEnabled(self, enabled: bool) -> None:
+        self._findFreePositionEnabled = enabled
+
+    # Defines if new links go around shapes or are straight lines
+    def setRoutedLinksEnabled(self, enabled: bool) -> None:
+        self._routedLinksEnabled = enabled
+
+    # Defines if routes affected by changes are searched again at once or when deferring is over, e.g. after drag
+    # While deferred, affected links keep previous route or are drawn as straight lines
+    def setRoutingDeferred(self, deferred: bool) -> None:
+        self._linkRouter.setDeferred(deferred)
+
+        if not deferred:
+            self.__rerouteInvalidatedLinks()
+
+    # Makes one step of reordering shapes collection along Hilbert curve, e.g. in idle time
+    # Returns true if reordering is not finished and more steps are needed
+    def runShapeOrderStep(self) -> bool:
+        return self._shapeOrderMaintainer.runStep()
+
+    # Reorders shapes collection along Hilbert curve at once
+    def reorderShapes(self) -> None:
+        self._shapeOrderMaintainer.reorderNow()
+
+    # Top-level shapes connected with shape by links, including the shape itself, O(1) lookup of component
+    def getConnectedShapes(self, shape: CustomShape) -> List[CustomShape]:
+        return self._linkComponents.getConnectedShapes(shape)
+
+    # Number of top-level shapes, all shapes including grouped ones, and links in component of shape
+    def getComponentStatistics(self, shape: CustomShape) -> dict:
+        return self._linkComponents.getComponentStatistics(shape)
+
     # Try to select shape at certain point, returns true if success
     # Selected shape is removed from shapes collection for proper position tracking
     def trySelectShape(self, point: QPoint) -> bool:
@@ -39,6 +173,8 @@ class GeometryController():
 
         self._selectedShape = self._shapesCollection.popShapeAtPoint(point)
         if self._selectedShape:
+            self.__notifyShapeChanged(self._selectedShape.boundingBox)
+            self.__rerouteInvalidatedLinks()
             return True
         else:
             return False
@@ -47,17 +183,36 @@ class GeometryController():
     def clearSelectedShape(self) -> None:
         self.__deselectShape()
 
+    # Try to select link passing not further than tolerance from point, returns true if success
+    def trySelectLink(self, point: QPoint, tolerance: float) -> bool:
+        self._selectedLink = self._linkIndex.getLinkAtPoint(point, tolerance)
+        return self._selectedLink is not None
+
+    # Clear selected link
+    def clearSelectedLink(self) -> None:
+        self._selectedLink = None
+
     # Checks if there is a shape at point without selection
     def checkShapeAtPoint(self, point: QPoint) -> bool:
+        return self.getShapeAtPoint(point) is not None
+
+    # Returns shape at point, including selected one, or None
+    def getShapeAtPoint(self, point: QPoint) -> CustomShape:
         # Fast check if specified point is inside selected shape
         if self._selectedShape and self._selectedShape.isPointOnShape(point):
-            return True
+            return self._selectedShape
 
         # If not - check collection
-        if self._shapesCollection.getShapeAtPoint(point):   
-            return True
-        else:
-            return False
+        return self._shapesCollection.getShapeAtPoint(point)
+
+    # Returns top-level shapes which bounding boxes intersect with rect, including selected one
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        shapes = self._shapesCollection.getShapesInRect(rect)
+
+        if self._selectedShape and self._selectedShape.boundingBox.intersects(rect):
+            shapes.append(self._selectedShape)
+
+        return shapes
 
     # Try to change shape position, rollback if failed, return result
     def tryMoveSelectedShape(self, newPoint: QPoint) -> bool:
@@ -65,17 +220,43 @@ class GeometryController():
         if not self._selectedShape:
             raise NoCustomShapeSelected()
 
-        oldPoint = self._selectedShape.centerPoint
+        result = self.__tryMoveDetachedShape(self._selectedShape, newPoint)
+        self.__rerouteInvalidatedLinks()
 
-        self._selectedShape.setNewCenterPoint(newPoint)
+        return result
 
-        # If collision check was successful - report success
-        if self._collisionChecker.completeCollisionCheck(self._selectedShape):
-            return True
-        # Else - rollback changes and report failure
-        else:
-            self._selectedShape.setNewCenterPoint(oldPoint)
-            return False
+    # Try to change position of any shape, rollback if failed, return result
+    # Shape is temporarily removed from collection, same way as selected shape
+    def tryMoveShape(self, shape: CustomShape, newPoint: QPoint) -> bool:
+        if shape == self._selectedShape:
+            return self.tryMoveSelectedShape(newPoint)
+
+        self._shapesCollection.deleteShape(shape)
+        result = self.__tryMoveDetachedShape(shape, newPoint)
+        self._shapesCollection.addShape(shape)
+        self.__rerouteInvalidatedLinks()
+
+        return result
+
+    # Moves several shapes at once, e.g. for animation, returns list of moved shapes
+    # Shapes which would collide with world borders, standing shapes or each other stay in place
+    # Collection index is updated once for all moved shapes instead of removal and addition of every shape
+    # Checks work with bounding boxes of all moving shapes at once (see ShapeBoxes), and listeners get
+    # changed area merged by cells of RELOCATE_DIRTY_CELL_SIZE instead of rects of every shape
+    def tryRelocateShapes(self, targets: Dict[CustomShape, QPoint]) -> List[CustomShape]:
+        shapes = list(targets)
+        batch = ShapeBatch(shapes, self._shapesCollection.generation)
+
+        return self.__relocateShapeBatch(batch, [point.x() for point in targets.values()], [point.y() for point in targets.values()])
+
+    # Same as tryRelocateShapes for shapes given as list with coordinates of their targets, e.g. animated shapes
+    # Centers and boxes of shapes are kept between calls with the same list (see ShapeBatch), so list could be passed
+    # every frame, and shapes are read again only after shapes collection was changed in other way
+    def tryRelocateShapeList(self, shapes: List[CustomShape], centersX: List[int], centersY: List[int]) -> List[CustomShape]:
+        if self._shapeBatch is None or self._shapeBatch.shapes is not shapes or self._shapeBatch.generation != self._shapesCollection.generation:
+            self._shapeBatch = ShapeBatch(shapes, self._shapesCollection.generation)
+
+        return self.__relocateShapeBatch(self._shapeBatch, centersX, centersY)
 
     # Overload for delta_x and delta_y
     def tryMoveSelectedShapeByDelta(self, delta_x: int, delta_y: int) -> bool:
@@ -88,15 +269,51 @@ class GeometryController():
 
         return self.tryMoveSelectedShape(point)
 
+    # Moves selected shape together with all shapes connected with it by links, returns result
+    # Connected shapes are moved as one batch, if any of them is blocked, nothing is moved
+    def tryMoveSelectedShapeWithConnectedByDelta(self, delta_x: int, delta_y: int) -> bool:
+        # TODO: Add exception message
+        if not self._selectedShape:
+            raise NoCustomShapeSelected()
+
+        selectedShape = self._selectedShape
+        connectedShapes = self._linkComponents.getConnectedShapes(selectedShape)
+
+        if len(connectedShapes) == 1:
+            return self.tryMoveSelectedShapeByDelta(delta_x, delta_y)
+
+        # Selected shape is returned to collection, so it is moved in the same batch as other shapes
+        self.__deselectShape()
+
+        targets = {shape: QPoint(shape.centerPoint.x() + delta_x, shape.centerPoint.y() + delta_y) for shape in connectedShapes}
+        movedShapes = self.tryRelocateShapes(targets)
+        result = len(movedShapes) == len(targets)
+
+        if not result and movedShapes:
+            self.tryRelocateShapes({shape: QPoint(shape.centerPoint.x() - delta_x, shape.centerPoint.y() - delta_y) for shape in movedShapes})
+
+        self._shapesCollection.deleteShape(selectedShape)
+        self._selectedShape = selectedShape
+        self.__notifyShapeChanged(selectedShape.boundingBox)
+
+        return result
+
     # Try to create CustomRect using CustomShapeBaseFactory with center at specified position and report result
     # TODO: Better solution would be to accept CustomShape object from caller and delegate shape properties definition there
     def tryCreateShape(self, point: QPoint, factory: CustomShapeBaseFactory) -> bool:
         # Produce new shape via factory
         new_shape = factory.getNewCustomShape(point)
 
-        # If shape fits in desired position - add it to collection, report result in any case
-        if self._collisionChecker.completeCollisionCheck(new_shape):
+        return self.tryAddShape(new_shape)
+
+    # Try to add shape created by caller, report result
+    def tryAddShape(self, new_shape: CustomShape) -> bool:
+        # If shape fits in desired position (or free position was found) - add it to collection, report result in any case
+        if self.__checkOrFindFreePosition(new_shape, new_shape.centerPoint):
             self._shapesCollection.addShape(new_shape)
+            self._sceneStore.addShape(new_shape)
+            self.__notifyShapeChanged(new_shape.boundingBox)
+            self.__rerouteInvalidatedLinks()
             return True
         else:
             return False
@@ -108,29 +325,194 @@ class GeometryController():
         # Check if currently selected shape (if any) is the shape to be deleted
         if self._selectedShape and self._selectedShape.isPointOnShape(point):
             result = self._selectedShape
-            self.__deselectShape()
                 
         # Search among other shapes only if selected one didn't get the result
         if not result:
             result = self._shapesCollection.getShapeAtPoint(point)
 
         if result:
-            # Deletion of all related links
-            # TODO: Should be optimized along with separate class for links, separate factory, etc.
-            linksToDelete = []
-
-            for link in self._shapeLinksCollection:
-                if link._shape1 == result or link._shape2 == result:
-                    linksToDelete.append(link)
-                                         
-            for link in linksToDelete:
-                self._shapeLinksCollection.remove(link)
-
-            self._shapesCollection.deleteShape(result)
+            self.deleteShape(result)
+            return True
+        else:
+            return False
+
+    # Deletes shape along with its links
+    def deleteShape(self, shape: CustomShape) -> None:
+        if shape == self._selectedShape:
+            self.__deselectShape()
+
+        self.__notifyShapeChanged(shape.boundingBox, self.__getShapeLinkSegments(shape))
+
+        # Deletion of all related links, including links of shapes inside of group
+        for link in self.__getShapeLinks(shape):
+            self.__removeLink(link)
+
+        for treeShape in shape.iterShapeTree():
+            self._shapeLinksMap.pop(treeShape, None)
+
+        self._linkComponents.removeShapes(shape.iterShapeTree())
+        self._shapesCollection.deleteShape(shape)
+        self._sceneStore.removeShape(shape)
+        self.__rerouteInvalidatedLinks()
+
+    # Deletes shapes which are completely inside of rect along with their links, returns number of deleted shapes
+    def deleteShapesInRect(self, rect: QRect) -> int:
+        return self.deleteShapes(self.__getShapesInsideRect(rect))
+
+    # Deletes shapes for which predicate returns true along with their links, returns number of deleted shapes
+    def deleteShapesMatching(self, predicate: Callable[[CustomShape], bool]) -> int:
+        shapes = [shape for shape in self._shapesCollection.shapesList if predicate(shape)]
+
+        if self._selectedShape and predicate(self._selectedShape):
+            shapes.append(self._selectedShape)
+
+        return self.deleteShapes(shapes)
+
+    # Deletes several shapes along with their links, returns number of deleted shapes
+    # Collections are compacted once for all shapes, instead of separate removal of every shape and link
+    def deleteShapes(self, shapes: Iterable[CustomShape]) -> int:
+        timerStart = PERF_MONITOR.startTimer()
+
+        shapesToDelete = set(shapes)
+
+        if not shapesToDelete:
+            return 0
+
+        # Selected shape is not in collection, so it is just forgotten
+        if self._selectedShape in shapesToDelete:
+            self._selectedShape = None
+
+        # Deleted shapes along with shapes inside of deleted groups
+        removedShapes = set()
+        linksToDelete = set()
+
+        for shape in shapesToDelete:
+            self.__notifyShapeChanged(shape.boundingBox, self.__getShapeLinkSegments(shape))
+
+            for treeShape in shape.iterShapeTree():
+                removedShapes.add(treeShape)
+                linksToDelete.update(self._shapeLinksMap.pop(treeShape, []))
+
+        for link in linksToDelete:
+            self._sceneStore.removeLink(link)
+            self._linkRouter.removeLink(link)
+            self._linkIndex.removeLink(link)
+
+            # Links of remaining shapes are removed one by one, there are only few of them per shape
+            for shape in (link._shape1, link._shape2):
+                if shape not in removedShapes:
+                    self._shapeLinksMap[shape].remove(link)
+
+        if self._selectedLink in linksToDelete:
+            self._selectedLink = None
+
+        self._shapeLinksCollection[:] = [link for link in self._shapeLinksCollection if link not in linksToDelete]
+        self._linkComponents.removeShapes(removedShapes)
+        self._shapesCollection.deleteShapes(shapesToDelete)
+
+        for shape in shapesToDelete:
+            self._sceneStore.removeShape(shape)
+
+        self.__rerouteInvalidatedLinks()
+
+        PERF_MONITOR.stopTimer("delete.bulk", timerStart)
+        return len(shapesToDelete)
+
+    # Combines shapes which are completely inside of rect into group, returns the group or None if there are less than 2 shapes
+    def groupShapesInRect(self, rect: QRect) -> CustomGroup:
+        return self.groupShapes(self.__getShapesInsideRect(rect))
+
+    # Combines top-level shapes into group, which is stored in collection as single shape
+    # Links of grouped shapes stay, links between them become links of the group
+    # Returns the group or None if there are less than 2 shapes
+    def groupShapes(self, shapes: List[CustomShape]) -> CustomGroup:
+        shapes = list(dict.fromkeys(shapes))
+
+        if len(shapes) < 2:
+            return None
+
+        if self._selectedShape in shapes:
+            self.__deselectShape()
+
+        groupedShapes = {treeShape for shape in shapes for treeShape in shape.iterShapeTree()}
+        links = list(dict.fromkeys(link for shape in shapes for link in self.__getShapeLinks(shape)))
+
+        # Grouped shapes are not top-level anymore, links in store are saved again with new addresses of shapes
+        for link in links:
+            self._sceneStore.removeLink(link)
+
+        self._shapesCollection.deleteShapes(shapes)
+
+        for shape in shapes:
+            self._sceneStore.removeShape(shape)
+
+        group = CustomGroup(shapes, [link for link in links if link._shape1 in groupedShapes and link._shape2 in groupedShapes])
+
+        self._shapesCollection.addShape(group)
+        self._sceneStore.addShape(group)
+        self._linkComponents.addGroup(group)
+
+        for link in links:
+            self._sceneStore.addLink(link)
+
+        self.__notifyShapeChanged(group.boundingBox)
+        self.__rerouteInvalidatedLinks()
+
+        return group
+
+    # Splits group at point back into separate shapes, returns true if success
+    def tryUngroupShapeAtPoint(self, point: QPoint) -> bool:
+        if self._selectedShape and self._selectedShape.isPointOnShape(point):
+            self.__deselectShape()
+
+        group = self._shapesCollection.getShapeAtPoint(point)
+
+        if not isinstance(group, CustomGroup):
+            return False
+
+        self.ungroupShape(group)
+        return True
+
+    # Splits group, which is in collection, back into separate shapes
+    # Links of the group itself are deleted, since there is no group to link anymore, links of shapes inside stay
+    def ungroupShape(self, group: CustomGroup) -> None:
+        for link in list(self._shapeLinksMap.pop(group, [])):
+            self.deleteLink(link)
+
+        links = self.__getShapeLinks(group)
+
+        for link in links:
+            self._sceneStore.removeLink(link)
+
+        self._shapesCollection.deleteShape(group)
+        self._sceneStore.removeShape(group)
+        self._linkComponents.removeGroup(group)
+
+        for shape in group.ungroup():
+            self._shapesCollection.addShape(shape)
+            self._sceneStore.addShape(shape)
+
+        for link in links:
+            self._sceneStore.addLink(link)
+
+        self.__notifyShapeChanged(group.boundingBox)
+        self.__rerouteInvalidatedLinks()
+
+    # Try to delete link passing not further than tolerance from point, returns true if success
+    def tryDeleteLinkAtPoint(self, point: QPoint, tolerance: float) -> bool:
+        link = self._linkIndex.getLinkAtPoint(point, tolerance)
+
+        if link:
+            self.deleteLink(link)
             return True
         else:
             return False
 
+    # Deletes single link, linked shapes stay in place
+    def deleteLink(self, link: ShapesLinkBase) -> None:
+        self.__notifyShapeChanged(None, link.getSegments())
+        self.__removeLink(link)
+
     # Attempts to fins shape at point and link it with selected shape, reports result, clears selected shape after action
     def tryLinkWithSelectedShape(self, point: QPoint) -> bool:
         # TODO: Add exception message
@@ -139,19 +521,77 @@ class GeometryController():
         
         shape_2 = self._shapesCollection.getShapeAtPoint(point)
 
-        if shape_2 and self._selectedShape != shape_2:
-            self._shapeLinksCollection.append(ShapesLinkLine(self._selectedShape, shape_2))
+        if shape_2 and self.tryLinkShapes(self._selectedShape, shape_2):
             self.__deselectShape()
             return True
         
         else:
             return False
 
+    # Creates link between two different shapes, reports result
+    def tryLinkShapes(self, shape_1: CustomShape, shape_2: CustomShape) -> bool:
+        if shape_1 == shape_2 or self.getShapeId(shape_1) is None or self.getShapeId(shape_2) is None:
+            return False
+
+        link = self.__addLink(shape_1, shape_2, self._routedLinksEnabled)
+
+        self.__notifyShapeChanged(None, link.getSegments())
+        return True
+
+    # Returns top-level shapes, links as (shape 1, shape 2, routed) and index of shapes collection, e.g. to save them to file
+    # Selected shape is returned to collection first, so every shape is in the index
+    def getSceneContent(self) -> tuple:
+        self.__deselectShape()
+
+        links = [(link._shape1, link._shape2, isinstance(link, ShapesLinkRouted)) for link in self._shapeLinksCollection]
+
+        return list(self._shapesCollection.shapesList), links, self._shapesCollection.exportIndex()
+
+    # Replaces scene with shapes and links, e.g. loaded from file
+    # Saved index of shapes collection is adopted if it is valid, otherwise collection is rebuilt in bulk
+    # Returns true if saved index was adopted
+    def loadSceneContent(self, shapes: List[CustomShape], links: List[tuple], index: dict = None) -> bool:
+        timerStart = PERF_MONITOR.startTimer()
+
+        self.clearGeometry()
+        indexAdopted = self._shapesCollection.loadShapes(shapes, index)
+
+        for shape in shapes:
+            self._sceneStore.addShape(shape)
+
+            # Links of groups are restored below together with other links
+            for treeShape in shape.iterShapeTree():
+                if isinstance(treeShape, CustomGroup):
+                    treeShape.links.clear()
+                    self._linkComponents.addGroup(treeShape)
+
+        for shape_1, shape_2, routed in links:
+            link = self.__addLink(shape_1, shape_2, routed)
+
+            # Link between shapes of group belongs to the group and to all groups containing it
+            groups_1 = set(GeometryController.__getParentGroups(shape_1))
+
+            for group in GeometryController.__getParentGroups(shape_2):
+                if group in groups_1:
+                    group.links.append(link)
+
+        PERF_MONITOR.stopTimer("scene.load", timerStart)
+        return indexAdopted
+
     # Clears stored geometry
     def clearGeometry(self) -> None:
         self._shapeLinksCollection.clear()
+        self._shapeLinksMap.clear()
+        self._linkComponents.clear()
         self._shapesCollection.clearCollection()
+        self._sceneStore.clear()
+        self._linkIndex.clear()
         self._selectedShape = None
+        self._selectedLink = None
+        self._shapeBatch = None
+
+        for listener in self._changeListeners:
+            listener.onGeometryCleared()
 
     # Draws saved geometry using provided QPainter
     def drawGeomerty(self, painter: QPainter) -> None:
@@ -164,11 +604,317 @@ class GeometryController():
         for link in self._shapeLinksCollection:
             link.drawLink(painter)
 
+    # Draws only geometry visible in specified world rect, painter should be set to world coordinates
+    # Scale is number of view pixels per world unit, shapes narrower than a pixel are drawn as density cells
+    # Selected shape could be excluded to be drawn separately, since it changes most frequently
+    def drawGeometryInRect(self, painter: QPainter, rect: QRect, scale: float = 1.0, includeSelected: bool = True) -> None:
+        pixelSize = 1 / scale
+
+        if self._shapesCollection.maxShapeWidth < pixelSize:
+            # Every shape is narrower than a pixel - skip individual shapes entirely
+            visibleShapes = []
+        else:
+            visibleShapes = [shape for shape in self._shapesCollection.getShapesInRect(rect) if shape.boundingBox.width() >= pixelSize]
+            # Only visible parts of groups are drawn
+            visibleShapes = expandGroupsInRect(visibleShapes, rect)
+
+        # Density cells are used only if there are shapes which are not drawn individually
+        if self._shapesCollection.minShapeWidth < pixelSize:
+            cellSize = max(round(constants.LOD_CELL_SIZE_PX * pixelSize), 1)
+
+            self._densityGridCache.getDensityCells(self._shapesCollection.shapesList, self._shapesCollection.generation, cellSize, pixelSize)
+            self._densityGridCache.drawDensityCells(painter, (rect.left() // cellSize, rect.top() // cellSize,
+                                                              rect.right() // cellSize, rect.bottom() // cellSize))
+
+        if includeSelected:
+            self.drawSelectedShape(painter)
+
+        drawShapesGrouped(painter, visibleShapes)
+
+        # Links are drawn if area between linked shapes is visible and at least one of shapes is not aggregated
+        drawLinksBatched(painter, (link for link in self._shapeLinksCollection
+                                   if link.boundingBox.intersects(rect)
+                                   and (link._shape1.boundingBox.width() >= pixelSize or link._shape2.boundingBox.width() >= pixelSize)))
+
+        if includeSelected:
+            self.drawSelectedLink(painter)
+
+    # Draws selected shape only
+    def drawSelectedShape(self, painter: QPainter) -> None:
+        if self._selectedShape:
+            self._selectedShape.drawCustomShape(painter)
+
+    # Draws highlight of selected link on top of regular geometry
+    def drawSelectedLink(self, painter: QPainter) -> None:
+        if self._selectedLink:
+            self._selectedLink.drawHighlight(painter)
+
     # Internal method for proper selection removal and return selected shape to collection
     def __deselectShape(self) -> None:
         if self._selectedShape:
             self._shapesCollection.addShape(self._selectedShape)
+            self.__notifyShapeChanged(self._selectedShape.boundingBox)
             self._selectedShape = None
+            self.__rerouteInvalidatedLinks()
+
+    # Moves shape which is not in collection, rollback if failed, return result
+    def __tryMoveDetachedShape(self, shape: CustomShape, newPoint: QPoint) -> bool:
+        oldPoint = shape.centerPoint
+
+        # Old geometry is saved to notify listeners after successful move
+        oldBoundingBox = QRect(shape.boundingBox)
+        oldLinkSegments = self.__getShapeLinkSegments(shape)
+
+        shape.setNewCenterPoint(newPoint)
+
+        # If collision check was successful - report success
+        if self.__checkOrFindFreePosition(shape, newPoint):
+            self._sceneStore.updateShape(shape)
+            self.__notifyShapeChanged(oldBoundingBox, oldLinkSegments)
+            # New link segments are taken after listeners learned about new shape position, so routes are up to date
+            self.__notifyShapeChanged(shape.boundingBox)
+            self.__notifyShapeChanged(None, self.__getShapeLinkSegments(shape))
+
+            for link in self.__getShapeLinks(shape):
+                self._linkIndex.updateLink(link)
+                self._sceneStore.updateLink(link)
+
+            return True
+        # Else - rollback changes and report failure
+        else:
+            shape.setNewCenterPoint(oldPoint)
+            return False
+
+    # Checks if shape collides at its current position
+    # If it does and free position search is enabled - moves shape to the nearest free position near desired point
+    # Selected shape is not in collection, so it is checked separately and given to the search as one more obstacle
+    def __checkOrFindFreePosition(self, shape: CustomShape, desiredPoint: QPoint) -> bool:
+        if self._collisionChecker.completeCollisionCheck(shape) and not self.__collidesWithSelectedShape(shape):
+            return True
+
+        if not self._findFreePositionEnabled:
+            return False
+
+        otherObstacles = [self._selectedShape] if self._selectedShape else []
+        freePoint = self._freePositionFinder.findNearestFreeCenter(shape, desiredPoint, otherObstacles)
+
+        if freePoint is None:
+            return False
+
+        shape.setNewCenterPoint(freePoint)
+        return True
+
+    # Moves shapes of batch to targets, shapes should be in collection or be the selected one, which stays in place
+    def __relocateShapeBatch(self, batch: ShapeBatch, centersX: List[int], centersY: List[int]) -> List[CustomShape]:
+        timerStart = PERF_MONITOR.startTimer()
+
+        targets = batch.getTargets(centersX, centersY)
+        movingIndexes = batch.getMovingIndexes(targets, self._selectedShape)
+        movingShapes = batch.getShapes(movingIndexes)
+        oldBoxes = batch.getBoxes(movingIndexes)
+        newBoxes = batch.getTargetBoxes(movingIndexes, targets)
+
+        # Old link segments are needed only for shapes with links, groups could have linked children
+        oldLinkSegments = {shape: self.__getShapeLinkSegments(shape) for shape in self.__getLinkedShapes(movingShapes)}
+
+        batch.moveShapes(movingIndexes, targets)
+
+        blockedShapes = self.__getShapesBlockedByStanding(newBoxes)
+        boxes, _ = self.__restoreBlockedShapes(batch, movingIndexes, blockedShapes, newBoxes, oldBoxes)
+        restoredBoxes = None
+
+        # Shapes returned to old positions could block other moving shapes, so check repeats until nothing changes
+        # After the first check, only collisions of shapes returned by previous step are checked
+        # Old positions never collide with each other, so pairs of stopped shapes do not block anything
+        while True:
+            newlyBlockedShapes = self._collisionChecker.getMutuallyCollidingShapes(boxes, restoredBoxes) - blockedShapes
+
+            if not newlyBlockedShapes:
+                break
+
+            blockedShapes |= newlyBlockedShapes
+            boxes, restoredBoxes = self.__restoreBlockedShapes(batch, movingIndexes, newlyBlockedShapes, boxes, oldBoxes)
+
+        movedShapes = [shape for shape in movingShapes if shape not in blockedShapes] if blockedShapes else list(movingShapes)
+
+        # Blocked shapes are relocated to the same boxes they had, which changes nothing, so boxes are not split
+        self._shapesCollection.relocateShapeBoxes(oldBoxes, boxes)
+        batch.commitMove(movingIndexes, boxes, self._shapesCollection.generation)
+        self._sceneStore.updateShapes(movedShapes)
+
+        # Moving shapes boxes before and after move, merged by cells
+        for rect in ShapeBoxes.getMergedRects([oldBoxes.united(boxes)], constants.RELOCATE_DIRTY_CELL_SIZE):
+            self.__notifyShapeChanged(rect)
+
+        movedLinkedShapes = [shape for shape in oldLinkSegments if shape not in blockedShapes]
+
+        for shape in movedLinkedShapes:
+            self.__notifyShapeChanged(None, oldLinkSegments[shape])
+
+        # New link segments are taken after listeners learned about new shapes positions, so routes are up to date
+        movedLinks = {link for shape in movedLinkedShapes for link in self.__getShapeLinks(shape)}
+
+        for link in movedLinks:
+            self.__notifyShapeChanged(None, link.getSegments())
+            self._linkIndex.updateLink(link)
+            self._sceneStore.updateLink(link)
+
+        self.__rerouteInvalidatedLinks()
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.stopTimer("relocate.batch", timerStart)
+            PERF_MONITOR.addSample("relocate.blocked", len(blockedShapes))
+
+        return movedShapes
+
+    # Moves blocked shapes back, returns boxes of moving shapes, where boxes of blocked shapes are replaced with old ones,
+    # and old boxes of blocked shapes
+    @staticmethod
+    def __restoreBlockedShapes(batch: ShapeBatch, movingIndexes, blockedShapes: set[CustomShape],
+                               boxes: ShapeBoxes, oldBoxes: ShapeBoxes) -> tuple:
+        if not blockedShapes:
+            return boxes, None
+
+        batch.restoreShapes(blockedShapes)
+        blockedPositions = batch.getPositions(movingIndexes, blockedShapes)
+
+        return boxes.replaced(blockedPositions, oldBoxes), oldBoxes.take(blockedPositions)
+
+    # Shapes of the list, which have links or have linked children
+    # Linked shapes are found from links map, when there are fewer linked shapes than shapes in the list
+    def __getLinkedShapes(self, shapes: List[CustomShape]) -> List[CustomShape]:
+        if len(self._shapeLinksMap) >= len(shapes):
+            return [shape for shape in shapes if shape.childShapes or self._shapeLinksMap.get(shape)]
+
+        shapesSet = set(shapes) if self._shapeLinksMap else set()
+        linkedShapes = {}
+
+        for shape, links in self._shapeLinksMap.items():
+            # Linked shape could be inside of group from the list
+            while links and shape.parentGroup is not None:
+                shape = shape.parentGroup
+
+            if links and shape in shapesSet:
+                linkedShapes[shape] = None
+
+        return list(linkedShapes)
+
+    def __collidesWithSelectedShape(self, shape: CustomShape) -> bool:
+        if self._selectedShape is None or self._selectedShape == shape:
+            return False
+
+        return shape.checkIntersectionBoundary(self._selectedShape) and self._selectedShape.checkIntersectionPrecise(shape)
+
+    # Moving shapes, which collide with world borders or with shapes not moving in the same batch
+    # When most shapes of collection are moving, standing ones are taken from shapes list
+    # Otherwise standing shapes are requested from collection only around moving shapes, by cells of merged area
+    # Index points of moving shapes are outdated, but moving shapes are skipped anyway
+    def __getShapesBlockedByStanding(self, movingBoxes: ShapeBoxes) -> set[CustomShape]:
+        blockedShapes = set(self._collisionChecker.getShapesOutsideArea(movingBoxes))
+
+        standingCount = len(self._shapesCollection.shapesList) - len(movingBoxes)
+        movingShapes = set(movingBoxes.shapes) if standingCount else set()
+
+        if standingCount <= len(movingBoxes):
+            standingShapes = [shape for shape in self._shapesCollection.shapesList if shape not in movingShapes] if standingCount else []
+
+            if self._selectedShape:
+                standingShapes.append(self._selectedShape)
+        else:
+            standingShapes = {}
+
+            for rect in ShapeBoxes.getMergedRects([movingBoxes], constants.RELOCATE_DIRTY_CELL_SIZE):
+                standingShapes.update(dict.fromkeys(shape for shape in self.getShapesInRect(rect) if shape not in movingShapes))
+
+            standingShapes = list(standingShapes)
+
+        for shape, other in movingBoxes.getIntersectingPairs(ShapeBoxes(standingShapes)):
+            if shape not in blockedShapes and other.checkIntersectionPrecise(shape):
+                blockedShapes.add(shape)
+
+        return blockedShapes
+
+    # Top-level shapes completely inside of rect, including selected shape
+    def __getShapesInsideRect(self, rect: QRect) -> List[CustomShape]:
+        shapes = [shape for shape in self._shapesCollection.getShapesInRect(rect) if rect.contains(shape.boundingBox)]
+
+        if self._selectedShape and rect.contains(self._selectedShape.boundingBox):
+            shapes.append(self._selectedShape)
+
+        return shapes
+
+    # Obstacles for link routes are shapes inside of groups, so links could go between grouped shapes
+    def __getRouteObstacles(self, rect: QRect) -> List[CustomShape]:
+        return [shape for shape in expandGroupsInRect(self.getShapesInRect(rect), rect) if not shape.childShapes]
+
+    # Calculates new routes for links, which routes were affected by geometry changes, and notifies listeners
+    # Should be called after change is complete, so routes are calculated for actual geometry
+    def __rerouteInvalidatedLinks(self) -> None:
+        for link, oldRoute in self._linkRouter.takeInvalidatedRoutes():
+            oldSegments = list(zip(oldRoute, oldRoute[1:]))
+            self.__notifyShapeChanged(None, oldSegments + link.getSegments())
+            self._linkIndex.updateLink(link)
+            self._sceneStore.updateLink(link)
+
+    # Creates link and adds it to all collections, listeners should be notified by caller
+    def __addLink(self, shape_1: CustomShape, shape_2: CustomShape, routed: bool) -> ShapesLinkBase:
+        if routed:
+            link = ShapesLinkRouted(shape_1, shape_2, self._linkRouter)
+        else:
+            link = ShapesLinkLine(shape_1, shape_2)
+
+        self._shapeLinksCollection.append(link)
+        self._sceneStore.addLink(link)
+        self._shapeLinksMap.setdefault(shape_1, []).append(link)
+        self._shapeLinksMap.setdefault(shape_2, []).append(link)
+        self._linkComponents.addLink(shape_1, shape_2)
+        self._linkIndex.updateLink(link)
+
+        return link
+
+    # Removes link from all collections, listeners should be notified by caller
+    def __removeLink(self, link: ShapesLinkBase) -> None:
+        self._shapeLinksCollection.remove(link)
+        self._sceneStore.removeLink(link)
+        self._linkRouter.removeLink(link)
+        self._linkIndex.removeLink(link)
+
+        for shape in (link._shape1, link._shape2):
+            if link in self._shapeLinksMap.get(shape, []):
+                self._shapeLinksMap[shape].remove(link)
+
+        self._linkComponents.removeLink(link._shape1, link._shape2)
+
+        if link == self._selectedLink:
+            self._selectedLink = None
+
+    # Returns links connected to shape or to shapes inside of it, if shape is a group
+    def __getShapeLinks(self, shape: CustomShape) -> List[ShapesLinkBase]:
+        return list(dict.fromkeys(link for treeShape in shape.iterShapeTree() for link in self._shapeLinksMap.get(treeShape, [])))
+
+    # Returns segments of all links connected to shape
+    def __getShapeLinkSegments(self, shape: CustomShape) -> List[tuple]:
+        return [segment for link in self.__getShapeLinks(shape) for segment in link.getSegments()]
+
+    # Groups containing the shape, from the closest one
+    @staticmethod
+    def __getParentGroups(shape: CustomShape) -> List[CustomGroup]:
+        groups = []
+
+        while shape.parentGroup is not None:
+            shape = shape.parentGroup
+            groups.append(shape)
+
+        return groups
+
+    # Notifies listeners about changed shape area and link segments
+    def __notifyShapeChanged(self, boundingBox: QRect, linkSegments: List[tuple] = None) -> None:
+        for listener in self._changeListeners:
+            if boundingBox:
+                listener.onRectChanged(boundingBox)
+
+            for point_1, point_2 in linkSegments or []:
+                listener.onSegmentChanged(point_1, point_2)
 
 class NoCustomShapeSelected(Exception):
-    pass
\ No newline at end of file
+    pass
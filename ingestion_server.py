@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import threading
+from queue import SimpleQueue, Empty
+from time import perf_counter
+from typing import Callable
+
+from PyQt5.QtCore import QPoint, QTimer
+
+import constants
+from custom_shape import CustomShapeBaseFactory
+from geometry_controller import GeometryController
+from performance_monitor import PERF_MONITOR
+
+# Range of coordinates accepted in messages, QPoint keeps coordinates as int32
+COORDINATE_MIN = -2 ** 31
+COORDINATE_MAX = 2 ** 31 - 1
+
+# Local socket server which receives scene updates from external system
+#
+# Protocol: each message is JSON object on a separate line, each message gets reply line with the same "id":
+#   {"id": 1, "op": "create", "x": 100, "y": 100}               -> {"id": 1, "ok": true, "shape": 0}
+#   {"id": 2, "op": "move", "shape": 0, "x": 300, "y": 100}     -> {"id": 2, "ok": true}
+#   {"id": 3, "op": "link", "shape1": 0, "shape2": 1}           -> {"id": 3, "ok": true}
+#   {"id": 4, "op": "delete", "shape": 0}                       -> {"id": 4, "ok": true}
+# Failed messages get {"id": ..., "ok": false, "error": "..."}
+#
+# Asyncio loop runs in separate thread and only parses messages, geometry is changed on GUI thread:
+# frame timer takes queued messages and applies them in batch, so Qt event loop is never blocked by network
+# Number of messages waiting for reply is limited - when limit is reached, server stops reading sockets,
+# which makes clients block on write (backpressure)
+class IngestionServer():
+    def __init__(self, geometryController: GeometryController, shapeFactory: CustomShapeBaseFactory, socketPath: str, onSceneChanged: Callable[[], None]) -> None:
+        self._geometryController = geometryController
+        self._shapeFactory = shapeFactory
+        self._socketPath = socketPath
+        # Called on GUI thread after batch changed the scene
+        self._onSceneChanged = onSceneChanged
+
+        # Messages passed from asyncio thread to GUI thread as (message or error, reply writer)
+        self._incomingMessages = SimpleQueue()
+
+        self._loop: asyncio.AbstractEventLoop = None
+        self._pendingMessagesLimit: asyncio.Semaphore = None
+        self._loopThread: threading.Thread = None
+        self._serverStarted = threading.Event()
+
+        self._frameTimer = QTimer()
+        self._frameTimer.setInterval(constants.INGESTION_FRAME_INTERVAL_MS)
+        self._frameTimer.timeout.connect(self.processPendingMessages)
+
+    # Starts listening in background thread and processing messages on GUI thread
+    def start(self) -> None:
+        self._loopThread = threading.Thread(target=self.__runLoop, daemon=True)
+        self._loopThread.start()
+        self._serverStarted.wait()
+
+        self._frameTimer.start()
+
+    def stop(self) -> None:
+        self._frameTimer.stop()
+
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loopThread.join()
+
+        if os.path.exists(self._socketPath):
+            os.remove(self._socketPath)
+
+    # Applies messages received since last frame, limited by count and time budget
+    # Called by frame timer on GUI thread
+    def processPendingMessages(self) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+        deadline = perf_counter() + constants.INGESTION_FRAME_BUDGET_MS / 1000
+
+        processedCount = 0
+        sceneChanged = False
+
+        while processedCount < constants.INGESTION_MAX_MESSAGES_PER_FRAME and perf_counter() < deadline:
+            try:
+                message, writer = self._incomingMessages.get_nowait()
+            except Empty:
+                break
+
+            reply = self.__applyMessage(message)
+            sceneChanged = sceneChanged or reply["ok"]
+            processedCount += 1
+
+            self._loop.call_soon_threadsafe(self.__sendReply, writer, reply)
+
+        if sceneChanged:
+            self._onSceneChanged()
+
+        if processedCount and PERF_MONITOR.enabled:
+            PERF_MONITOR.addSample("ingestion.batch_size", processedCount)
+            PERF_MONITOR.stopTimer("ingestion.batch", timerStart)
+
+    # Applies single message to geometry and returns reply, runs on GUI thread
+    def __applyMessage(self, message: dict) -> dict:
+        reply = {"id": message.get("id"), "ok": False}
+
+        if "error" in message:
+            reply["error"] = message["error"]
+            return reply
+
+        try:
+            match message.get("op"):
+                case "create":
+                    shape = self._shapeFactory.getNewCustomShape(self.__getPoint(message))
+
+                    if self._geometryController.tryAddShape(shape):
+                        reply["ok"] = True
+                        reply["shape"] = self._geometryController.getShapeId(shape)
+                    else:
+                        reply["error"] = "Shape collides with other shape or world border"
+
+                case "move":
+                    shape = self.__getShape(message["shape"])
+
+                    if self._geometryController.tryMoveShape(shape, self.__getPoint(message)):
+                        reply["ok"] = True
+                    else:
+                        reply["error"] = "Shape collides with other shape or world border"
+
+                case "delete":
+                    self._geometryController.deleteShape(self.__getShape(message["shape"]))
+                    reply["ok"] = True
+
+                case "link":
+                    if self._geometryController.tryLinkShapes(self.__getShape(message["shape1"]), self.__getShape(message["shape2"])):
+                        reply["ok"] = True
+                    else:
+                        reply["error"] = "Shape could not be linked to itself"
+
+                case operation:
+                    reply["error"] = f"Unknown operation: {operation}"
+
+        except KeyError as error:
+            reply["error"] = f"Missing field: {error}"
+        except (TypeError, ValueError, OverflowError) as error:
+            reply["error"] = f"Invalid field value: {error}"
+        except UnknownShapeId as error:
+            reply["error"] = str(error)
+
+        return reply
+
+    # Point from "x" and "y" fields, coordinates should fit into int32 used by QPoint
+    # Infinite and huge values are rejected here, since QPoint would raise OverflowError
+    @staticmethod
+    def __getPoint(message: dict) -> QPoint:
+        coordinates = [int(message["x"]), int(message["y"])]
+
+        if any(not COORDINATE_MIN <= coordinate <= COORDINATE_MAX for coordinate in coordinates):
+            raise ValueError(f"coordinates should be in range from {COORDINATE_MIN} to {COORDINATE_MAX}")
+
+        return QPoint(*coordinates)
+
+    def __getShape(self, shapeId: int):
+        shape = self._geometryController.getShapeById(shapeId)
+
+        if shape is None:
+            raise UnknownShapeId(f"Unknown shape: {shapeId}")
+
+        return shape
+
+    # Asyncio thread main function
+    def __runLoop(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        self._pendingMessagesLimit = asyncio.Semaphore(constants.INGESTION_MAX_PENDING_MESSAGES)
+
+        if os.path.exists(self._socketPath):
+            os.remove(self._socketPath)
+
+        server = self._loop.run_until_complete(asyncio.start_unix_server(self.__handleClient, path=self._socketPath))
+        self._serverStarted.set()
+
+        try:
+            self._loop.run_forever()
+        finally:
+            server.close()
+            self._loop.close()
+
+    # Reads messages of single client, runs in asyncio thread
+    async def __handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+
+                # Wait until GUI thread processes enough of earlier messages
+                await self._pendingMessagesLimit.acquire()
+                # Do not read further while client does not read replies
+                await writer.drain()
+
+                self._incomingMessages.put((IngestionServer.__parseMessage(line), writer))
+        except ConnectionError:
+            pass
+
+    # Sends reply and frees place for next message, runs in asyncio thread
+    def __sendReply(self, writer: asyncio.StreamWriter, reply: dict) -> None:
+        self._pendingMessagesLimit.release()
+
+        if not writer.is_closing():
+            writer.write((json.dumps(reply) + "\n").encode())
+
+    # Parsing errors are reported as messages with error, so reply order matches message order
+    @staticmethod
+    def __parseMessage(line: bytes) -> dict:
+        try:
+            message = json.loads(line)
+        except ValueError as error:
+            return {"error": f"Invalid JSON: {error}"}
+
+        if not isinstance(message, dict):
+            return {"error": "Message should be JSON object"}
+
+        return message
+
+class UnknownShapeId(Exception):
+    pass
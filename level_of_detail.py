@@ -0,0 +1,59 @@
+from typing import Dict, Iterable
+
+from PyQt5.QtGui import QPainter, QColor
+from PyQt5.QtCore import Qt
+
+from custom_shape import CustomShape
+
+# Aggregates shapes narrower than a view pixel into square density cells
+# Drawing one cell per group of tiny shapes keeps zoomed-out overview of huge scenes interactive
+#
+# Aggregation is cached and rebuilt only when collection generation or cell size changes,
+# so panning over the overview does not iterate shapes at all
+class DensityGridCache():
+    def __init__(self) -> None:
+        self._cells: Dict[tuple, float] = {}
+        self._generation = -1
+        self._cellSize = 0
+
+    # Returns coverage (0 - 1) of each non-empty cell by shapes narrower than maxShapeWidth
+    def getDensityCells(self, shapes: Iterable[CustomShape], generation: int, cellSize: int, maxShapeWidth: float) -> Dict[tuple, float]:
+        if generation != self._generation or cellSize != self._cellSize:
+            self.__rebuild(shapes, cellSize, maxShapeWidth)
+            self._generation = generation
+            self._cellSize = cellSize
+
+        return self._cells
+
+    # Draws cells intersecting with specified range of cells, painter should be set to world coordinates
+    def drawDensityCells(self, painter: QPainter, cellsRange: tuple) -> None:
+        firstCellX, firstCellY, lastCellX, lastCellY = cellsRange
+        cellSize = self._cellSize
+
+        painter.setPen(Qt.PenStyle.NoPen)
+
+        for (cellX, cellY), coverage in self._cells.items():
+            if firstCellX <= cellX <= lastCellX and firstCellY <= cellY <= lastCellY:
+                painter.setBrush(QColor(0, 0, 0, int(255 * coverage)))
+                painter.drawRect(cellX * cellSize, cellY * cellSize, cellSize, cellSize)
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._generation = -1
+
+    def __rebuild(self, shapes: Iterable[CustomShape], cellSize: int, maxShapeWidth: float) -> None:
+        cellArea = cellSize * cellSize
+        self._cells = {}
+
+        for shape in shapes:
+            boundingBox = shape.boundingBox
+
+            if boundingBox.width() >= maxShapeWidth:
+                continue
+
+            center = shape.centerPoint
+            key = (center.x() // cellSize, center.y() // cellSize)
+            self._cells[key] = self._cells.get(key, 0) + boundingBox.width() * boundingBox.height()
+
+        for key, area in self._cells.items():
+            self._cells[key] = min(area / cellArea, 1.0)
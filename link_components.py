@@ -0,0 +1,268 @@
+from collections import deque
+from itertools import count
+from typing import Dict, Iterable, List, Set
+
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+
+# Connected components of graph of shapes, where edges are links between shapes and group membership
+# Shapes of group belong to the same component as the group, so component of top-level shape includes everything inside it
+#
+# Every shape keeps id of its component, so lookup is a single dict access
+# Addition of edge unites components by size: shapes of smaller component get id of the bigger one,
+# so every shape changes its id O(log n) times at most over all additions
+# Removal of edge or shape is local: only affected component is searched for parts which are not connected anymore
+# - edge removal searches from both ends of the edge in turns and stops when searches meet or one of them is exhausted,
+#   so cost is proportional to the smaller part when component splits
+# - shapes or group removal relabels remaining shapes of affected components
+#
+# Shapes without links and groups are not stored, each of them is a component by itself
+class ConnectedComponents():
+    def __init__(self) -> None:
+        # Numbers of links between pairs of shapes, links could be duplicated
+        self._linkNeighbours: Dict[CustomShape, Dict[CustomShape, int]] = {}
+        # Group membership: group of each stored shape and shapes of each stored group
+        self._groups: Dict[CustomShape, CustomShape] = {}
+        self._groupShapes: Dict[CustomShape, List[CustomShape]] = {}
+
+        # Component id of each stored shape, shapes and number of links of each component
+        self._componentIds: Dict[CustomShape, int] = {}
+        self._componentShapes: Dict[int, Set[CustomShape]] = {}
+        self._componentLinksCounts: Dict[int, int] = {}
+        self._nextComponentId = count()
+
+    # Number of components with more than one shape
+    @property
+    def componentsCount(self) -> int:
+        return len(self._componentShapes)
+
+    # Id of component shape belongs to, None if shape has no links and is not in group
+    def getComponentId(self, shape: CustomShape) -> int:
+        return self._componentIds.get(shape)
+
+    # All shapes of component, including shapes inside of groups
+    def getComponentShapes(self, shape: CustomShape) -> Set[CustomShape]:
+        componentId = self._componentIds.get(shape)
+        return set(self._componentShapes[componentId]) if componentId is not None else {shape}
+
+    # Top-level shapes of component, which should be selected or moved together with shape
+    def getConnectedShapes(self, shape: CustomShape) -> List[CustomShape]:
+        componentId = self._componentIds.get(shape)
+
+        if componentId is None:
+            return [shape]
+
+        return [componentShape for componentShape in self._componentShapes[componentId] if componentShape.parentGroup is None]
+
+    # Number of top-level shapes, number of all shapes including grouped ones, and number of links in component
+    def getComponentStatistics(self, shape: CustomShape) -> dict:
+        componentId = self._componentIds.get(shape)
+
+        if componentId is None:
+            return {"shapes": 1, "allShapes": len(list(shape.iterShapeTree())), "links": 0}
+
+        componentShapes = self._componentShapes[componentId]
+
+        return {"shapes": sum(1 for componentShape in componentShapes if componentShape.parentGroup is None),
+                "allShapes": len(componentShapes),
+                "links": self._componentLinksCounts[componentId]}
+
+    def addLink(self, shape_1: CustomShape, shape_2: CustomShape) -> None:
+        for shape, neighbour in ((shape_1, shape_2), (shape_2, shape_1)):
+            neighbours = self._linkNeighbours.setdefault(shape, {})
+            neighbours[neighbour] = neighbours.get(neighbour, 0) + 1
+
+        componentId = self.__unite(shape_1, shape_2)
+        self._componentLinksCounts[componentId] += 1
+
+    def removeLink(self, shape_1: CustomShape, shape_2: CustomShape) -> None:
+        if shape_2 not in self._linkNeighbours.get(shape_1, {}):
+            return
+
+        self._componentLinksCounts[self._componentIds[shape_1]] -= 1
+
+        for shape, neighbour in ((shape_1, shape_2), (shape_2, shape_1)):
+            neighbours = self._linkNeighbours[shape]
+            neighbours[neighbour] -= 1
+
+            if not neighbours[neighbour]:
+                del neighbours[neighbour]
+
+                if not neighbours:
+                    del self._linkNeighbours[shape]
+
+        # Duplicated link still connects the shapes
+        if shape_2 not in self._linkNeighbours.get(shape_1, {}):
+            self.__splitIfDisconnected(shape_1, shape_2)
+
+    # Group is connected with every its shape
+    def addGroup(self, group: CustomShape) -> None:
+        self._groupShapes[group] = list(group.childShapes)
+
+        for shape in group.childShapes:
+            self._groups[shape] = group
+            self.__unite(group, shape)
+
+    # Removes shapes along with their links and group membership, e.g. after deletion or ungrouping
+    # Shapes inside of removed groups stay, if they are not removed themselves
+    def removeShapes(self, shapes: Iterable[CustomShape]) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        removedShapes = {shape for shape in shapes if shape in self._componentIds}
+        affectedComponentIds = {self._componentIds[shape] for shape in removedShapes}
+
+        for shape in removedShapes:
+            for neighbour in self._linkNeighbours.pop(shape, {}):
+                if neighbour not in removedShapes:
+                    neighbours = self._linkNeighbours[neighbour]
+                    del neighbours[shape]
+
+                    if not neighbours:
+                        del self._linkNeighbours[neighbour]
+
+            group = self._groups.pop(shape, None)
+
+            if group is not None and group not in removedShapes:
+                self._groupShapes[group].remove(shape)
+
+            for child in self._groupShapes.pop(shape, []):
+                if child not in removedShapes:
+                    del self._groups[child]
+
+            del self._componentIds[shape]
+
+        self.__relabelComponents(affectedComponentIds, removedShapes)
+
+        PERF_MONITOR.stopTimer("components.remove", timerStart)
+
+    # Removes group membership of shapes after ungrouping, links of the group itself stay
+    def removeGroup(self, group: CustomShape) -> None:
+        for shape in self._groupShapes.pop(group, []):
+            del self._groups[shape]
+
+        if group in self._componentIds:
+            self.__relabelComponents({self._componentIds[group]}, set())
+
+    def clear(self) -> None:
+        self._linkNeighbours.clear()
+        self._groups.clear()
+        self._groupShapes.clear()
+        self._componentIds.clear()
+        self._componentShapes.clear()
+        self._componentLinksCounts.clear()
+
+    # Unites components of two shapes, returns id of united component
+    def __unite(self, shape_1: CustomShape, shape_2: CustomShape) -> int:
+        componentId_1 = self.__getOrCreateComponentId(shape_1)
+        componentId_2 = self.__getOrCreateComponentId(shape_2)
+
+        if componentId_1 == componentId_2:
+            return componentId_1
+
+        # Shapes of smaller component get id of bigger one
+        if len(self._componentShapes[componentId_1]) < len(self._componentShapes[componentId_2]):
+            componentId_1, componentId_2 = componentId_2, componentId_1
+
+        movedShapes = self._componentShapes.pop(componentId_2)
+
+        for shape in movedShapes:
+            self._componentIds[shape] = componentId_1
+
+        self._componentShapes[componentId_1].update(movedShapes)
+        self._componentLinksCounts[componentId_1] += self._componentLinksCounts.pop(componentId_2)
+
+        return componentId_1
+
+    def __getOrCreateComponentId(self, shape: CustomShape) -> int:
+        componentId = self._componentIds.get(shape)
+
+        if componentId is None:
+            componentId = next(self._nextComponentId)
+            self._componentIds[shape] = componentId
+            self._componentShapes[componentId] = {shape}
+            self._componentLinksCounts[componentId] = 0
+
+        return componentId
+
+    # Remaining shapes of components are split into new components
+    def __relabelComponents(self, componentIds: Set[int], removedShapes: Set[CustomShape]) -> None:
+        for componentId in componentIds:
+            remainingShapes = self._componentShapes.pop(componentId) - removedShapes
+            del self._componentLinksCounts[componentId]
+
+            while remainingShapes:
+                componentShapes = self.__collectComponent(remainingShapes.pop())
+                remainingShapes -= componentShapes
+                self.__createComponent(componentShapes)
+
+    # Searches from both shapes in turns, if searches do not meet, smaller part becomes new component
+    def __splitIfDisconnected(self, shape_1: CustomShape, shape_2: CustomShape) -> None:
+        searches = [(deque([shape_1]), {shape_1}), (deque([shape_2]), {shape_2})]
+
+        while True:
+            for searchIndex, (queue, visited) in enumerate(searches):
+                otherVisited = searches[1 - searchIndex][1]
+
+                if not queue:
+                    self.__splitComponent(visited)
+                    return
+
+                for neighbour in self.__getNeighbours(queue.popleft()):
+                    if neighbour in otherVisited:
+                        return
+
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        queue.append(neighbour)
+
+    # Moves shapes, which are not connected with the rest of their component anymore, to new component
+    def __splitComponent(self, shapes: Set[CustomShape]) -> None:
+        oldComponentId = self._componentIds[next(iter(shapes))]
+        self._componentShapes[oldComponentId] -= shapes
+        self._componentLinksCounts[oldComponentId] -= self.__countLinks(shapes)
+
+        self.__createComponent(shapes)
+
+        # Shape left alone is not stored
+        if len(self._componentShapes[oldComponentId]) == 1:
+            del self._componentIds[self._componentShapes.pop(oldComponentId).pop()]
+            del self._componentLinksCounts[oldComponentId]
+
+    # Stores shapes as new component with its own id, single shape is forgotten instead
+    def __createComponent(self, shapes: Set[CustomShape]) -> None:
+        if len(shapes) == 1:
+            del self._componentIds[next(iter(shapes))]
+            return
+
+        componentId = next(self._nextComponentId)
+        self._componentShapes[componentId] = shapes
+        self._componentLinksCounts[componentId] = self.__countLinks(shapes)
+
+        for shape in shapes:
+            self._componentIds[shape] = componentId
+
+    # Number of links between shapes, every link is counted from both ends
+    def __countLinks(self, shapes: Set[CustomShape]) -> int:
+        return sum(sum(self._linkNeighbours.get(shape, {}).values()) for shape in shapes) // 2
+
+    # Shapes reachable from shape
+    def __collectComponent(self, shape: CustomShape) -> Set[CustomShape]:
+        visited = {shape}
+        queue = deque([shape])
+
+        while queue:
+            for neighbour in self.__getNeighbours(queue.popleft()):
+                if neighbour not in visited:
+                    visited.add(neighbour)
+                    queue.append(neighbour)
+
+        return visited
+
+    def __getNeighbours(self, shape: CustomShape) -> List[CustomShape]:
+        neighbours = list(self._linkNeighbours.get(shape, ()))
+        neighbours.extend(self._groupShapes.get(shape, ()))
+
+        if shape in self._groups:
+            neighbours.append(self._groups[shape])
+
+        return neighbours
@@ -0,0 +1,61 @@
+from typing import List
+
+# NumPy is optional, without it link points are calculated one by one
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import constants
+from custom_shape import CustomShape
+
+# Calculation of link points for many links at once
+#
+# Shapes place link points by their bounding boxes (see CustomShape._getBoundingBoxLinkPoint),
+# so link point depends only on center points and bounding boxes of linked shapes
+# Bounds are taken from bounding boxes, where anchor rounding of shapes is already applied,
+# so batch results are exactly the same as results of getLinkPoint
+#
+# Returns (x1, y1, x2, y2) for each pair, where (x1, y1) is link point of the first shape to the second one and vice versa
+def getLinkEndpoints(shapePairs: List[tuple]) -> List[tuple]:
+    if numpy is None or len(shapePairs) < constants.LINK_BATCH_MIN_COUNT:
+        return [_getLinkEndpointsOfPair(shape_1, shape_2) for shape_1, shape_2 in shapePairs]
+
+    # Rows are pairs, columns are shapes of pair, last axis is center x, center y, left, top, right, bottom
+    bounds = numpy.array([(_getShapeBounds(shape_1), _getShapeBounds(shape_2)) for shape_1, shape_2 in shapePairs], dtype=numpy.int64)
+
+    x1, y1 = _getLinkPoints(bounds[:, 0], bounds[:, 1])
+    x2, y2 = _getLinkPoints(bounds[:, 1], bounds[:, 0])
+
+    return list(zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()))
+
+def _getLinkEndpointsOfPair(shape_1: CustomShape, shape_2: CustomShape) -> tuple:
+    point_1 = shape_1.getLinkPoint(shape_2)
+    point_2 = shape_2.getLinkPoint(shape_1)
+
+    return point_1.x(), point_1.y(), point_2.x(), point_2.y()
+
+def _getShapeBounds(shape: CustomShape) -> tuple:
+    boundingBox = shape.boundingBox
+    return shape.centerPoint.x(), shape.centerPoint.y(), boundingBox.left(), boundingBox.top(), boundingBox.right(), boundingBox.bottom()
+
+# Same steps as CustomShape._getBoundingBoxLinkPoint, for all shapes at once
+def _getLinkPoints(shapes, targets) -> tuple:
+    centerX, centerY, left, top, right, bottom = shapes.T
+    targetCenterX, targetCenterY, targetLeft, targetTop, targetRight, targetBottom = targets.T
+
+    # Deltas between closest borders of shapes, 0 if borders overlap on axis
+    borderDeltaX = numpy.where(targetCenterX > centerX,
+                               numpy.where(targetLeft > right, targetLeft - right, 0),
+                               numpy.where(targetRight < left, targetRight - left, 0))
+    borderDeltaY = numpy.where(targetCenterY > centerY,
+                               numpy.where(targetTop > bottom, targetTop - bottom, 0),
+                               numpy.where(targetBottom < top, targetBottom - top, 0))
+
+    # Point is placed on side which is the most distant from target by biggest delta
+    onVerticalSide = numpy.abs(borderDeltaX) > numpy.abs(borderDeltaY)
+
+    x = numpy.where(onVerticalSide, numpy.where(borderDeltaX > 0, right, left), centerX)
+    y = numpy.where(onVerticalSide, centerY, numpy.where(borderDeltaY > 0, bottom, top))
+
+    return x, y
@@ -0,0 +1,118 @@
+from math import floor, hypot
+from typing import Dict, List, Set
+
+from PyQt5.QtCore import QPoint
+
+import constants
+from performance_monitor import PERF_MONITOR
+from shapes_link import ShapesLinkBase
+
+# Spatial index of link segments for hit testing
+# World is split into uniform grid, each link is registered in every cell its segments pass through
+# (not in every cell of its bounding box), so long diagonal links occupy only few cells per column
+# Lookup checks only links registered in cells near the point, so it does not depend on total number of links
+class LinkSegmentIndex():
+    def __init__(self) -> None:
+        # Grid cell -> links passing through cell
+        self._grid: Dict[tuple, Set[ShapesLinkBase]] = {}
+        # Indexed segments and cells of each link, used for hit testing and removal
+        self._linkSegments: Dict[ShapesLinkBase, List[tuple]] = {}
+        self._linkCells: Dict[ShapesLinkBase, Set[tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._linkSegments)
+
+    # Adds link or updates it if its segments have changed
+    def updateLink(self, link: ShapesLinkBase) -> None:
+        self.removeLink(link)
+
+        segments = link.getSegments()
+        cells = set()
+
+        for point_1, point_2 in segments:
+            LinkSegmentIndex.__addSegmentCells(point_1, point_2, cells)
+
+        for cell in cells:
+            self._grid.setdefault(cell, set()).add(link)
+
+        self._linkSegments[link] = segments
+        self._linkCells[link] = cells
+
+    def removeLink(self, link: ShapesLinkBase) -> None:
+        for cell in self._linkCells.pop(link, ()):
+            linksInCell = self._grid[cell]
+            linksInCell.discard(link)
+
+            if not linksInCell:
+                del self._grid[cell]
+
+        self._linkSegments.pop(link, None)
+
+    def clear(self) -> None:
+        self._grid.clear()
+        self._linkSegments.clear()
+        self._linkCells.clear()
+
+    # Returns link closest to the point, if it is not further than tolerance, otherwise None
+    def getLinkAtPoint(self, point: QPoint, tolerance: float) -> ShapesLinkBase:
+        cellSize = constants.LINK_INDEX_CELL_SIZE
+        candidates = set()
+
+        for cellX in range(floor((point.x() - tolerance) / cellSize), floor((point.x() + tolerance) / cellSize) + 1):
+            for cellY in range(floor((point.y() - tolerance) / cellSize), floor((point.y() + tolerance) / cellSize) + 1):
+                candidates.update(self._grid.get((cellX, cellY), ()))
+
+        result = None
+        resultDistance = tolerance
+
+        for link in candidates:
+            for point_1, point_2 in self._linkSegments[link]:
+                distance = LinkSegmentIndex.__distanceToSegment(point, point_1, point_2)
+
+                if distance <= resultDistance:
+                    result = link
+                    resultDistance = distance
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("links.hit_tests")
+            PERF_MONITOR.addSample("links.hit_candidates", len(candidates))
+
+        return result
+
+    # Distance from point to closest point of segment
+    @staticmethod
+    def __distanceToSegment(point: QPoint, point_1: QPoint, point_2: QPoint) -> float:
+        segmentX = point_2.x() - point_1.x()
+        segmentY = point_2.y() - point_1.y()
+        lengthSquared = segmentX * segmentX + segmentY * segmentY
+
+        if lengthSquared == 0:
+            return hypot(point.x() - point_1.x(), point.y() - point_1.y())
+
+        # Projection of point to segment line, limited by segment ends
+        position = ((point.x() - point_1.x()) * segmentX + (point.y() - point_1.y()) * segmentY) / lengthSquared
+        position = min(max(position, 0.0), 1.0)
+
+        return hypot(point.x() - (point_1.x() + position * segmentX), point.y() - (point_1.y() + position * segmentY))
+
+    # Adds cells segment passes through, column by column
+    @staticmethod
+    def __addSegmentCells(point_1: QPoint, point_2: QPoint, cells: Set[tuple]) -> None:
+        cellSize = constants.LINK_INDEX_CELL_SIZE
+
+        if point_1.x() > point_2.x():
+            point_1, point_2 = point_2, point_1
+
+        for column in range(floor(point_1.x() / cellSize), floor(point_2.x() / cellSize) + 1):
+            # Part of segment inside column's X range
+            startX = max(column * cellSize, point_1.x())
+            endX = min((column + 1) * cellSize, point_2.x())
+
+            if point_1.x() == point_2.x():
+                startY, endY = point_1.y(), point_2.y()
+            else:
+                startY = point_1.y() + (point_2.y() - point_1.y()) * (startX - point_1.x()) / (point_2.x() - point_1.x())
+                endY = point_1.y() + (point_2.y() - point_1.y()) * (endX - point_1.x()) / (point_2.x() - point_1.x())
+
+            for row in range(floor(min(startY, endY) / cellSize), floor(max(startY, endY) / cellSize) + 1):
+                cells.add((column, row))
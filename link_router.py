@@ -0,0 +1,371 @@
+import heapq
+from bisect import bisect_left
+from typing import Callable, Dict, List, Set
+
+from PyQt5.QtCore import QPoint, QRect
+
+import constants
+from custom_shape import CustomShape
+from geometry_change_listener import GeometryChangeListener
+from performance_monitor import PERF_MONITOR
+
+# Calculates orthogonal link routes around shapes and caches them
+#
+# Route search uses sparse visibility graph: only X and Y coordinates of obstacle borders (inflated by margin)
+# and of route ends are used as graph coordinates, so graph size depends on number of nearby shapes, not on distance
+# A* with penalty for bends is used to find the path
+# Obstacles are put to buckets, and graph nodes and edges are checked for blocking only when search reaches them
+#
+# Search is bounded, so routing never stalls the GUI thread:
+# - if search area contains more than ROUTE_MAX_OBSTACLES obstacles, search is not started
+# - search stops after ROUTE_MAX_EXPANSIONS expanded nodes
+# In both cases, and if there is no route, previous route is kept if its ends are still in place, otherwise straight line is used
+#
+# While routing is deferred (e.g. during shape drag), dropped routes are not searched again:
+# previous route or straight line is shown instead, and these links are re-routed when deferring is over
+#
+# Every cached route has corridor - bounding box of route extended by margin
+# Route is dropped only if changed geometry touches its corridor: corridors are stored in uniform grid for fast lookup
+# Dropped routes are collected, so owner could re-route them and redraw both old and new route
+class LinkRouter(GeometryChangeListener):
+    # Directions of route movement
+    DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    def __init__(self, getObstacles: Callable[[QRect], List[CustomShape]]) -> None:
+        # Function which returns shapes intersecting with specified rect
+        self._getObstacles = getObstacles
+
+        # Links with cached routes and their corridors
+        self._corridors: Dict[object, QRect] = {}
+        # Grid cell -> links which corridors touch this cell
+        self._corridorGrid: Dict[tuple, Set[object]] = {}
+
+        # Links which routes were dropped, along with dropped routes
+        self._invalidatedRoutes: Dict[object, tuple] = {}
+
+        # If true, dropped routes are replaced with provisional ones, which are not cached
+        self._deferred = False
+        # Links which got provisional routes while routing was deferred
+        self._provisionalLinks: Set[object] = set()
+
+    # Returns cached route of link or calculates a new one
+    def getRoute(self, link) -> tuple:
+        if link in self._corridors:
+            return link._route
+
+        if self._deferred:
+            link._route = LinkRouter.__getFallbackRoute(link._shape1, link._shape2, link._route)
+            self._provisionalLinks.add(link)
+            return link._route
+
+        timerStart = PERF_MONITOR.startTimer()
+
+        route = self.calculateRoute(link._shape1, link._shape2, link._route)
+        link._route = route
+
+        corridor = LinkRouter.__getPointsBounds(route).adjusted(-constants.ROUTE_MARGIN, -constants.ROUTE_MARGIN,
+                                                                 constants.ROUTE_MARGIN, constants.ROUTE_MARGIN)
+        self._corridors[link] = corridor
+
+        for cell in LinkRouter.__getCells(corridor):
+            self._corridorGrid.setdefault(cell, set()).add(link)
+
+        PERF_MONITOR.stopTimer("routing.route", timerStart)
+        return route
+
+    # Returns links which routes were dropped since last call and are not re-routed yet, along with dropped routes
+    def takeInvalidatedRoutes(self) -> List[tuple]:
+        invalidatedRoutes = [(link, route) for link, route in self._invalidatedRoutes.items() if link not in self._corridors]
+        self._invalidatedRoutes.clear()
+
+        return invalidatedRoutes
+
+    # Defines if routes are searched when they are needed or provisional routes are used instead
+    # When deferring is over, links with provisional routes are returned by takeInvalidatedRoutes
+    def setDeferred(self, deferred: bool) -> None:
+        self._deferred = deferred
+
+        if deferred:
+            return
+
+        for link in self._provisionalLinks:
+            self._invalidatedRoutes.setdefault(link, link._route)
+
+        self._provisionalLinks.clear()
+
+    # Forgets link completely, should be called when link is deleted
+    def removeLink(self, link) -> None:
+        self.__dropRoute(link)
+        self._invalidatedRoutes.pop(link, None)
+        self._provisionalLinks.discard(link)
+
+    # Shape moved into or out of corridors - drop routes of these corridors
+    # Rect could cover more cells than there are cells with corridors, e.g. merged area of many moved shapes,
+    # then cells with corridors are checked instead of cells of rect
+    def onRectChanged(self, rect: QRect) -> None:
+        if not self._corridorGrid:
+            return
+
+        cellSize = constants.ROUTE_GRID_CELL_SIZE
+        firstCellX, lastCellX = rect.left() // cellSize, rect.right() // cellSize
+        firstCellY, lastCellY = rect.top() // cellSize, rect.bottom() // cellSize
+
+        if (lastCellX - firstCellX + 1) * (lastCellY - firstCellY + 1) > len(self._corridorGrid):
+            cellsLinks = [cellLinks for (cellX, cellY), cellLinks in self._corridorGrid.items()
+                          if firstCellX <= cellX <= lastCellX and firstCellY <= cellY <= lastCellY]
+        else:
+            cellsLinks = [self._corridorGrid.get(cell, ()) for cell in LinkRouter.__getCells(rect)]
+
+        affectedLinks = {link for cellLinks in cellsLinks for link in cellLinks if self._corridors[link].intersects(rect)}
+
+        for link in affectedLinks:
+            # The oldest route is kept, since it is the one which is drawn
+            self._invalidatedRoutes.setdefault(link, link._route)
+            self.__dropRoute(link)
+
+        if affectedLinks and PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("routing.invalidated", len(affectedLinks))
+
+    # Links are not obstacles for other links
+    def onSegmentChanged(self, point_1: QPoint, point_2: QPoint) -> None:
+        pass
+
+    def onGeometryCleared(self) -> None:
+        self._corridors.clear()
+        self._corridorGrid.clear()
+        self._invalidatedRoutes.clear()
+        self._provisionalLinks.clear()
+
+    # Removes route corridor from grid
+    def __dropRoute(self, link) -> None:
+        corridor = self._corridors.pop(link, None)
+
+        if corridor is None:
+            return
+
+        for cell in LinkRouter.__getCells(corridor):
+            linksInCell = self._corridorGrid.get(cell)
+
+            if linksInCell:
+                linksInCell.discard(link)
+                if not linksInCell:
+                    del self._corridorGrid[cell]
+
+    # Calculates orthogonal route between shapes, returns tuple of route points
+    # If there is no route inside search area or search is over budget, previous route or straight line is returned
+    def calculateRoute(self, shape_1: CustomShape, shape_2: CustomShape, previousRoute: tuple = None) -> tuple:
+        start = shape_1.getLinkPoint(shape_2)
+        end = shape_2.getLinkPoint(shape_1)
+
+        # Route leaves shapes perpendicular to their sides
+        startStub = LinkRouter.__getStubPoint(shape_1, start)
+        endStub = LinkRouter.__getStubPoint(shape_2, end)
+
+        searchArea = QRect(startStub, endStub).normalized().adjusted(-constants.ROUTE_SEARCH_MARGIN, -constants.ROUTE_SEARCH_MARGIN,
+                                                                      constants.ROUTE_SEARCH_MARGIN, constants.ROUTE_SEARCH_MARGIN)
+
+        halfMargin = constants.ROUTE_MARGIN // 2
+        obstacleShapes = self._getObstacles(searchArea)
+
+        if len(obstacleShapes) > constants.ROUTE_MAX_OBSTACLES:
+            path = None
+
+            if PERF_MONITOR.enabled:
+                PERF_MONITOR.incrementCounter("routing.over_budget")
+        else:
+            obstacles = [shape.boundingBox.adjusted(-halfMargin, -halfMargin, halfMargin, halfMargin) for shape in obstacleShapes]
+            path = LinkRouter.__findPath(startStub, endStub, obstacles, searchArea)
+
+        if path is None:
+            return LinkRouter.__getFallbackRoute(shape_1, shape_2, previousRoute)
+
+        return LinkRouter.__simplifyPath([start] + path + [end])
+
+    # Previous route if its ends are still at link points of shapes, otherwise straight line
+    @staticmethod
+    def __getFallbackRoute(shape_1: CustomShape, shape_2: CustomShape, previousRoute: tuple) -> tuple:
+        start = shape_1.getLinkPoint(shape_2)
+        end = shape_2.getLinkPoint(shape_1)
+
+        if previousRoute and previousRoute[0] == start and previousRoute[-1] == end:
+            return previousRoute
+
+        return (start, end)
+
+    # A* search over sparse orthogonal visibility graph
+    # Returns None if there is no path or search is over ROUTE_MAX_EXPANSIONS budget
+    @staticmethod
+    def __findPath(startPoint: QPoint, endPoint: QPoint, obstacles: List[QRect], searchArea: QRect) -> List[QPoint]:
+        xs = {startPoint.x(), endPoint.x(), searchArea.left(), searchArea.right()}
+        ys = {startPoint.y(), endPoint.y(), searchArea.top(), searchArea.bottom()}
+
+        for obstacle in obstacles:
+            xs.update((obstacle.left(), obstacle.right()))
+            ys.update((obstacle.top(), obstacle.bottom()))
+
+        xs = sorted(x for x in xs if searchArea.left() <= x <= searchArea.right())
+        ys = sorted(y for y in ys if searchArea.top() <= y <= searchArea.bottom())
+
+        # Graph node is blocked if it is inside of obstacle, borders are allowed
+        # Every obstacle border is graph coordinate, so edge between neighbour nodes crosses obstacle only if its middle is inside of it
+        isInsideObstacle = LinkRouter.__getObstacleTest(obstacles)
+        blocked: Dict[tuple, bool] = {}
+
+        def isBlocked(i: int, j: int, delta_i: int, delta_j: int) -> bool:
+            key = (i, j, delta_i, delta_j)
+            result = blocked.get(key)
+
+            if result is None:
+                x = (xs[i] + xs[i + delta_i]) / 2
+                y = (ys[j] + ys[j + delta_j]) / 2
+                result = blocked[key] = isInsideObstacle(x, y)
+
+            return result
+
+        start = (bisect_left(xs, startPoint.x()), bisect_left(ys, startPoint.y()))
+        end = (bisect_left(xs, endPoint.x()), bisect_left(ys, endPoint.y()))
+
+        if isBlocked(start[0], start[1], 0, 0) or isBlocked(end[0], end[1], 0, 0):
+            return None
+
+        # Distance to the end plus penalty for bend, which is needed if end is not straight ahead
+        def heuristic(node: tuple, direction: tuple) -> int:
+            delta_x = xs[end[0]] - xs[node[0]]
+            delta_y = ys[end[1]] - ys[node[1]]
+            result = abs(delta_x) + abs(delta_y)
+
+            if delta_x and delta_y:
+                result += constants.ROUTE_BEND_PENALTY
+            elif (delta_x or delta_y) and direction is not None and (direction[0] * delta_x <= 0 and direction[1] * delta_y <= 0):
+                result += constants.ROUTE_BEND_PENALTY
+
+            return result
+
+        # State is node with direction it was entered, so bends could be penalized
+        startState = (start[0], start[1], None)
+        costs = {startState: 0}
+        previous = {startState: None}
+        queue = [(heuristic(start, None), 0, 0, startState)]
+        counter = 0
+        expansionsCount = 0
+
+        while queue:
+            _, negativeCost, _, state = heapq.heappop(queue)
+            stateCost = -negativeCost
+
+            # State was reached again with lower cost after it was queued
+            if stateCost > costs[state]:
+                continue
+
+            i, j, direction = state
+
+            if (i, j) == end:
+                path = []
+                while state:
+                    path.append(QPoint(xs[state[0]], ys[state[1]]))
+                    state = previous[state]
+                return path[::-1]
+
+            expansionsCount += 1
+
+            if expansionsCount > constants.ROUTE_MAX_EXPANSIONS:
+                if PERF_MONITOR.enabled:
+                    PERF_MONITOR.incrementCounter("routing.over_budget")
+                return None
+
+            for delta in LinkRouter.DIRECTIONS:
+                nextI = i + delta[0]
+                nextJ = j + delta[1]
+
+                if not (0 <= nextI < len(xs) and 0 <= nextJ < len(ys)):
+                    continue
+
+                # Edges are checked from node with lesser index
+                if isBlocked(nextI, nextJ, 0, 0) or isBlocked(min(i, nextI), min(j, nextJ), abs(delta[0]), abs(delta[1])):
+                    continue
+
+                cost = stateCost + abs(xs[nextI] - xs[i]) + abs(ys[nextJ] - ys[j])
+                if direction is not None and direction != delta:
+                    cost += constants.ROUTE_BEND_PENALTY
+
+                nextState = (nextI, nextJ, delta)
+
+                if cost < costs.get(nextState, cost + 1):
+                    costs[nextState] = cost
+                    previous[nextState] = state
+                    counter += 1
+                    heapq.heappush(queue, (cost + heuristic((nextI, nextJ), delta), -cost, counter, nextState))
+
+        return None
+
+    # Returns function which checks if point is strictly inside of any obstacle
+    # Obstacles are put to buckets of uniform grid, so every check looks only at obstacles near the point
+    @staticmethod
+    def __getObstacleTest(obstacles: List[QRect]) -> Callable[[float, float], bool]:
+        cellSize = constants.ROUTE_OBSTACLE_CELL_SIZE
+        buckets: Dict[tuple, List[tuple]] = {}
+
+        for obstacle in obstacles:
+            bounds = (obstacle.left(), obstacle.top(), obstacle.right(), obstacle.bottom())
+
+            for cellX in range(obstacle.left() // cellSize, obstacle.right() // cellSize + 1):
+                for cellY in range(obstacle.top() // cellSize, obstacle.bottom() // cellSize + 1):
+                    buckets.setdefault((cellX, cellY), []).append(bounds)
+
+        def isInsideObstacle(x: float, y: float) -> bool:
+            for left, top, right, bottom in buckets.get((int(x // cellSize), int(y // cellSize)), ()):
+                if left < x < right and top < y < bottom:
+                    return True
+
+            return False
+
+        return isInsideObstacle
+
+    # Returns point at margin distance from shape side, where link point is located
+    @staticmethod
+    def __getStubPoint(shape: CustomShape, linkPoint: QPoint) -> QPoint:
+        boundingBox = shape.boundingBox
+
+        if linkPoint.x() == boundingBox.right():
+            return QPoint(linkPoint.x() + constants.ROUTE_MARGIN, linkPoint.y())
+        if linkPoint.x() == boundingBox.left():
+            return QPoint(linkPoint.x() - constants.ROUTE_MARGIN, linkPoint.y())
+        if linkPoint.y() == boundingBox.bottom():
+            return QPoint(linkPoint.x(), linkPoint.y() + constants.ROUTE_MARGIN)
+
+        return QPoint(linkPoint.x(), linkPoint.y() - constants.ROUTE_MARGIN)
+
+    # Removes points lying on straight line between neighbours
+    @staticmethod
+    def __simplifyPath(points: List[QPoint]) -> tuple:
+        result = [points[0]]
+
+        for index in range(1, len(points) - 1):
+            before = result[-1]
+            point = points[index]
+            after = points[index + 1]
+
+            if point == before:
+                continue
+
+            if (before.x() == point.x() == after.x()) or (before.y() == point.y() == after.y()):
+                continue
+
+            result.append(point)
+
+        result.append(points[-1])
+        return tuple(result)
+
+    @staticmethod
+    def __getPointsBounds(points: tuple) -> QRect:
+        return QRect(QPoint(min(point.x() for point in points), min(point.y() for point in points)),
+                     QPoint(max(point.x() for point in points), max(point.y() for point in points)))
+
+    # Grid cells covered by rect
+    @staticmethod
+    def __getCells(rect: QRect) -> List[tuple]:
+        cellSize = constants.ROUTE_GRID_CELL_SIZE
+
+        return [(cellX, cellY)
+                for cellX in range(rect.left() // cellSize, rect.right() // cellSize + 1)
+                for cellY in range(rect.top() // cellSize, rect.bottom() // cellSize + 1)]
@@ -1,11 +1,45 @@
+import json
+import os
 import sys
+from argparse import ArgumentParser
 
 from PyQt5.QtWidgets import QApplication
 
+from event_trace import EventTraceReplayer, printReplayReport
 from main_window import MainWindow
 
-app = QApplication([])
+# Export worker processes import this module as well, so program is started only from main process
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--scene", metavar="SCENE_FILE", help="load scene from file on start")
+    parser.add_argument("--listen", metavar="SOCKET_PATH", help="accept scene updates via local socket at specified path")
+    parser.add_argument("--replay", metavar="TRACE_FILE", help="replay recorded event trace without window and print event latencies")
+    parser.add_argument("--realtime", action="store_true", help="keep recorded delays between events during replay")
+    parser.add_argument("--report", metavar="REPORT_FILE", help="save replay latencies to JSON file")
+    args = parser.parse_args()
 
-window = MainWindow()
+    # Replay does not need a display
+    if args.replay:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
 
-sys.exit(app.exec())
\ No newline at end of file
+    app = QApplication([])
+
+    window = MainWindow()
+
+    if args.scene:
+        window.draw_area.loadSceneFile(args.scene)
+
+    if args.replay:
+        report = EventTraceReplayer(window.draw_area, window.toolbar).replay(args.replay, args.realtime)
+        printReplayReport(report)
+
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as reportFile:
+                json.dump(report, reportFile, indent=4)
+
+        sys.exit(0)
+
+    if args.listen:
+        window.draw_area.startIngestionServer(args.listen)
+
+    sys.exit(app.exec())
\ No newline at end of file
@@ -6,12 +6,36 @@ class MainToolbar(QToolBar):
     def __init__(self) -> None:
         super().__init__()
         self.addRectBtn = self.addAction(constants.ADD_RECT_BUTTON)
+        self.addEllipseBtn = self.addAction(constants.ADD_ELLIPSE_BUTTON)
+        self.addPolygonBtn = self.addAction(constants.ADD_POLYGON_BUTTON)
         self.addLinkBtn = self.addAction(constants.ADD_LINK_BUTTON)
+        self.routedLinksBtn = self.addAction(constants.ROUTED_LINKS_BUTTON)
+        self.routedLinksBtn.setCheckable(True)
 
         self.addSeparator()
 
         self.moveShapeButton = self.addAction(constants.MOVE_SHAPE_BUTTON)
+        self.moveConnectedBtn = self.addAction(constants.MOVE_CONNECTED_BUTTON)
+        self.moveConnectedBtn.setCheckable(True)
+        self.freePositionBtn = self.addAction(constants.FREE_POSITION_BUTTON)
+        self.freePositionBtn.setCheckable(True)
+        self.deleteRegionBtn = self.addAction(constants.DELETE_REGION_BUTTON)
+        self.animateBtn = self.addAction(constants.ANIMATE_BUTTON)
+        self.animateBtn.setCheckable(True)
+        self.groupBtn = self.addAction(constants.GROUP_BUTTON)
+        self.ungroupBtn = self.addAction(constants.UNGROUP_BUTTON)
 
         self.addSeparator()
 
-        self.clearBtn = self.addAction(constants.CLEAR_DRAW_AREA_BUTTON)
\ No newline at end of file
+        self.clearBtn = self.addAction(constants.CLEAR_DRAW_AREA_BUTTON)
+        self.saveSceneBtn = self.addAction(constants.SAVE_SCENE_BUTTON)
+        self.loadSceneBtn = self.addAction(constants.LOAD_SCENE_BUTTON)
+        self.exportBtn = self.addAction(constants.EXPORT_BUTTON)
+        self.resetViewBtn = self.addAction(constants.RESET_VIEW_BUTTON)
+
+        self.addSeparator()
+
+        self.perfOverlayBtn = self.addAction(constants.PERFORMANCE_OVERLAY_BUTTON)
+        self.dumpMetricsBtn = self.addAction(constants.DUMP_METRICS_BUTTON)
+        self.traceRecordBtn = self.addAction(constants.TRACE_RECORD_BUTTON)
+        self.traceRecordBtn.setCheckable(True)
\ No newline at end of file
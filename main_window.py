@@ -20,16 +20,37 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.draw_area)
 
         # Toolbar to control drawing widget
-        self._createToolBar(self.draw_area)
+        self.toolbar = self._createToolBar(self.draw_area)
         
         self.show()
 
-    def _createToolBar(self, draw_area: DrawArea):
+    def _createToolBar(self, draw_area: DrawArea) -> MainToolbar:
         tools = MainToolbar()
         self.addToolBar(tools)
         
         tools.addRectBtn.triggered.connect(draw_area.startRectCreation)
+        tools.addEllipseBtn.triggered.connect(draw_area.startEllipseCreation)
+        tools.addPolygonBtn.triggered.connect(draw_area.startPolygonCreation)
         tools.addLinkBtn.triggered.connect(draw_area.startLinkCreation)
+        tools.routedLinksBtn.toggled.connect(draw_area.setRoutedLinks)
         tools.moveShapeButton.triggered.connect(draw_area.startRectMove)
+        tools.moveConnectedBtn.toggled.connect(draw_area.setMoveConnected)
+        tools.freePositionBtn.toggled.connect(draw_area.setFindFreePosition)
+        tools.deleteRegionBtn.triggered.connect(draw_area.deleteShapesInRegion)
+        tools.animateBtn.toggled.connect(draw_area.setAnimationEnabled)
+        tools.groupBtn.triggered.connect(draw_area.groupShapesInRegion)
+        tools.ungroupBtn.triggered.connect(draw_area.ungroupShape)
         tools.clearBtn.triggered.connect(draw_area.clearArea)
+        tools.saveSceneBtn.triggered.connect(draw_area.saveScene)
+        tools.loadSceneBtn.triggered.connect(draw_area.loadScene)
+        tools.exportBtn.triggered.connect(draw_area.exportScene)
+        tools.resetViewBtn.triggered.connect(draw_area.resetView)
+        tools.perfOverlayBtn.triggered.connect(draw_area.togglePerformanceOverlay)
+        tools.dumpMetricsBtn.triggered.connect(draw_area.dumpPerformanceMetrics)
+        tools.traceRecordBtn.toggled.connect(draw_area.setTraceRecording)
+
+        # Every toolbar action is recorded to event trace while recording is on
+        tools.actionTriggered.connect(draw_area.recordToolbarAction)
+
+        return tools
         
\ No newline at end of file
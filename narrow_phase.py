@@ -0,0 +1,185 @@
+from math import sqrt, hypot
+from typing import List
+
+# Precise intersection tests between shapes geometry
+# Shapes are described either as convex polygons or as axis-aligned ellipses (see CustomShape.getCollisionPolygon)
+# Groups are checked by their children
+# Touching shapes do not intersect, same as neighbour rectangles with adjacent bounding boxes
+#
+# - Polygon vs polygon: separating axis theorem
+# - Ellipse vs polygon: space is scaled so ellipse becomes unit circle, polygon stays convex polygon
+# - Ellipse vs ellipse: same scaling, then distance from circle center to other (still axis-aligned) ellipse
+
+# Convex polygon with precalculated separating axes
+# Axes are edge normals, they do not change when polygon is moved, so they could be shared by moved copies
+class CollisionPolygon():
+    __slots__ = ("vertices", "axes")
+
+    def __init__(self, vertices: List[tuple], axes: List[tuple] = None) -> None:
+        self.vertices = vertices
+        self.axes = axes if axes is not None else CollisionPolygon.getAxes(vertices)
+
+    # Edge normals of polygon, parallel edges give single axis
+    @staticmethod
+    def getAxes(vertices: List[tuple]) -> List[tuple]:
+        axes = []
+
+        for index, (x_1, y_1) in enumerate(vertices):
+            x_2, y_2 = vertices[(index + 1) % len(vertices)]
+            length = hypot(x_2 - x_1, y_2 - y_1)
+
+            if length == 0:
+                continue
+
+            axis = ((y_1 - y_2) / length, (x_2 - x_1) / length)
+
+            if not any(abs(axis[0] * other[1] - axis[1] * other[0]) < 1e-9 for other in axes):
+                axes.append(axis)
+
+        return axes
+
+# Checks if shapes geometries intersect
+def checkShapesIntersection(shape_1, shape_2) -> bool:
+    # Groups have no geometry of their own, they are checked by children touching bounding box of other shape
+    for group, shape in ((shape_1, shape_2), (shape_2, shape_1)):
+        if group.childShapes:
+            return any(child.boundingBox.intersects(shape.boundingBox) and child.checkIntersectionPrecise(shape)
+                       for child in group.childShapes)
+
+    polygon_1 = shape_1.getCollisionPolygon()
+    polygon_2 = shape_2.getCollisionPolygon()
+
+    if polygon_1 and polygon_2:
+        return checkPolygonsIntersection(polygon_1, polygon_2)
+    if polygon_1:
+        return checkEllipsePolygonIntersection(shape_2.getCollisionEllipse(), polygon_1)
+    if polygon_2:
+        return checkEllipsePolygonIntersection(shape_1.getCollisionEllipse(), polygon_2)
+
+    return checkEllipsesIntersection(shape_1.getCollisionEllipse(), shape_2.getCollisionEllipse())
+
+# Separating axis theorem: convex polygons do not intersect if there is an edge normal,
+# on which their projections do not overlap
+def checkPolygonsIntersection(polygon_1: CollisionPolygon, polygon_2: CollisionPolygon) -> bool:
+    for axes in (polygon_1.axes, polygon_2.axes):
+        for axis_x, axis_y in axes:
+            min_1, max_1 = _project(polygon_1.vertices, axis_x, axis_y)
+            min_2, max_2 = _project(polygon_2.vertices, axis_x, axis_y)
+
+            if max_1 <= min_2 or max_2 <= min_1:
+                return False
+
+    return True
+
+# Ellipse is (center x, center y, radius x, radius y)
+def checkEllipsePolygonIntersection(ellipse: tuple, polygon: CollisionPolygon) -> bool:
+    center_x, center_y, radius_x, radius_y = ellipse
+
+    # Polygon in space where ellipse is unit circle at origin
+    vertices = [((x - center_x) / radius_x, (y - center_y) / radius_y) for x, y in polygon.vertices]
+
+    if _isOriginInPolygon(vertices):
+        return True
+
+    for index, vertex_1 in enumerate(vertices):
+        vertex_2 = vertices[(index + 1) % len(vertices)]
+
+        if _distanceFromOriginToSegment(vertex_1, vertex_2) < 1:
+            return True
+
+    return False
+
+def checkEllipsesIntersection(ellipse_1: tuple, ellipse_2: tuple) -> bool:
+    center_x_1, center_y_1, radius_x_1, radius_y_1 = ellipse_1
+    center_x_2, center_y_2, radius_x_2, radius_y_2 = ellipse_2
+
+    # Second ellipse in space where the first one is unit circle at origin, axes stay aligned
+    center_x = (center_x_2 - center_x_1) / radius_x_1
+    center_y = (center_y_2 - center_y_1) / radius_y_1
+    radius_x = radius_x_2 / radius_x_1
+    radius_y = radius_y_2 / radius_y_1
+
+    # Origin inside second ellipse
+    if (center_x / radius_x) ** 2 + (center_y / radius_y) ** 2 <= 1:
+        return True
+
+    return _distanceToEllipse(radius_x, radius_y, abs(center_x), abs(center_y)) < 1
+
+def _project(vertices: List[tuple], axis_x: float, axis_y: float) -> tuple:
+    projections = [x * axis_x + y * axis_y for x, y in vertices]
+    return min(projections), max(projections)
+
+# Origin is inside convex polygon if it is on the same side of every edge
+def _isOriginInPolygon(vertices: List[tuple]) -> bool:
+    hasPositive = False
+    hasNegative = False
+
+    for index, (x_1, y_1) in enumerate(vertices):
+        x_2, y_2 = vertices[(index + 1) % len(vertices)]
+        cross = x_1 * y_2 - y_1 * x_2
+
+        hasPositive = hasPositive or cross > 0
+        hasNegative = hasNegative or cross < 0
+
+    return not (hasPositive and hasNegative)
+
+def _distanceFromOriginToSegment(vertex_1: tuple, vertex_2: tuple) -> float:
+    segment_x = vertex_2[0] - vertex_1[0]
+    segment_y = vertex_2[1] - vertex_1[1]
+    lengthSquared = segment_x * segment_x + segment_y * segment_y
+
+    if lengthSquared == 0:
+        return hypot(vertex_1[0], vertex_1[1])
+
+    position = min(max(-(vertex_1[0] * segment_x + vertex_1[1] * segment_y) / lengthSquared, 0.0), 1.0)
+
+    return hypot(vertex_1[0] + position * segment_x, vertex_1[1] + position * segment_y)
+
+# Distance from point (y_0, y_1) in the first quadrant to ellipse boundary, point is outside of ellipse
+# Closest point is found by bisection (D. Eberly, "Distance from a Point to an Ellipse")
+def _distanceToEllipse(radius_0: float, radius_1: float, y_0: float, y_1: float) -> float:
+    # Algorithm requires bigger radius to be the first one
+    if radius_0 < radius_1:
+        radius_0, radius_1 = radius_1, radius_0
+        y_0, y_1 = y_1, y_0
+
+    if y_1 > 0:
+        if y_0 > 0:
+            z_0 = y_0 / radius_0
+            z_1 = y_1 / radius_1
+            ratio = (radius_0 / radius_1) ** 2
+
+            # Root of (ratio * z_0 / (s + ratio))^2 + (z_1 / (s + 1))^2 = 1
+            n_0 = ratio * z_0
+            s_0 = z_1 - 1
+            s_1 = hypot(n_0, z_1) - 1
+            s = s_0
+
+            for _ in range(100):
+                s = (s_0 + s_1) / 2
+                if s == s_0 or s == s_1:
+                    break
+
+                g = (n_0 / (s + ratio)) ** 2 + (z_1 / (s + 1)) ** 2 - 1
+                if g > 0:
+                    s_0 = s
+                elif g < 0:
+                    s_1 = s
+                else:
+                    break
+
+            x_0 = ratio * y_0 / (s + ratio)
+            x_1 = y_1 / (s + 1)
+            return hypot(x_0 - y_0, x_1 - y_1)
+
+        return abs(y_1 - radius_1)
+
+    numerator = radius_0 * y_0
+    denominator = radius_0 * radius_0 - radius_1 * radius_1
+
+    if numerator < denominator:
+        x_0 = radius_0 * numerator / denominator
+        x_1 = radius_1 * sqrt(1 - (numerator / denominator) ** 2)
+        return hypot(x_0 - y_0, x_1)
+
+    return abs(y_0 - radius_0)
@@ -0,0 +1,181 @@
+import json
+from time import perf_counter_ns
+from collections import deque
+from typing import Dict
+
+# Histogram with logarithmic buckets
+# Each power of two is split into 4 sub-buckets, so percentile error is within ~12%
+# Adding sample is O(1) and does not allocate, which keeps it usable on hot paths
+class Histogram():
+    BUCKETS_COUNT = 256
+
+    def __init__(self) -> None:
+        self._buckets = [0] * Histogram.BUCKETS_COUNT
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def maxValue(self) -> int:
+        return self._max
+
+    @property
+    def mean(self) -> float:
+        if self._count == 0:
+            return 0.0
+        return self._total / self._count
+
+    def addSample(self, value: int) -> None:
+        self._buckets[Histogram.__bucketIndex(value)] += 1
+        self._count += 1
+        self._total += value
+
+        if value > self._max:
+            self._max = value
+
+    # Returns approximate value for specified percentile (0 - 100)
+    def percentile(self, percent: float) -> float:
+        if self._count == 0:
+            return 0.0
+
+        threshold = self._count * percent / 100
+        accumulated = 0
+
+        for index, bucketCount in enumerate(self._buckets):
+            accumulated += bucketCount
+            if bucketCount and accumulated >= threshold:
+                return min(Histogram.__bucketMiddle(index), self._max)
+
+        return float(self._max)
+
+    def clear(self) -> None:
+        self._buckets = [0] * Histogram.BUCKETS_COUNT
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    # Values below 4 get own buckets, others are grouped by bit length and 2 next bits
+    @staticmethod
+    def __bucketIndex(value: int) -> int:
+        if value < 4:
+            return max(value, 0)
+
+        bitLength = value.bit_length()
+        index = (bitLength - 2) * 4 + ((value >> (bitLength - 3)) & 3)
+
+        return min(index, Histogram.BUCKETS_COUNT - 1)
+
+    # Inverse of __bucketIndex - returns middle value of bucket range
+    @staticmethod
+    def __bucketMiddle(index: int) -> float:
+        if index < 4:
+            return float(index)
+
+        bitLength = index // 4 + 2
+        lowerBound = (4 + index % 4) << (bitLength - 3)
+        width = 1 << (bitLength - 3)
+
+        return lowerBound + (width - 1) / 2
+
+# Collects counters and histograms for hot paths of the program
+# Instrumented code should check "enabled" flag first, so disabled monitor costs one attribute read
+class PerformanceMonitor():
+    # Time window to calculate FPS
+    FPS_WINDOW_NS = 1_000_000_000
+
+    def __init__(self) -> None:
+        self.enabled = False
+
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._frameTimestamps = deque()
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        return self._counters
+
+    @property
+    def histograms(self) -> Dict[str, Histogram]:
+        return self._histograms
+
+    def incrementCounter(self, name: str, value: int = 1) -> None:
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    # Adds value sample (e.g. candidate set size) to named histogram
+    def addSample(self, name: str, value: int) -> None:
+        histogram = self._histograms.get(name)
+
+        if histogram is None:
+            histogram = Histogram()
+            self._histograms[name] = histogram
+
+        histogram.addSample(value)
+
+    # Returns timestamp to be passed to stopTimer, or 0 if monitor is disabled
+    def startTimer(self) -> int:
+        if self.enabled:
+            return perf_counter_ns()
+        return 0
+
+    # Adds latency sample in nanoseconds to named histogram
+    # Timers started while monitor was disabled are ignored
+    def stopTimer(self, name: str, startTimestamp: int) -> None:
+        if startTimestamp and self.enabled:
+            self.addSample(name, perf_counter_ns() - startTimestamp)
+
+    # Registers painted frame for FPS calculation
+    def recordFrame(self) -> None:
+        now = perf_counter_ns()
+        self._frameTimestamps.append(now)
+
+        while self._frameTimestamps[0] < now - PerformanceMonitor.FPS_WINDOW_NS:
+            self._frameTimestamps.popleft()
+
+    # Frames painted during last second
+    def getFps(self) -> int:
+        if not self._frameTimestamps:
+            return 0
+
+        # Frames older than window could remain if nothing was painted recently
+        threshold = perf_counter_ns() - PerformanceMonitor.FPS_WINDOW_NS
+        return sum(1 for timestamp in self._frameTimestamps if timestamp >= threshold)
+
+    def getCounter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    # Returns histogram by name, empty histogram is returned if nothing was recorded
+    def getHistogram(self, name: str) -> Histogram:
+        return self._histograms.get(name, Histogram())
+
+    # Collects metrics to a dictionary, latencies are reported in nanoseconds
+    def getMetrics(self) -> dict:
+        histograms = {}
+
+        for name, histogram in self._histograms.items():
+            histograms[name] = {"count": histogram.count,
+                                "mean": histogram.mean,
+                                "p50": histogram.percentile(50),
+                                "p95": histogram.percentile(95),
+                                "p99": histogram.percentile(99),
+                                "max": histogram.maxValue}
+
+        return {"fps": self.getFps(),
+                "counters": dict(self._counters),
+                "histograms": histograms}
+
+    # Writes collected metrics to a JSON file
+    def dumpMetrics(self, filePath: str) -> None:
+        with open(filePath, "w", encoding="utf-8") as metricsFile:
+            json.dump(self.getMetrics(), metricsFile, indent=4)
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._histograms.clear()
+        self._frameTimestamps.clear()
+
+# Shared monitor instance used by instrumented modules
+PERF_MONITOR = PerformanceMonitor()
@@ -0,0 +1,30 @@
+from typing import Dict
+
+from PyQt5.QtCore import QSize
+
+from adaptive_collection import AdaptiveShapesCollection
+import positioning_helper_grid
+import positioning_helper_ineffective
+import positioning_helper_v2
+
+# Registry of positioning backends: shapes collection class and collision processor class working with it
+# Any registered backend should give the same results as reference one, see stress_harness.py
+POSITIONING_BACKENDS: Dict[str, tuple] = {}
+
+# Backend with the simplest implementation, other backends are compared with it
+REFERENCE_BACKEND = "ineffective"
+
+def registerPositioningBackend(name: str, collectionClass: type, collisionProcessorClass: type) -> None:
+    POSITIONING_BACKENDS[name] = (collectionClass, collisionProcessorClass)
+
+# Returns new (shapes collection, collision processor) pair of backend
+def createPositioningBackend(name: str, worldSize: QSize) -> tuple:
+    collectionClass, collisionProcessorClass = POSITIONING_BACKENDS[name]
+    shapesCollection = collectionClass()
+
+    return shapesCollection, collisionProcessorClass(worldSize, shapesCollection)
+
+registerPositioningBackend(REFERENCE_BACKEND, positioning_helper_ineffective.ShapesCollection, positioning_helper_ineffective.CollisionProcessor)
+registerPositioningBackend("v2", positioning_helper_v2.ShapesCollection, positioning_helper_v2.CollisionProcessor)
+registerPositioningBackend("grid", positioning_helper_grid.ShapesCollection, positioning_helper_v2.CollisionProcessor)
+registerPositioningBackend("adaptive", AdaptiveShapesCollection, positioning_helper_v2.CollisionProcessor)
@@ -0,0 +1,225 @@
+from typing import List, Dict, Iterable
+
+from PyQt5.QtCore import QPoint, QRect
+
+import constants
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+from shape_boxes import ShapeBoxes
+
+# Class with custom shapes collection, same interface as positioning_helper_v2.ShapesCollection
+#
+# World is split into square cells, every shape is registered in all cells its bounding box overlaps
+# Search looks only into cells of searched point or rect, so it does not depend on shapes X coordinates:
+# shapes stacked vertically with the same X, or one very wide shape, do not make search longer,
+# which is the worst case for sorted list of positioning_helper_v2
+#
+# Cells covered by each shape are saved, so shape could be removed from cells after it was moved by caller
+class ShapesCollection():
+    def __init__(self, cellSize: int = constants.GRID_INDEX_CELL_SIZE) -> None:
+        self._cellSize = cellSize
+        self._shapesList: List[CustomShape] = []
+        self._cells: Dict[tuple, List[CustomShape]] = {}
+        # Range of cells (first column, first row, last column, last row) each shape is registered in
+        self._shapeCells: Dict[CustomShape, tuple] = {}
+
+        self._shapeMaxWidth = 0
+        self._shapeMinWidth = 0
+        self._generation = 0
+
+        # Number of queries and number of shapes checked by them, used to compare efficiency of collections
+        self._scansCount = 0
+        self._scannedCount = 0
+
+    @property
+    def shapesList(self) -> List[CustomShape]:
+        return self._shapesList
+
+    # Width of the widest shape ever added since last clear
+    @property
+    def maxShapeWidth(self) -> int:
+        return self._shapeMaxWidth
+
+    # Width of the narrowest shape ever added since last clear
+    @property
+    def minShapeWidth(self) -> int:
+        return self._shapeMinWidth
+
+    # Modification counter, changes on every add, delete or move of shapes
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # Number of queries and total number of shapes checked by them
+    @property
+    def scanStatistics(self) -> tuple:
+        return self._scansCount, self._scannedCount
+
+    def addShape(self, shape: CustomShape) -> None:
+        self._generation += 1
+        self._shapesList.append(shape)
+        self.__registerShape(shape)
+
+        if shape.boundingBox.width() > self._shapeMaxWidth:
+            self._shapeMaxWidth = shape.boundingBox.width()
+
+        if shape.boundingBox.width() < self._shapeMinWidth or len(self._shapesList) == 1:
+            self._shapeMinWidth = shape.boundingBox.width()
+
+    def updateShapePosition(self, shape: CustomShape, newCenterPoint: QPoint) -> None:
+        shape.setNewCenterPoint(newCenterPoint)
+        self.relocateShapes([shape])
+
+    # Updates cells of shapes, which were already moved by caller
+    # Small moves usually keep shape in the same cells, such shapes are skipped
+    def relocateShapes(self, shapes: Iterable[CustomShape]) -> None:
+        self._generation += 1
+
+        for shape in shapes:
+            if self.__getCellsRange(shape.boundingBox) != self._shapeCells[shape]:
+                self.__unregisterShape(shape)
+                self.__registerShape(shape)
+
+    # Same as relocateShapes for shapes, which boxes before and after move are known (see ShapeBoxes)
+    # Cells are compared for all boxes at once, only shapes moved to other cells are registered again
+    def relocateShapeBoxes(self, oldBoxes: ShapeBoxes, newBoxes: ShapeBoxes) -> None:
+        self._generation += 1
+
+        for index in ShapeBoxes.getIndexesOfChangedCells(oldBoxes, newBoxes, self._cellSize):
+            shape = newBoxes.shapes[index]
+            self.__unregisterShape(shape)
+            self.__registerShape(shape)
+
+    def getShapeAtPoint(self, point: QPoint) -> CustomShape:
+        cellShapes = self._cells.get((point.x() // self._cellSize, point.y() // self._cellSize), [])
+        self.__countScan(len(cellShapes))
+
+        for shape in cellShapes:
+            if shape.isPointOnShape(point):
+                return shape
+
+        return None
+
+    def popShapeAtPoint(self, point: QPoint) -> CustomShape:
+        result = self.getShapeAtPoint(point)
+
+        if result:
+            self.deleteShape(result)
+
+        return result
+
+    # Returns list of shapes which bounding boxes intersect with specified rect
+    # If rect covers more cells than there are non-empty cells, non-empty cells are iterated instead
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        firstColumn, firstRow, lastColumn, lastRow = self.__getCellsRange(rect)
+
+        if (lastColumn - firstColumn + 1) * (lastRow - firstRow + 1) > len(self._cells):
+            cellsShapes = [cellShapes for (column, row), cellShapes in self._cells.items()
+                           if firstColumn <= column <= lastColumn and firstRow <= row <= lastRow]
+        else:
+            cellsShapes = [self._cells[cell] for cell in ((column, row) for row in range(firstRow, lastRow + 1) for column in range(firstColumn, lastColumn + 1))
+                           if cell in self._cells]
+
+        result = []
+        foundShapes = set()
+        scannedCount = 0
+
+        for cellShapes in cellsShapes:
+            scannedCount += len(cellShapes)
+
+            for shape in cellShapes:
+                if shape not in foundShapes and shape.boundingBox.intersects(rect):
+                    foundShapes.add(shape)
+                    result.append(shape)
+
+        self.__countScan(scannedCount)
+        return result
+
+    def deleteShape(self, shape: CustomShape) -> None:
+        self._generation += 1
+        self.__unregisterShape(shape)
+        self._shapesList.remove(shape)
+
+    # Deleted shapes are removed from their cells, shapes list is compacted in a single pass
+    # Shapes which are not in collection are skipped, same as in other collections
+    def deleteShapes(self, shapes: Iterable[CustomShape]) -> None:
+        tombstones = {shape for shape in shapes if shape in self._shapeCells}
+
+        if not tombstones:
+            return
+
+        self._generation += 1
+
+        for shape in tombstones:
+            self.__unregisterShape(shape)
+
+        self._shapesList[:] = [shape for shape in self._shapesList if shape not in tombstones]
+
+    def clearCollection(self) -> None:
+        self._generation += 1
+        self._shapesList.clear()
+        self._cells.clear()
+        self._shapeCells.clear()
+        self._shapeMaxWidth = 0
+        self._shapeMinWidth = 0
+
+    # Cells are cheap to rebuild, so index is not saved
+    def exportIndex(self) -> dict:
+        return None
+
+    # Replaces content of collection with shapes, there is no saved index to adopt
+    def loadShapes(self, shapes: List[CustomShape], index: dict = None) -> bool:
+        self.clearCollection()
+
+        for shape in shapes:
+            self.addShape(shape)
+
+        return False
+
+    # Replaces order of shapes with the same shapes in new order, e.g. spatial one
+    # Cells are filled again in this order, so shapes in each cell and cells themselves follow it
+    # Returns true if shapes were reordered
+    def reorderShapes(self, shapes: List[CustomShape]) -> bool:
+        self._generation += 1
+        self._shapesList[:] = shapes
+        self._cells.clear()
+        self._shapeCells.clear()
+
+        for shape in shapes:
+            self.__registerShape(shape)
+
+        return True
+
+    def __registerShape(self, shape: CustomShape) -> None:
+        cellsRange = self.__getCellsRange(shape.boundingBox)
+        firstColumn, firstRow, lastColumn, lastRow = cellsRange
+
+        self._shapeCells[shape] = cellsRange
+
+        for row in range(firstRow, lastRow + 1):
+            for column in range(firstColumn, lastColumn + 1):
+                self._cells.setdefault((column, row), []).append(shape)
+
+    # Shape is removed from cells it was registered in, not from cells of its current position
+    def __unregisterShape(self, shape: CustomShape) -> None:
+        firstColumn, firstRow, lastColumn, lastRow = self._shapeCells.pop(shape)
+
+        for row in range(firstRow, lastRow + 1):
+            for column in range(firstColumn, lastColumn + 1):
+                cellShapes = self._cells[(column, row)]
+                cellShapes.remove(shape)
+
+                if not cellShapes:
+                    del self._cells[(column, row)]
+
+    def __getCellsRange(self, rect: QRect) -> tuple:
+        return (rect.left() // self._cellSize, rect.top() // self._cellSize,
+                rect.right() // self._cellSize, rect.bottom() // self._cellSize)
+
+    def __countScan(self, scannedCount: int) -> None:
+        self._scansCount += 1
+        self._scannedCount += scannedCount
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("query.calls")
+            PERF_MONITOR.addSample("query.scan_length", scannedCount)
@@ -1,9 +1,9 @@
-from typing import List
+from typing import List, Iterable
 
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtCore import QPoint
+from PyQt5.QtCore import QPoint, QRect, QSize
 
 from custom_shape import CustomShape
+from shape_boxes import ShapeBoxes
 
 # Class with custom shapes collection
 # Main goals: store all shapes on a plane, add/modify/delete shapes,
@@ -14,14 +14,32 @@ from custom_shape import CustomShape
 class ShapesCollection():
     def __init__(self) -> None:
         self._nodesList: List[CustomShape] = []
+        self._generation = 0
 
     @property
     def shapesList(self) -> List[CustomShape]:
         return self._nodesList
 
+    # Modification counter, changes on every add, delete or move of shapes
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def maxShapeWidth(self) -> int:
+        return max((node.boundingBox.width() for node in self._nodesList), default=0)
+
+    @property
+    def minShapeWidth(self) -> int:
+        return min((node.boundingBox.width() for node in self._nodesList), default=0)
+
     def addShape(self, shape: CustomShape) -> None:
+        self._generation += 1
         self._nodesList.append(shape)
 
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        return [node for node in self._nodesList if node.boundingBox.intersects(rect)]
+
     def getShapeAtPoint(self, point: QPoint) -> CustomShape:
         for node in self._nodesList:
             if node.isPointOnShape(point):
@@ -38,41 +56,94 @@ class ShapesCollection():
         else:
             return None
     
+    def updateShapePosition(self, shape: CustomShape, newCenterPoint: QPoint) -> None:
+        self._generation += 1
+        shape.setNewCenterPoint(newCenterPoint)
+
+    # Shapes are not indexed, so only modification counter is updated
+    def relocateShapes(self, shapes: Iterable[CustomShape]) -> None:
+        self._generation += 1
+
+    # Same for shapes, which boxes before and after move are known
+    def relocateShapeBoxes(self, oldBoxes: ShapeBoxes, newBoxes: ShapeBoxes) -> None:
+        self._generation += 1
+
     def deleteShape(self, shape: CustomShape) -> None:
+        self._generation += 1
         self._nodesList.remove(shape)
 
+    def deleteShapes(self, shapes: Iterable[CustomShape]) -> None:
+        self._generation += 1
+        tombstones = set(shapes)
+        self._nodesList[:] = [node for node in self._nodesList if node not in tombstones]
+
     def clearCollection(self) -> None:
+        self._generation += 1
         self._nodesList.clear()
 
+    # Shapes are not indexed, so there is no index to save
+    def exportIndex(self) -> dict:
+        return None
+
+    # Replaces content of collection with shapes, there is no index to adopt
+    def loadShapes(self, shapes: List[CustomShape], index: dict = None) -> bool:
+        self._generation += 1
+        self._nodesList[:] = shapes
+        return False
+
+    # Replaces order of shapes with the same shapes in new order, returns true if shapes were reordered
+    def reorderShapes(self, shapes: List[CustomShape]) -> bool:
+        self._generation += 1
+        self._nodesList[:] = shapes
+        return True
+
 # Class to check for shapes collisions/overlaps
-# Requires area to process borders collisions 
+# Requires world size to process borders collisions 
 # and collection of shapes to process collisions between shapes
 #
 # Current implemetation is ineffective and uses simple iterating through entire shapes collection
 # This works for a small number of shapes, but will lead to poor performance for bigger collection
 class CollisionProcessor():
-    def __init__(self, drawingWidget: QWidget, shapesCollection: ShapesCollection) -> None:
-        self._drawingWidget = drawingWidget
+    def __init__(self, worldSize: QSize, shapesCollection: ShapesCollection) -> None:
+        self._worldSize = worldSize
         self._shapesCollection = shapesCollection
 
-    # Check if new shape fits into draw area
+    # Check if new shape fits into the world
     def areaBorderCheck(self, shape: CustomShape) -> bool:
         if shape.getTopLeftBound().x() < 0 or shape.getTopLeftBound().y() < 0:
             return False
 
-        if shape.getBottomRightBound().x() > self._drawingWidget.width() or shape.getBottomRightBound().y() > self._drawingWidget.height():
+        if shape.getBottomRightBound().x() > self._worldSize.width() or shape.getBottomRightBound().y() > self._worldSize.height():
             return False
         
         return True
     
-    # Check collisions with other shapes
+    # Check collisions with other shapes: boundary check first, precise check only if boundaries intersect
     def shapeCollisionCheck(self, shape: CustomShape) -> bool:
         for node in self._shapesCollection.shapesList:
-            if node != shape and shape.checkIntersectionBoundary(node):
+            if node != shape and shape.checkIntersectionBoundary(node) and node.checkIntersectionPrecise(shape):
                 return False
             
         return True
     
     # Complete collision check
     def completeCollisionCheck(self, shape: CustomShape) -> bool:
-        return self.areaBorderCheck(shape) and self.shapeCollisionCheck(shape)
\ No newline at end of file
+        return self.areaBorderCheck(shape) and self.shapeCollisionCheck(shape)
+
+    # Check shapes against world borders one by one
+    def getShapesOutsideArea(self, shapes: ShapeBoxes) -> List[CustomShape]:
+        return [shape for shape in shapes.shapes if not self.areaBorderCheck(shape)]
+
+    # Check collisions between shapes of the boxes, every pair is checked
+    # If changed shapes are given, every pair of changed shape and other shape is checked
+    def getMutuallyCollidingShapes(self, shapes: ShapeBoxes, changedShapes: ShapeBoxes = None) -> set[CustomShape]:
+        result = set()
+        shapes = shapes.shapes
+
+        for index, shape in enumerate(shapes if changedShapes is None else changedShapes.shapes):
+            for other in shapes[index + 1:] if changedShapes is None else shapes:
+                if shape is not other and shape.checkIntersectionBoundary(other) and other.checkIntersectionPrecise(shape):
+                    result.add(shape)
+                    result.add(other)
+
+        return result
\ No newline at end of file
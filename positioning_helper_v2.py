@@ -1,9 +1,14 @@
-from typing import List
+import zlib
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+from typing import List, Dict, Iterable
 
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtCore import QPoint
+from PyQt5.QtCore import QPoint, QRect, QSize
 
 from custom_shape import CustomShape
+from shape_boxes import ShapeBoxes
+from performance_monitor import PERF_MONITOR
 
 # Class with custom shapes collection
 # Main goals: store all shapes on a plane, add/modify/delete shapes,
@@ -13,53 +18,176 @@ from custom_shape import CustomShape
 #
 # Uses simple binary search through sorted array of shapes bounding boxes edge points
 # to quickly find intersections between bounding boxes
+#
+# Results of point lookups are cached until collection is modified:
+# every modification bumps generation counter, cache filled during older generation is dropped
 class ShapesCollection():
+    # Cache is dropped when it grows over this size to keep memory bounded
+    HIT_CACHE_MAX_SIZE = 1024
+    # Version of saved index format, index of other version is not adopted
+    INDEX_VERSION = 1
+
     def __init__(self) -> None:
         self._shapesList: List[CustomShape] = []
-        self._nodeBoundaryPointsList: List[tuple] = []          # TODO: This tuple ideally should be of specific class
+        # Boundary points are left and right borders of shapes sorted by x, kept as two parallel lists: x of points and their shapes
+        # List of plain ints is cheap to build from arrays and is not tracked by garbage collector, unlike list of (x, shape) tuples
+        self._nodeBoundaryXList: List[int] = []
+        self._nodeBoundaryShapeList: List[CustomShape] = []
         # This value is used to restict search for point intersections
         self._shapeMaxWidth = 0
+        # This value is used to detect shapes too small to be drawn individually
+        self._shapeMinWidth = 0
+
+        # Modification counter and point lookup cache bound to it
+        self._generation = 0
+        self._hitCache: Dict[tuple, CustomShape] = {}
+        self._hitCacheGeneration = 0
+
+        # Number of queries and number of boundary points scanned by them, used to detect degenerate cases
+        self._scansCount = 0
+        self._scannedCount = 0
 
     @property
     def shapesList(self) -> List[CustomShape]:
         return self._shapesList
 
+    # Width of the widest shape ever added since last clear
+    @property
+    def maxShapeWidth(self) -> int:
+        return self._shapeMaxWidth
+
+    # Width of the narrowest shape ever added since last clear
+    @property
+    def minShapeWidth(self) -> int:
+        return self._shapeMinWidth
+
+    # Modification counter, changes on every add, delete or move of shapes
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # Number of queries and total number of boundary points scanned by them
+    @property
+    def scanStatistics(self) -> tuple:
+        return self._scansCount, self._scannedCount
+
     # Add shape to collection and update necessary metadata
     def addShape(self, shape: CustomShape) -> None:
+        self.__bumpGeneration()
         self._shapesList.append(shape)
 
-        if (len(self._nodeBoundaryPointsList) > 0):
-            indexToInsert = self.__findClosestBoundaryPointIndex(shape.getTopLeftBound().x()) + 1
+        self.__insertBoundaryPoint(shape.getTopLeftBound().x(), shape)
+        self.__insertBoundaryPoint(shape.getBottomRightBound().x(), shape)
+
+        # Update maximal shape width for optimized search
+        if shape.boundingBox.width() > self._shapeMaxWidth:
+            self._shapeMaxWidth = shape.boundingBox.width()
+
+        if shape.boundingBox.width() < self._shapeMinWidth or len(self._shapesList) == 1:
+            self._shapeMinWidth = shape.boundingBox.width()
 
-            # TODO: Refine this to separate method
-            # Bump index in edge case when __findClosestBoundaryPointIndex returned 0
-            # There could be no "more left" point in collection (see search method comments)
-            # Or index 0 could be actual result
-            # In insertion case it is critical, so distinguish it by result verification
-            if indexToInsert == 1:
-                if self._nodeBoundaryPointsList[indexToInsert - 1][0].x() >= shape.getTopLeftBound().x():
-                    indexToInsert -= 1
+    # Moves shape, which is in collection, to new center
+    # Only boundary points of the shape are moved in sorted list, shape is not removed from collection
+    def updateShapePosition(self, shape: CustomShape, newCenterPoint: QPoint) -> None:
+        self.__bumpGeneration()
 
-            self._nodeBoundaryPointsList.insert(indexToInsert, (shape.getTopLeftBound(), shape))
+        # Points are searched by old position of the shape
+        startingIndex = self.__findClosestBoundaryPointIndex(shape.getTopLeftBound().x())
+        pointIndexes = []
 
-            indexToInsert = self.__findClosestBoundaryPointIndex(shape.getBottomRightBound().x()) + 1
+        for index in range(max(startingIndex, 0), len(self._nodeBoundaryShapeList)):
+            if self._nodeBoundaryShapeList[index] == shape:
+                pointIndexes.append(index)
+            # When both found - stop
+            if len(pointIndexes) == 2:
+                break
 
-            if indexToInsert == 1:
-                if self._nodeBoundaryPointsList[indexToInsert - 1][0].x() >= shape.getTopLeftBound().x():
-                    indexToInsert -= 1
+        # Later point is removed first, so index of the earlier one stays valid
+        for index in reversed(pointIndexes):
+            del self._nodeBoundaryXList[index]
+            del self._nodeBoundaryShapeList[index]
 
-            self._nodeBoundaryPointsList.insert(indexToInsert, (shape.getBottomRightBound(), shape)) 
-        # If collection is empty - add first points
-        else:
-            self._nodeBoundaryPointsList.append((shape.getTopLeftBound(), shape))
-            self._nodeBoundaryPointsList.append((shape.getBottomRightBound(), shape))
+        shape.setNewCenterPoint(newCenterPoint)
 
-        # Update maximal shape width for optimized search
-        if shape.boundingBox.width() > self._shapeMaxWidth:
-            self._shapeMaxWidth = shape.boundingBox.width()
+        self.__insertBoundaryPoint(shape.getTopLeftBound().x(), shape)
+        self.__insertBoundaryPoint(shape.getBottomRightBound().x(), shape)
+
+    # Updates boundary points of several shapes, which were already moved by caller
+    # Points of moved shapes are replaced in a single pass, then list is sorted again:
+    # sort of almost sorted list takes about linear time, so any number of shapes costs O(n)
+    def relocateShapes(self, shapes: Iterable[CustomShape]) -> None:
+        movedShapes = set(shapes)
+
+        if not movedShapes:
+            return
+
+        self.__bumpGeneration()
+
+        boundaryPoints = [boundaryPoint for boundaryPoint in zip(self._nodeBoundaryXList, self._nodeBoundaryShapeList) if boundaryPoint[1] not in movedShapes]
+
+        for shape in movedShapes:
+            boundaryPoints.append((shape.getTopLeftBound().x(), shape))
+            boundaryPoints.append((shape.getBottomRightBound().x(), shape))
+
+        boundaryPoints.sort(key=itemgetter(0))
+        self.__setBoundaryPoints(boundaryPoints)
+
+    # Same as relocateShapes for shapes, which boxes before and after move are known (see ShapeBoxes)
+    # Points of moved shapes are sorted separately, then points of shapes, which were not moved, are merged into them:
+    # place of every such point is found by binary search and parts of lists between them are copied as is
+    def relocateShapeBoxes(self, oldBoxes: ShapeBoxes, newBoxes: ShapeBoxes) -> None:
+        if not len(newBoxes):
+            return
+
+        self.__bumpGeneration()
+
+        movedShapes = set(newBoxes.shapes)
+        keptShapes = [shape for shape in self._shapesList if shape not in movedShapes]
+        boundaryXs, boundaryShapes = newBoxes.getSortedBorders()
+
+        if not keptShapes:
+            self._nodeBoundaryXList[:] = boundaryXs
+            self._nodeBoundaryShapeList[:] = boundaryShapes
+            return
+
+        self._nodeBoundaryXList.clear()
+        self._nodeBoundaryShapeList.clear()
+        start = 0
+
+        for x, shape in ShapesCollection.__getSortedBoundaryPoints(keptShapes):
+            end = bisect_right(boundaryXs, x, start)
+
+            self._nodeBoundaryXList.extend(boundaryXs[start:end])
+            self._nodeBoundaryXList.append(x)
+            self._nodeBoundaryShapeList.extend(boundaryShapes[start:end])
+            self._nodeBoundaryShapeList.append(shape)
+            start = end
+
+        self._nodeBoundaryXList.extend(boundaryXs[start:])
+        self._nodeBoundaryShapeList.extend(boundaryShapes[start:])
 
     # Returns shape at specific point or None, if shape was not found
+    # Repeated lookups of the same point within one generation are served from cache
     def getShapeAtPoint(self, point: QPoint) -> CustomShape:
+        if self._hitCacheGeneration != self._generation or len(self._hitCache) >= ShapesCollection.HIT_CACHE_MAX_SIZE:
+            self._hitCache.clear()
+            self._hitCacheGeneration = self._generation
+
+        cacheKey = (point.x(), point.y())
+
+        # Empty results are cached as well, so membership is checked instead of value
+        if cacheKey in self._hitCache:
+            if PERF_MONITOR.enabled:
+                PERF_MONITOR.incrementCounter("query.hit_cache_hits")
+            return self._hitCache[cacheKey]
+
+        result = self.__findShapeAtPoint(point)
+        self._hitCache[cacheKey] = result
+
+        return result
+
+    # Uncached search of shape at specific point
+    def __findShapeAtPoint(self, point: QPoint) -> CustomShape:
         possibleShapes = self.__getBoundaryIntersectedShapesListAtPoint(point)
 
         # Several shapes could intersect their boundary rects, but could be not overlapped by other shape itself
@@ -88,8 +216,40 @@ class ShapesCollection():
 
         return result
 
+    # Returns list of shapes which bounding boxes intersect with specified rect
+    # Any such shape has its top-left point not further than widest shape width to the left of rect,
+    # so only this part of sorted boundary points list is scanned
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        searchStartIndex = self.__findClosestBoundaryPointIndex(rect.left() - self._shapeMaxWidth)
+
+        result = []
+
+        if searchStartIndex < 0:
+            return result
+
+        foundShapes = set()
+        searchEndIndex = len(self._nodeBoundaryXList)
+
+        for i in range(searchStartIndex, len(self._nodeBoundaryXList)):
+            x = self._nodeBoundaryXList[i]
+            shape = self._nodeBoundaryShapeList[i]
+
+            if x > rect.right():
+                searchEndIndex = i
+                break
+
+            if shape not in foundShapes and shape.boundingBox.intersects(rect):
+                foundShapes.add(shape)
+                result.append(shape)
+
+        self._scansCount += 1
+        self._scannedCount += searchEndIndex - searchStartIndex
+
+        return result
+
     # Removes shape from the collection
     def deleteShape(self, shape: CustomShape) -> None:
+        self.__bumpGeneration()
         pointsToDelete = []
 
         # Find starting point of shape
@@ -100,40 +260,166 @@ class ShapesCollection():
             return
 
         # Find both shape points (there can be only two in a collection at a time)
-        for point in range(startingIndex, len(self._nodeBoundaryPointsList)):
-            if self._nodeBoundaryPointsList[point][1] == shape:
-                pointsToDelete.append(self._nodeBoundaryPointsList[point])
+        for point in range(startingIndex, len(self._nodeBoundaryShapeList)):
+            if self._nodeBoundaryShapeList[point] == shape:
+                pointsToDelete.append(point)
             # When both found - stop
             if len(pointsToDelete) == 2:
                 break
         
-        # Remove found points
-        for point in pointsToDelete:
-            self._nodeBoundaryPointsList.remove(point)
+        # Remove found points, later point first, so index of the earlier one stays valid
+        for point in reversed(pointsToDelete):
+            del self._nodeBoundaryXList[point]
+            del self._nodeBoundaryShapeList[point]
 
         # Remove shape
         self._shapesList.remove(shape)
 
+    # Removes several shapes at once
+    # Deleted shapes are collected as tombstones first, then both lists are compacted in a single pass,
+    # so cost is O(n) for any number of deleted shapes instead of O(n) per shape
+    def deleteShapes(self, shapes: Iterable[CustomShape]) -> None:
+        tombstones = set(shapes)
+
+        if not tombstones:
+            return
+
+        self.__bumpGeneration()
+
+        # Lists are changed in place, so references to shapes list stay valid
+        self.__setBoundaryPoints([boundaryPoint for boundaryPoint in zip(self._nodeBoundaryXList, self._nodeBoundaryShapeList) if boundaryPoint[1] not in tombstones])
+        self._shapesList[:] = [shape for shape in self._shapesList if shape not in tombstones]
+
+    # Returns sorted boundary points list in form which could be saved along with shapes:
+    # each point is number of its shape in shapesList * 2 + corner (0 - top-left, 1 - bottom-right)
+    # Checksum protects saved index from damage, validity for loaded shapes is checked on load
+    def exportIndex(self) -> dict:
+        shapeNumbers = {shape: number for number, shape in enumerate(self._shapesList)}
+        seenShapes = set()
+        entries = array("q")
+
+        # Top-left point of shape is never to the right of bottom-right one, so the first found point is top-left
+        for shape in self._nodeBoundaryShapeList:
+            if shape in seenShapes:
+                entries.append(shapeNumbers[shape] * 2 + 1)
+            else:
+                seenShapes.add(shape)
+                entries.append(shapeNumbers[shape] * 2)
+
+        return {"version": ShapesCollection.INDEX_VERSION, "entries": entries, "checksum": zlib.crc32(entries.tobytes())}
+
+    # Replaces content of collection with shapes, e.g. loaded from file
+    # Saved index is adopted as is if it is valid for these shapes, otherwise index is rebuilt by single sort
+    # Either way it is O(n log n) at most, instead of O(n) list insert per added shape
+    # Returns true if saved index was adopted
+    def loadShapes(self, shapes: List[CustomShape], index: dict = None) -> bool:
+        self.clearCollection()
+        self._shapesList.extend(shapes)
+
+        if shapes:
+            self._shapeMaxWidth = max(shape.boundingBox.width() for shape in shapes)
+            self._shapeMinWidth = min(shape.boundingBox.width() for shape in shapes)
+
+        boundaryPoints = self.__getSavedBoundaryPoints(index) if index else None
+        indexAdopted = boundaryPoints is not None
+
+        if not indexAdopted:
+            boundaryPoints = ShapesCollection.__getSortedBoundaryPoints(shapes)
+
+        self.__setBoundaryPoints(boundaryPoints)
+
+        return indexAdopted
+
+    # Replaces order of shapes with the same shapes in new order, e.g. spatial one, index is rebuilt in bulk
+    # Sort is stable, so boundary points with the same X follow new order of shapes as well
+    # Returns true if shapes were reordered
+    def reorderShapes(self, shapes: List[CustomShape]) -> bool:
+        self.__bumpGeneration()
+        self._shapesList[:] = shapes
+        self.__setBoundaryPoints(ShapesCollection.__getSortedBoundaryPoints(shapes))
+
+        return True
+
+    @staticmethod
+    def __getSortedBoundaryPoints(shapes: List[CustomShape]) -> List[tuple]:
+        boundaryPoints = [(x, shape) for shape in shapes for x in (shape.getTopLeftBound().x(), shape.getBottomRightBound().x())]
+        boundaryPoints.sort(key=itemgetter(0))
+
+        return boundaryPoints
+
+    # Restores boundary points from saved index for shapes of collection, returns None if index is not valid:
+    # every point of every shape should be present once and points should be sorted by actual shapes positions
+    def __getSavedBoundaryPoints(self, index: dict) -> List[tuple]:
+        entries = index.get("entries")
+
+        if index.get("version") != ShapesCollection.INDEX_VERSION or not isinstance(entries, array):
+            return None
+
+        if len(entries) != len(self._shapesList) * 2 or zlib.crc32(entries.tobytes()) != index.get("checksum"):
+            return None
+
+        boundaryPoints = []
+        usedEntries = bytearray(len(entries))
+
+        for entry in entries:
+            if entry < 0 or entry >= len(entries) or usedEntries[entry]:
+                return None
+
+            usedEntries[entry] = 1
+            shape = self._shapesList[entry >> 1]
+            x = shape.getBottomRightBound().x() if entry & 1 else shape.getTopLeftBound().x()
+
+            if boundaryPoints and x < boundaryPoints[-1][0]:
+                return None
+
+            boundaryPoints.append((x, shape))
+
+        return boundaryPoints
+
+    # Marks collection as modified, which invalidates cached lookups
+    def __bumpGeneration(self) -> None:
+        self._generation += 1
+
+    # Replaces content of boundary points lists with sorted (x, shape) tuples
+    def __setBoundaryPoints(self, boundaryPoints: List[tuple]) -> None:
+        self._nodeBoundaryXList[:] = [x for x, _ in boundaryPoints]
+        self._nodeBoundaryShapeList[:] = [shape for _, shape in boundaryPoints]
+
+    # Inserts boundary point to sorted list after all points with lesser or equal X
+    def __insertBoundaryPoint(self, x: int, shape: CustomShape) -> None:
+        indexToInsert = self.__findClosestBoundaryPointIndex(x) + 1
+
+        # Bump index in edge case when __findClosestBoundaryPointIndex returned 0
+        # There could be no "more left" point in collection (see search method comments)
+        # Or index 0 could be actual result
+        # In insertion case it is critical, so distinguish it by result verification
+        if indexToInsert == 1:
+            if self._nodeBoundaryXList[indexToInsert - 1] >= x:
+                indexToInsert -= 1
+
+        self._nodeBoundaryXList.insert(indexToInsert, x)
+        self._nodeBoundaryShapeList.insert(indexToInsert, shape)
+
     # Returns index of "first" (or "most left") boundary point in list with X lesser than specified value
-    # Returns -1 if _nodeBoundaryPointsList is empty
+    # Returns -1 if _nodeBoundaryXList is empty
     def __findClosestBoundaryPointIndex(self, x: int) -> int:
-        if len(self._nodeBoundaryPointsList) == 0:
+        if len(self._nodeBoundaryXList) == 0:
             return -1
 
         # Start binary search
         searchFinished = False
         previousIndexBegin = 0
-        previousIndexEnd = len(self._nodeBoundaryPointsList) - 1
-        searchIndex = (len(self._nodeBoundaryPointsList) -1) // 2
+        previousIndexEnd = len(self._nodeBoundaryXList) - 1
+        searchIndex = (len(self._nodeBoundaryXList) -1) // 2
 
         while not searchFinished:
-            if self._nodeBoundaryPointsList[searchIndex][0].x() > x:
+            if self._nodeBoundaryXList[searchIndex] > x:
                 if searchIndex == previousIndexBegin:
                     searchFinished = True
                 previousIndexEnd = searchIndex
                 searchIndex = previousIndexBegin + ((previousIndexEnd - previousIndexBegin) // 2)
             
-            elif self._nodeBoundaryPointsList[searchIndex][0].x() < x:
+            elif self._nodeBoundaryXList[searchIndex] < x:
                 if searchIndex == previousIndexBegin:
                     searchFinished = True
                 previousIndexBegin = searchIndex
@@ -151,9 +437,9 @@ class ShapesCollection():
         # Logic below handles this situation:
         # When detected result is greater or equal of what we search
         # shift index "to the left" until array ends or until result is lesser than searched value
-        if self._nodeBoundaryPointsList[searchIndex][0].x() >= x:
+        if self._nodeBoundaryXList[searchIndex] >= x:
             for boundaryIndex in reversed(range(0, searchIndex)):
-                if self._nodeBoundaryPointsList[boundaryIndex][0].x() < x:
+                if self._nodeBoundaryXList[boundaryIndex] < x:
                     return boundaryIndex
             # Return 0 if x is least value among all
             return 0
@@ -164,11 +450,11 @@ class ShapesCollection():
         # 0 5 7 10 10 10 13 20 25
         #     ^
         else:
-            for boundaryIndex in range(searchIndex, len(self._nodeBoundaryPointsList)):
-                if self._nodeBoundaryPointsList[boundaryIndex][0].x() > x:
+            for boundaryIndex in range(searchIndex, len(self._nodeBoundaryXList)):
+                if self._nodeBoundaryXList[boundaryIndex] > x:
                     return boundaryIndex - 1
             # Or return last array's index
-            return len(self._nodeBoundaryPointsList) - 1
+            return len(self._nodeBoundaryXList) - 1
 
     # Returns list of shapes, which boundary boxes intersect with specified point
     def __getBoundaryIntersectedShapesListAtPoint(self, point: QPoint) -> set[CustomShape]:
@@ -180,52 +466,109 @@ class ShapesCollection():
         if searchStartIndex < 0:
             return possibleShapes
 
-        for i in range(searchStartIndex, len(self._nodeBoundaryPointsList)):
+        # Shape containing the point has its bottom-right point not further than widest shape width to the right
+        searchEndX = point.x() + self._shapeMaxWidth
+        scanLength = 0
+
+        for i in range(searchStartIndex, len(self._nodeBoundaryXList)):
+            x = self._nodeBoundaryXList[i]
+
+            if x > searchEndX:
+                break
+
+            shape = self._nodeBoundaryShapeList[i]
+
+            scanLength += 1
+
             # Point could be on shape if its Y falls between Y coords of shape's borders
-            if self._nodeBoundaryPointsList[i][1].getTopLeftBound().y() <= point.y() and self._nodeBoundaryPointsList[i][1].getBottomRightBound().y() >= point.y():
-                possibleShapes.add(self._nodeBoundaryPointsList[i][1])
+            if shape.getTopLeftBound().y() <= point.y() and shape.getBottomRightBound().y() >= point.y():
+                possibleShapes.add(shape)
+
+        self._scansCount += 1
+        self._scannedCount += scanLength
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("query.calls")
+            PERF_MONITOR.addSample("query.scan_length", scanLength)
+            PERF_MONITOR.addSample("query.candidates", len(possibleShapes))
 
         return possibleShapes
 
     # Clears collection and all related variables
     def clearCollection(self) -> None:
+        self.__bumpGeneration()
         self._shapesList.clear()
-        self._nodeBoundaryPointsList.clear()
+        self._nodeBoundaryXList.clear()
+        self._nodeBoundaryShapeList.clear()
         self._shapeMaxWidth = 0
+        self._shapeMinWidth = 0
 
 # Class to check for shapes collisions/overlaps
-# Requires area to process borders collisions 
+# Requires world size to process borders collisions 
 # and collection of shapes to process collisions between shapes
-#
-# Current implemetation is ineffective and uses simple iterating through entire shapes collection
-# This works for a small number of shapes, but will lead to poor performance for bigger collection
 class CollisionProcessor():
-    def __init__(self, drawingWidget: QWidget, shapesCollection: ShapesCollection) -> None:
-        self._drawingWidget = drawingWidget
+    def __init__(self, worldSize: QSize, shapesCollection: ShapesCollection) -> None:
+        self._worldSize = worldSize
         self._shapesCollection = shapesCollection
 
-    # Check if new shape fits into draw area
+    # Check if new shape fits into the world
     def areaBorderCheck(self, shape: CustomShape) -> bool:
         if shape.getTopLeftBound().x() < 0 or shape.getTopLeftBound().y() < 0:
             return False
 
-        if shape.getBottomRightBound().x() > self._drawingWidget.width() or shape.getBottomRightBound().y() > self._drawingWidget.height():
+        if shape.getBottomRightBound().x() > self._worldSize.width() or shape.getBottomRightBound().y() > self._worldSize.height():
             return False
         
         return True
     
-    # Check collisions with other shapes
+    # Check collisions with other shapes in two phases:
+    # broad phase gets shapes with intersecting bounding boxes from collection index,
+    # narrow phase checks actual shapes geometry only for these candidates
     def shapeCollisionCheck(self, shape: CustomShape) -> bool:
-        # Get list of shapes with intersecting boundary boxes
-        possibleIntersections = self._shapesCollection.getBoundaryIntersectedShapesSet(shape)
+        possibleIntersections = self._shapesCollection.getShapesInRect(shape.boundingBox)
+
+        result = True
+        checkedCount = 0
 
-        # For this shapes check actual intersections
         for possibleIntersection in possibleIntersections:
+            checkedCount += 1
+
             if possibleIntersection.checkIntersectionPrecise(shape):
-                return False
-            
-        return True
+                result = False
+                break
+
+        if PERF_MONITOR.enabled:
+            # Shapes rejected by each phase without precise check: by index and by actual geometry
+            PERF_MONITOR.incrementCounter("collision.checks")
+            PERF_MONITOR.incrementCounter("collision.broad_culled", len(self._shapesCollection.shapesList) - len(possibleIntersections))
+            PERF_MONITOR.incrementCounter("collision.narrow_culled", checkedCount - (0 if result else 1))
+            PERF_MONITOR.addSample("collision.candidates", len(possibleIntersections))
+
+        return result
     
     # Complete collision check
     def completeCollisionCheck(self, shape: CustomShape) -> bool:
-        return self.areaBorderCheck(shape) and self.shapeCollisionCheck(shape)
\ No newline at end of file
+        timerStart = PERF_MONITOR.startTimer()
+
+        result = self.areaBorderCheck(shape) and self.shapeCollisionCheck(shape)
+
+        PERF_MONITOR.stopTimer("collision.complete_check", timerStart)
+        return result
+
+    # Returns shapes which go out of the world, e.g. after batch move, same check as areaBorderCheck
+    def getShapesOutsideArea(self, shapes: ShapeBoxes) -> List[CustomShape]:
+        return shapes.getShapesOutside(self._worldSize.width(), self._worldSize.height())
+
+    # Returns shapes which collide with other shapes from the same boxes, e.g. with other moved shapes
+    # If changed shapes are given, only their collisions are checked, e.g. when they were moved back after previous check
+    # Pairs with intersecting bounding boxes are found by sort and sweep (see ShapeBoxes), only they are checked precisely
+    def getMutuallyCollidingShapes(self, shapes: ShapeBoxes, changedShapes: ShapeBoxes = None) -> set[CustomShape]:
+        result = set()
+        pairs = shapes.getIntersectingPairs() if changedShapes is None else changedShapes.getIntersectingPairs(shapes)
+
+        for shape, other in pairs:
+            if shape is not other and other.checkIntersectionPrecise(shape):
+                result.add(shape)
+                result.add(other)
+
+        return result
\ No newline at end of file
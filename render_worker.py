@@ -0,0 +1,155 @@
+from typing import Callable, List
+
+from PyQt5.QtGui import QPainter, QImage
+from PyQt5.QtCore import Qt, QObject, QThread, QPoint, QPointF, QRect, QSize, pyqtSignal, pyqtSlot
+
+from custom_group import expandGroupsInRect
+from geometry_change_listener import GeometryChangeListener
+from performance_monitor import PERF_MONITOR
+from scene_snapshot import SceneSnapshot
+from shape_style import drawShapesGrouped
+from shapes_link import drawLinksBatched
+from view_transform import ViewTransform
+
+# Everything needed to render one frame without access to live geometry
+# Scene snapshot is immutable, so worker thread could draw it while user edits the scene
+class RenderJob():
+    def __init__(self, snapshot: SceneSnapshot, worldRect: QRect, excludedShapeId: int, worldOrigin: QPointF, scale: float, imageSize: QSize) -> None:
+        self.snapshot = snapshot
+        self.worldRect = worldRect
+        # Shape which is drawn separately on GUI thread (e.g. selected one)
+        self.excludedShapeId = excludedShapeId
+        self.worldOrigin = worldOrigin
+        self.scale = scale
+        self.imageSize = imageSize
+
+# Worker which lives in background thread and paints jobs into QImages
+# Painting on QImage is allowed outside of GUI thread
+# Two buffers are used in turns: GUI thread shows one while worker paints into another
+class RenderWorker(QObject):
+    frameReady = pyqtSignal(QImage, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffers: List[QImage] = [QImage(), QImage()]
+        self._backBufferIndex = 0
+
+    @pyqtSlot(object)
+    def renderJob(self, job: RenderJob) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        if self._buffers[self._backBufferIndex].size() != job.imageSize:
+            self._buffers[self._backBufferIndex] = QImage(job.imageSize, QImage.Format.Format_ARGB32_Premultiplied)
+
+        image = self._buffers[self._backBufferIndex]
+        image.fill(Qt.GlobalColor.transparent)
+
+        painter = QPainter(image)
+        painter.scale(job.scale, job.scale)
+        painter.translate(-job.worldOrigin)
+
+        visibleShapes = [shape for shapeId, shape in job.snapshot.iterShapes()
+                         if shapeId != job.excludedShapeId and shape.boundingBox.intersects(job.worldRect)]
+        drawShapesGrouped(painter, expandGroupsInRect(visibleShapes, job.worldRect))
+
+        drawLinksBatched(painter, (link for link in job.snapshot.iterLinks() if link.boundingBox.intersects(job.worldRect)))
+
+        painter.end()
+
+        # Swap buffers
+        self._backBufferIndex = 1 - self._backBufferIndex
+
+        PERF_MONITOR.stopTimer("render.background_frame", timerStart)
+        self.frameReady.emit(image, job)
+
+# Internal object which passes jobs to worker thread via queued connection
+class _RenderJobDispatcher(QObject):
+    jobSubmitted = pyqtSignal(object)
+
+# Listener which marks background frame as outdated on any geometry change
+class _SceneDirtyListener(GeometryChangeListener):
+    def __init__(self, onChanged: Callable[[], None]) -> None:
+        self._onChanged = onChanged
+
+    def onRectChanged(self, rect: QRect) -> None:
+        self._onChanged()
+
+    def onSegmentChanged(self, point_1: QPoint, point_2: QPoint) -> None:
+        self._onChanged()
+
+    def onGeometryCleared(self) -> None:
+        self._onChanged()
+
+# Renders scene in background thread and keeps the latest finished frame (front buffer)
+# Only one job is in progress at a time, changes made during rendering are collected into one next job
+class BackgroundRenderer(QObject):
+    def __init__(self, createJob: Callable[[], RenderJob], onFrameReady: Callable[[], None]) -> None:
+        super().__init__()
+        # Function which captures scene snapshot on GUI thread
+        self._createJob = createJob
+        # Function which is called on GUI thread when new frame is available
+        self._onFrameReady = onFrameReady
+
+        self._frontBuffer: QImage = None
+        self._frontBufferJob: RenderJob = None
+
+        self._isDirty = True
+        self._isRendering = False
+
+        self._thread = QThread()
+        self._worker = RenderWorker()
+        self._worker.moveToThread(self._thread)
+
+        self._dispatcher = _RenderJobDispatcher()
+        self._dispatcher.jobSubmitted.connect(self._worker.renderJob)
+        self._worker.frameReady.connect(self.__acceptFrame)
+
+        self._changeListener = _SceneDirtyListener(self.markDirty)
+
+        self._thread.start()
+
+    # Listener to be registered in GeometryController
+    @property
+    def changeListener(self) -> GeometryChangeListener:
+        return self._changeListener
+
+    # Marks current frame as outdated, new frame is requested on next draw
+    def markDirty(self) -> None:
+        self._isDirty = True
+
+    # Draws the latest finished frame and requests new one if scene has changed
+    # Painter should be set to draw area coordinates
+    def drawFrame(self, painter: QPainter, viewTransform: ViewTransform) -> None:
+        if self._frontBuffer is not None:
+            job = self._frontBufferJob
+
+            # If view was only panned since frame was requested - shift frame accordingly
+            if job.scale == viewTransform.scale:
+                painter.drawImage(viewTransform.mapToView(job.worldOrigin), self._frontBuffer)
+            else:
+                painter.drawImage(QRect(QPoint(0, 0), job.imageSize), self._frontBuffer)
+
+        if self._isDirty and not self._isRendering:
+            self.__submitJob()
+
+    # Stops background thread, should be called before application exit
+    def stop(self) -> None:
+        self._thread.quit()
+        self._thread.wait()
+
+    def __submitJob(self) -> None:
+        self._isDirty = False
+        self._isRendering = True
+        self._dispatcher.jobSubmitted.emit(self._createJob())
+
+    @pyqtSlot(QImage, object)
+    def __acceptFrame(self, image: QImage, job: RenderJob) -> None:
+        self._frontBuffer = image
+        self._frontBufferJob = job
+        self._isRendering = False
+
+        # Changes made during rendering are picked up by next job
+        if self._isDirty:
+            self.__submitJob()
+
+        self._onFrameReady()
@@ -0,0 +1,337 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor
+from multiprocessing import get_context
+from typing import Dict, List, TextIO
+
+from PyQt5.QtGui import QGuiApplication, QPainter, QImage, QPen, QBrush, QColor, QPolygon, QPolygonF
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect
+
+import constants
+from custom_group import expandGroupsInRect
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+from scene_snapshot import SceneSnapshot
+from shape_style import SHAPE_STYLES, drawShapesGrouped
+from shapes_link import ShapesLinkBase, drawLinksBatched
+
+# Export of scene snapshot to images
+#
+# PNG: world rect is split into tiles of EXPORT_TILE_SIZE_PX, tiles are rendered in process pool
+# by the same drawing code as on screen, then stitched into single image or saved as tile pyramid
+# Every worker process gets the scene once and renders tiles headless, with offscreen Qt platform
+#
+# SVG: elements are written to file as shapes are drawn, document is never kept in memory
+class SceneExporter():
+    def __init__(self, worldRect: QRect, scale: float = 1.0, workersCount: int = None) -> None:
+        self._worldRect = QRect(worldRect)
+        # Number of image pixels per world unit
+        self._scale = scale
+        self._workersCount = workersCount or os.cpu_count()
+
+        self._tileSize = constants.EXPORT_TILE_SIZE_PX
+        self._imageWidth = max(ceil(worldRect.width() * scale), 1)
+        self._imageHeight = max(ceil(worldRect.height() * scale), 1)
+        self._columnsCount = ceil(self._imageWidth / self._tileSize)
+        self._rowsCount = ceil(self._imageHeight / self._tileSize)
+
+    # Exports to directory: "scene.svg" and "scene.png", or "tiles" pyramid if image is bigger than EXPORT_MAX_IMAGE_SIZE_PX
+    def exportToDirectory(self, snapshot: SceneSnapshot, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+        if max(self._imageWidth, self._imageHeight) <= constants.EXPORT_MAX_IMAGE_SIZE_PX:
+            self.exportPng(snapshot, os.path.join(directory, "scene.png"))
+        else:
+            self.exportTilePyramid(snapshot, os.path.join(directory, "tiles"))
+
+        self.exportSvg(snapshot, os.path.join(directory, "scene.svg"))
+
+    # Renders the whole world rect into single PNG file, image should fit into memory
+    def exportPng(self, snapshot: SceneSnapshot, filePath: str) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        image = QImage(self._imageWidth, self._imageHeight, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+
+        with self.__createWorkersPool(snapshot) as pool:
+            for tileX, tileY, tileData in pool.map(_renderTileData, self.__iterTiles(), chunksize=self.__getChunkSize()):
+                tile = QImage(tileData, self._tileSize, self._tileSize, QImage.Format.Format_ARGB32_Premultiplied)
+                painter.drawImage(QPoint(tileX * self._tileSize, tileY * self._tileSize), tile)
+
+        painter.end()
+        image.save(filePath, "PNG")
+
+        PERF_MONITOR.stopTimer("export.png", timerStart)
+
+    # Renders world rect into tiles saved as "<directory>/<level>/<column>_<row>.png"
+    # Level 0 has full scale, every next level is 2 times smaller, the last level is a single tile
+    # Returns number of levels
+    def exportTilePyramid(self, snapshot: SceneSnapshot, directory: str) -> int:
+        timerStart = PERF_MONITOR.startTimer()
+
+        columnsCount = self._columnsCount
+        rowsCount = self._rowsCount
+        level = 0
+
+        with self.__createWorkersPool(snapshot) as pool:
+            os.makedirs(os.path.join(directory, "0"), exist_ok=True)
+            tiles = [(tileX, tileY, directory) for tileX, tileY in self.__iterTiles()]
+            list(pool.map(_saveTile, tiles, chunksize=self.__getChunkSize()))
+
+            # Every tile of the next level is made of 4 tiles of the previous one, tiles of one level are independent
+            while columnsCount > 1 or rowsCount > 1:
+                level += 1
+                columnsCount = ceil(columnsCount / 2)
+                rowsCount = ceil(rowsCount / 2)
+
+                os.makedirs(os.path.join(directory, str(level)), exist_ok=True)
+                tiles = [(tileX, tileY, directory, level) for tileY in range(rowsCount) for tileX in range(columnsCount)]
+                list(pool.map(_saveDownscaledTile, tiles, chunksize=max(len(tiles) // (self._workersCount * 4), 1)))
+
+        PERF_MONITOR.stopTimer("export.pyramid", timerStart)
+        return level + 1
+
+    # Writes shapes and links inside world rect to SVG file
+    def exportSvg(self, snapshot: SceneSnapshot, filePath: str) -> None:
+        timerStart = PERF_MONITOR.startTimer()
+
+        with open(filePath, "w", encoding="utf-8") as file:
+            writer = SvgStreamWriter(file, self._worldRect, self._imageWidth, self._imageHeight)
+            painter = SvgPainter(writer)
+
+            for _, shape in snapshot.iterShapes():
+                if shape.boundingBox.intersects(self._worldRect):
+                    drawShapesGrouped(painter, expandGroupsInRect([shape], self._worldRect))
+
+            for link in snapshot.iterLinks():
+                if link.boundingBox.intersects(self._worldRect):
+                    link.drawLink(painter)
+
+            writer.close()
+
+        PERF_MONITOR.stopTimer("export.svg", timerStart)
+
+    # Workers are started by spawn, since forking process with running Qt is not safe
+    # Scene is passed to every worker once, on worker start
+    def __createWorkersPool(self, snapshot: SceneSnapshot) -> ProcessPoolExecutor:
+        shapes = [shape for _, shape in snapshot.iterShapes() if shape.boundingBox.intersects(self._worldRect)]
+        links = [link for link in snapshot.iterLinks() if link.boundingBox.intersects(self._worldRect)]
+
+        return ProcessPoolExecutor(max_workers=self._workersCount,
+                                   mp_context=get_context("spawn"),
+                                   initializer=_initWorker,
+                                   initargs=(SHAPE_STYLES.getStyleRecords(), shapes, links,
+                                             self._worldRect, self._scale, self._tileSize))
+
+    def __iterTiles(self):
+        for tileY in range(self._rowsCount):
+            for tileX in range(self._columnsCount):
+                yield tileX, tileY
+
+    # Several tiles are sent to worker at once to reduce overhead, but there are still enough tasks to balance workers
+    def __getChunkSize(self) -> int:
+        return max(self._columnsCount * self._rowsCount // (self._workersCount * 4), 1)
+
+# Scene of worker process, set once by _initWorker
+class _WorkerScene():
+    def __init__(self, shapes: List[CustomShape], links: List[ShapesLinkBase], worldRect: QRect, scale: float, tileSize: int) -> None:
+        self.worldRect = worldRect
+        self.scale = scale
+        self.tileSize = tileSize
+
+        # Shapes and links are distributed by tiles they overlap, so every tile gets its part without search
+        self.tileShapes: Dict[tuple, List[CustomShape]] = {}
+        self.tileLinks: Dict[tuple, List[ShapesLinkBase]] = {}
+
+        for shape in shapes:
+            for tile in self.__getTiles(shape.boundingBox):
+                self.tileShapes.setdefault(tile, []).append(shape)
+
+        for link in links:
+            for tile in self.__getTiles(link.boundingBox):
+                self.tileLinks.setdefault(tile, []).append(link)
+
+    # World rect covered by tile, with border of one unit to catch shapes touching tile edges
+    def getTileWorldRect(self, tileX: int, tileY: int) -> QRect:
+        tileWorldSize = self.tileSize / self.scale
+        return QRect(QPoint(floor(self.worldRect.left() + tileX * tileWorldSize) - 1, floor(self.worldRect.top() + tileY * tileWorldSize) - 1),
+                     QPoint(ceil(self.worldRect.left() + (tileX + 1) * tileWorldSize) + 1, ceil(self.worldRect.top() + (tileY + 1) * tileWorldSize) + 1))
+
+    def __getTiles(self, rect: QRect):
+        tileWorldSize = self.tileSize / self.scale
+
+        firstX = max(floor((rect.left() - self.worldRect.left() - 1) / tileWorldSize), 0)
+        lastX = floor((rect.right() + 1 - self.worldRect.left()) / tileWorldSize)
+        firstY = max(floor((rect.top() - self.worldRect.top() - 1) / tileWorldSize), 0)
+        lastY = floor((rect.bottom() + 1 - self.worldRect.top()) / tileWorldSize)
+
+        for tileY in range(firstY, lastY + 1):
+            for tileX in range(firstX, lastX + 1):
+                yield tileX, tileY
+
+_workerScene: _WorkerScene = None
+_workerApplication = None
+
+# Prepares worker process: headless Qt, the same styles table as in main process and scene split by tiles
+def _initWorker(styleRecords: List[tuple], shapes: List[CustomShape], links: List[ShapesLinkBase], worldRect: QRect, scale: float, tileSize: int) -> None:
+    global _workerScene, _workerApplication
+
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+    if QGuiApplication.instance() is None:
+        _workerApplication = QGuiApplication([])
+
+    SHAPE_STYLES.setStyleRecords(styleRecords)
+    _workerScene = _WorkerScene(shapes, links, worldRect, scale, tileSize)
+
+# Draws tile with the same code as draw area uses
+def _renderTile(tileX: int, tileY: int) -> QImage:
+    scene = _workerScene
+    tileRect = scene.getTileWorldRect(tileX, tileY)
+
+    image = QImage(scene.tileSize, scene.tileSize, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.white)
+
+    painter = QPainter(image)
+    painter.scale(scene.scale, scene.scale)
+    painter.translate(-QPointF(scene.worldRect.left() + tileX * scene.tileSize / scene.scale,
+                               scene.worldRect.top() + tileY * scene.tileSize / scene.scale))
+
+    drawShapesGrouped(painter, expandGroupsInRect(scene.tileShapes.get((tileX, tileY), []), tileRect))
+
+    drawLinksBatched(painter, scene.tileLinks.get((tileX, tileY), []))
+
+    painter.end()
+    return image
+
+# Returns raw pixels of tile to be stitched by main process
+def _renderTileData(tile: tuple) -> tuple:
+    tileX, tileY = tile
+    image = _renderTile(tileX, tileY)
+
+    return tileX, tileY, image.constBits().asstring(image.sizeInBytes())
+
+# Saves tile of pyramid level 0, PNG compression is done by worker as well
+def _saveTile(tile: tuple) -> None:
+    tileX, tileY, directory = tile
+    _renderTile(tileX, tileY).save(_getTilePath(directory, 0, tileX, tileY), "PNG")
+
+# Makes tile of pyramid level from 4 tiles of previous level
+def _saveDownscaledTile(tile: tuple) -> None:
+    tileX, tileY, directory, level = tile
+    tileSize = _workerScene.tileSize
+
+    image = QImage(tileSize * 2, tileSize * 2, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.white)
+    painter = QPainter(image)
+
+    for offsetY in range(2):
+        for offsetX in range(2):
+            path = _getTilePath(directory, level - 1, tileX * 2 + offsetX, tileY * 2 + offsetY)
+
+            if os.path.exists(path):
+                painter.drawImage(QPoint(offsetX * tileSize, offsetY * tileSize), QImage(path))
+
+    painter.end()
+
+    image.scaled(tileSize, tileSize, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation) \
+         .save(_getTilePath(directory, level, tileX, tileY), "PNG")
+
+def _getTilePath(directory: str, level: int, tileX: int, tileY: int) -> str:
+    return os.path.join(directory, str(level), f"{tileX}_{tileY}.png")
+
+# Writes SVG document element by element
+class SvgStreamWriter():
+    def __init__(self, file: TextIO, viewBox: QRect, width: int, height: int) -> None:
+        self._file = file
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                         f'viewBox="{viewBox.left()} {viewBox.top()} {viewBox.width()} {viewBox.height()}">\n')
+
+    def writeElement(self, tag: str, attributes: Dict[str, object]) -> None:
+        attributesText = " ".join(f'{name}="{value}"' for name, value in attributes.items())
+        self._file.write(f"<{tag} {attributesText}/>\n")
+
+    def close(self) -> None:
+        self._file.write("</svg>\n")
+
+# Part of QPainter interface used by shapes and links, every drawn primitive becomes SVG element
+# So SVG export uses the same drawing code as the draw area
+class SvgPainter():
+    def __init__(self, writer: SvgStreamWriter) -> None:
+        self._writer = writer
+        self._pen = QPen()
+        self._brush = QBrush()
+
+    # Pen and brush could be set with anything QPen and QBrush are constructed from, same as in QPainter
+    def setPen(self, pen) -> None:
+        self._pen = pen if isinstance(pen, QPen) else QPen(pen)
+
+    def setBrush(self, brush) -> None:
+        self._brush = brush if isinstance(brush, QBrush) else QBrush(brush)
+
+    # Pixel rect covers area from left to right + 1, same as in raster drawing
+    def drawRect(self, rect: QRect) -> None:
+        self._writer.writeElement("rect", {"x": rect.left(), "y": rect.top(), "width": rect.width(), "height": rect.height(),
+                                           **self.__getStyleAttributes()})
+
+    def drawRects(self, rects: List[QRect]) -> None:
+        for rect in rects:
+            self.drawRect(rect)
+
+    def drawEllipse(self, rect: QRect) -> None:
+        self._writer.writeElement("ellipse", {"cx": rect.left() + rect.width() / 2, "cy": rect.top() + rect.height() / 2,
+                                              "rx": rect.width() / 2, "ry": rect.height() / 2,
+                                              **self.__getStyleAttributes()})
+
+    def drawPolygon(self, polygon: QPolygonF) -> None:
+        self._writer.writeElement("polygon", {"points": SvgPainter.__getPoints(polygon), **self.__getStyleAttributes()})
+
+    def drawPolyline(self, polygon: QPolygon) -> None:
+        self._writer.writeElement("polyline", {"points": SvgPainter.__getPoints(polygon), "fill": "none", **self.__getStrokeAttributes()})
+
+    def drawLine(self, point_1: QPoint, point_2: QPoint) -> None:
+        self._writer.writeElement("line", {"x1": point_1.x(), "y1": point_1.y(), "x2": point_2.x(), "y2": point_2.y(),
+                                           **self.__getStrokeAttributes()})
+
+    def __getStyleAttributes(self) -> Dict[str, object]:
+        attributes = self.__getStrokeAttributes()
+
+        if self._brush.style() == Qt.BrushStyle.NoBrush:
+            attributes["fill"] = "none"
+        else:
+            attributes.update(SvgPainter.__getColorAttributes("fill", self._brush.color()))
+
+        return attributes
+
+    def __getStrokeAttributes(self) -> Dict[str, object]:
+        if self._pen.style() == Qt.PenStyle.NoPen:
+            return {"stroke": "none"}
+
+        attributes = SvgPainter.__getColorAttributes("stroke", self._pen.color())
+
+        # Zero width pen is always one pixel wide, whatever the scale is
+        if self._pen.widthF() == 0:
+            attributes["stroke-width"] = 1
+            attributes["vector-effect"] = "non-scaling-stroke"
+        else:
+            attributes["stroke-width"] = self._pen.widthF()
+
+        if self._pen.style() == Qt.PenStyle.DashLine:
+            attributes["stroke-dasharray"] = "4 2"
+
+        return attributes
+
+    @staticmethod
+    def __getColorAttributes(name: str, color: QColor) -> Dict[str, object]:
+        attributes = {name: color.name()}
+
+        if color.alpha() < 255:
+            attributes[f"{name}-opacity"] = round(color.alphaF(), 3)
+
+        return attributes
+
+    @staticmethod
+    def __getPoints(polygon) -> str:
+        return " ".join(f"{point.x()},{point.y()}" for point in polygon)
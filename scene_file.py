@@ -0,0 +1,137 @@
+import json
+import zlib
+from array import array
+from typing import List
+
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QPoint, QSize
+
+from custom_ellipse import CustomEllipse
+from custom_group import CustomGroup
+from custom_polygon import CustomPolygon
+from custom_rect import CustomRect
+from custom_shape import CustomShape
+from shape_style import SHAPE_STYLES
+
+# Version of scene file format, files of other versions are not loaded
+SCENE_FILE_VERSION = 2
+
+# Scene file has two lines of JSON:
+#   header - {"version": SCENE_FILE_VERSION, "checksum": CRC32 of the second line}
+#   scene - {"styles": ..., "shapes": ..., "links": ..., "index": ...}:
+#     styles - style records, shapes keep ids of styles (see ShapeStyleTable.getStyleRecords)
+#     shapes - records of top-level shapes: ["rect", x, y, style id], ["ellipse", x, y, style id],
+#              ["polygon", x, y, style id, relative vertices] or ["group", [records of children]], x and y are center
+#     links - [address 1, address 2, routed] for each link, address is number of top-level shape and indexes of children inside groups
+#     index - saved index of shapes collection or None (see ShapesCollection.exportIndex), it refers to shapes by their numbers,
+#             arrays in it are saved as {"typecode": ..., "items": [...]}
+#
+# File contains only plain data, so reading it never runs code, and it does not depend on attributes of shape classes
+# Links are given and returned as (shape 1, shape 2, routed), so file does not depend on links implementation either
+
+# Saves shapes and links to file, shapes are saved in the same order as given, so index stays valid
+def writeSceneFile(filePath: str, shapes: List[CustomShape], links: List[tuple], index: dict = None) -> None:
+    shapeNumbers = {shape: number for number, shape in enumerate(shapes)}
+
+    scene = {"styles": SHAPE_STYLES.getStyleRecords(),
+             "shapes": [_getShapeRecord(shape) for shape in shapes],
+             "links": [(_getShapeAddress(shape_1, shapeNumbers), _getShapeAddress(shape_2, shapeNumbers), routed) for shape_1, shape_2, routed in links],
+             "index": _encodeIndex(index)}
+
+    sceneLine = json.dumps(scene, separators=(",", ":")).encode("utf-8")
+    headerLine = json.dumps({"version": SCENE_FILE_VERSION, "checksum": zlib.crc32(sceneLine)}).encode("utf-8")
+
+    with open(filePath, "wb") as sceneFile:
+        sceneFile.write(headerLine + b"\n" + sceneLine + b"\n")
+
+# Loads shapes, links and saved index from file, returns them as tuple
+# Styles of shapes are registered in style table, shapes get ids of their styles in this table
+# Raises ValueError if file is not a scene file, has other version, is damaged or truncated
+def readSceneFile(filePath: str) -> tuple:
+    with open(filePath, "rb") as sceneFile:
+        headerLine = sceneFile.readline()
+        sceneLine = sceneFile.readline().rstrip(b"\n")
+
+    header = json.loads(headerLine)
+
+    if not isinstance(header, dict) or header.get("version") != SCENE_FILE_VERSION:
+        raise ValueError(f"Unsupported scene file version: {header.get('version') if isinstance(header, dict) else None}")
+
+    if zlib.crc32(sceneLine) != header.get("checksum"):
+        raise ValueError("Scene file is damaged: checksum does not match")
+
+    scene = json.loads(sceneLine)
+
+    try:
+        styleIds = [SHAPE_STYLES.getStyleId(QColor.fromRgba(rgba), QSize(width, height)) for rgba, width, height in scene["styles"]]
+        shapes = [_createShape(record, styleIds) for record in scene["shapes"]]
+        links = [(_getShapeByAddress(shapes, address_1), _getShapeByAddress(shapes, address_2), bool(routed))
+                 for address_1, address_2, routed in scene["links"]]
+        index = _decodeIndex(scene["index"])
+    # Checksum matches, but content is not what this version writes
+    except (KeyError, IndexError, AttributeError, TypeError, ValueError, OverflowError) as error:
+        raise ValueError(f"Invalid scene file content: {error!r}") from error
+
+    return shapes, links, index
+
+# Record of shape and its children, see file format above
+def _getShapeRecord(shape: CustomShape) -> list:
+    if isinstance(shape, CustomGroup):
+        return ["group", [_getShapeRecord(child) for child in shape.childShapes]]
+
+    record = [_SHAPE_KINDS[type(shape)], shape.centerPoint.x(), shape.centerPoint.y(), shape.styleId]
+
+    if isinstance(shape, CustomPolygon):
+        record.append(shape.relativeVertices)
+
+    return record
+
+# Shape from record, style ids of file are replaced with ids of current style table
+def _createShape(record: list, styleIds: List[int]) -> CustomShape:
+    match record:
+        case ["group", list(children)] if children:
+            return CustomGroup([_createShape(child, styleIds) for child in children])
+        case ["rect", int(x), int(y), int(styleId)]:
+            return CustomRect(QPoint(x, y), styleIds[styleId])
+        case ["ellipse", int(x), int(y), int(styleId)]:
+            return CustomEllipse(QPoint(x, y), styleIds[styleId])
+        case ["polygon", int(x), int(y), int(styleId), list(vertices)]:
+            return CustomPolygon(QPoint(x, y), styleIds[styleId], tuple((float(vertexX), float(vertexY)) for vertexX, vertexY in vertices))
+
+    raise ValueError(f"Invalid shape record: {record}")
+
+# Arrays of index are saved as lists of items with their typecode
+def _encodeIndex(index: dict) -> dict:
+    if index is None:
+        return None
+
+    return {key: {"typecode": value.typecode, "items": value.tolist()} if isinstance(value, array) else value
+            for key, value in index.items()}
+
+def _decodeIndex(index: dict) -> dict:
+    if index is None:
+        return None
+
+    return {key: array(value["typecode"], value["items"]) if isinstance(value, dict) and "typecode" in value else value
+            for key, value in index.items()}
+
+def _getShapeAddress(shape: CustomShape, shapeNumbers: dict) -> tuple:
+    childPath = []
+
+    while shape.parentGroup is not None:
+        childPath.append(shape.parentGroup.childShapes.index(shape))
+        shape = shape.parentGroup
+
+    return shapeNumbers[shape], tuple(reversed(childPath))
+
+def _getShapeByAddress(shapes: List[CustomShape], address: list) -> CustomShape:
+    shapeNumber, childPath = address
+    shape = shapes[shapeNumber]
+
+    for childIndex in childPath:
+        shape = shape.childShapes[childIndex]
+
+    return shape
+
+# Names of shape kinds in file
+_SHAPE_KINDS = {CustomRect: "rect", CustomEllipse: "ellipse", CustomPolygon: "polygon"}
@@ -0,0 +1,308 @@
+from itertools import repeat
+from typing import Dict, Iterable, List, Iterator
+
+from PyQt5.QtCore import QRect
+
+from custom_shape import CustomShape
+from shapes_link import ShapesLinkBase
+
+# Node of persistent vector trie
+# Owner token defines who is allowed to modify node in place: nodes created after the last snapshot
+# belong to the vector and could be changed, nodes shared with any snapshot are copied before change
+class _TrieNode():
+    __slots__ = ("children", "owner")
+
+    def __init__(self, children: list, owner: object) -> None:
+        self.children = children
+        self.owner = owner
+
+# Persistent vector with 32-way branching trie
+# Taking snapshot is O(1): snapshot keeps current root, vector gets new owner token,
+# so any following change copies only the path from root to changed element (structural sharing)
+class PersistentVector():
+    BITS = 5
+    WIDTH = 1 << BITS
+    MASK = WIDTH - 1
+
+    def __init__(self) -> None:
+        self._owner = object()
+        self._root = _TrieNode([], self._owner)
+        self._size = 0
+        self._shift = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, index: int) -> object:
+        return PersistentVector._getFromTrie(self._root, self._shift, index)
+
+    def set(self, index: int, value: object) -> None:
+        if index < 0 or index >= self._size:
+            raise IndexError(f"Index {index} is out of vector range")
+
+        self._root = self.__setInTrie(self._root, self._shift, index, value)
+
+    def append(self, value: object) -> None:
+        # Trie is full - add new level above current root
+        if self._size == PersistentVector.WIDTH << self._shift:
+            self._root = _TrieNode([self._root], self._owner)
+            self._shift += PersistentVector.BITS
+
+        self._root = self.__appendToTrie(self._root, self._shift, self._size, value)
+        self._size += 1
+
+    def clear(self) -> None:
+        self._owner = object()
+        self._root = _TrieNode([], self._owner)
+        self._size = 0
+        self._shift = 0
+
+    # Returns read-only view of current state, O(1)
+    def snapshot(self) -> "PersistentVectorView":
+        view = PersistentVectorView(self._root, self._size, self._shift)
+        # From now on nodes reachable from the view are never changed in place
+        self._owner = object()
+
+        return view
+
+    @staticmethod
+    def _getFromTrie(root: _TrieNode, shift: int, index: int) -> object:
+        node = root
+
+        while shift > 0:
+            node = node.children[(index >> shift) & PersistentVector.MASK]
+            shift -= PersistentVector.BITS
+
+        return node.children[index & PersistentVector.MASK]
+
+    # Returns node which could be changed in place, copying it if it is shared
+    def __editableNode(self, node: _TrieNode) -> _TrieNode:
+        if node.owner is self._owner:
+            return node
+
+        return _TrieNode(list(node.children), self._owner)
+
+    def __setInTrie(self, node: _TrieNode, shift: int, index: int, value: object) -> _TrieNode:
+        node = self.__editableNode(node)
+        childIndex = (index >> shift) & PersistentVector.MASK
+
+        if shift == 0:
+            node.children[childIndex] = value
+        else:
+            node.children[childIndex] = self.__setInTrie(node.children[childIndex], shift - PersistentVector.BITS, index, value)
+
+        return node
+
+    def __appendToTrie(self, node: _TrieNode, shift: int, index: int, value: object) -> _TrieNode:
+        node = self.__editableNode(node)
+        childIndex = (index >> shift) & PersistentVector.MASK
+
+        if shift == 0:
+            node.children.append(value)
+        elif childIndex < len(node.children):
+            node.children[childIndex] = self.__appendToTrie(node.children[childIndex], shift - PersistentVector.BITS, index, value)
+        else:
+            node.children.append(self.__appendToTrie(_TrieNode([], self._owner), shift - PersistentVector.BITS, index, value))
+
+        return node
+
+# Immutable view of persistent vector at the moment of snapshot
+class PersistentVectorView():
+    def __init__(self, root: _TrieNode, size: int, shift: int) -> None:
+        self._root = root
+        self._size = size
+        self._shift = shift
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, index: int) -> object:
+        if index < 0 or index >= self._size:
+            raise IndexError(f"Index {index} is out of vector range")
+
+        return PersistentVector._getFromTrie(self._root, self._shift, index)
+
+    def __iter__(self) -> Iterator[object]:
+        return PersistentVectorView.__iterateNode(self._root, self._shift)
+
+    @staticmethod
+    def __iterateNode(node: _TrieNode, shift: int) -> Iterator[object]:
+        if shift == 0:
+            yield from node.children
+        else:
+            for child in node.children:
+                yield from PersistentVectorView.__iterateNode(child, shift - PersistentVector.BITS)
+
+# Consistent read-only state of the scene which could be used from any thread
+# Shapes are frozen copies, links are resolved to copies of linked shapes on access
+class SceneSnapshot():
+    def __init__(self, version: int, shapes: PersistentVectorView, links: PersistentVectorView) -> None:
+        self._version = version
+        self._shapes = shapes
+        self._links = links
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # Returns shape copy by its scene id or None, if shape was deleted
+    def getShape(self, shapeId: int) -> CustomShape:
+        if shapeId < len(self._shapes):
+            return self._shapes.get(shapeId)
+        return None
+
+    # Iterates pairs of scene id and shape copy
+    def iterShapes(self) -> Iterator[tuple]:
+        for shapeId, shape in enumerate(self._shapes):
+            if shape is not None:
+                yield shapeId, shape
+
+    # Iterates links between shape copies
+    def iterLinks(self) -> Iterator[ShapesLinkBase]:
+        for record in self._links:
+            if record is not None:
+                address_1, address_2, link = record
+                yield link.copyWithShapes(self.__getShapeByAddress(address_1), self.__getShapeByAddress(address_2))
+
+    # Finds shape copy by scene id of top-level shape and indexes of children inside groups
+    def __getShapeByAddress(self, address: tuple) -> CustomShape:
+        shapeId, childPath = address
+        shape = self._shapes.get(shapeId)
+
+        for childIndex in childPath:
+            shape = shape.childShapes[childIndex]
+
+        return shape
+
+    # Returns shape copies intersecting with rect, snapshot has no index, so search is linear
+    def getShapesInRect(self, rect: QRect) -> List[CustomShape]:
+        return [shape for _, shape in self.iterShapes() if shape.boundingBox.intersects(rect)]
+
+# Versioned copy-on-write store of shapes and links
+# Should be modified from GUI thread only, snapshots could be read from any thread
+# Every shape gets scene id - index of its slot, slots of deleted shapes are reused
+class SceneStore():
+    def __init__(self) -> None:
+        self._version = 0
+
+        self._shapes = PersistentVector()
+        self._shapeIds: Dict[CustomShape, int] = {}
+        self._liveShapes: Dict[int, CustomShape] = {}
+        self._freeShapeIds: List[int] = []
+        # Shapes changed by batch updates, they are copied to vector only when snapshot is taken
+        self._changedShapes: Dict[CustomShape, None] = {}
+
+        self._links = PersistentVector()
+        self._linkIds: Dict[ShapesLinkBase, int] = {}
+        self._freeLinkIds: List[int] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # Returns scene id of shape or None, if shape is not in store
+    def getShapeId(self, shape: CustomShape) -> int:
+        return self._shapeIds.get(shape)
+
+    # Shapes which are not in store, checked for all shapes at once, since usually all of them are present
+    def getMissingShapes(self, shapes: Iterable[CustomShape]) -> List[CustomShape]:
+        if all(map(self._shapeIds.__contains__, shapes)):
+            return []
+
+        return [shape for shape in shapes if shape not in self._shapeIds]
+
+    # Returns live shape by scene id or None
+    # Used to address shapes from outside (e.g. by external clients) without object references
+    def getLiveShape(self, shapeId: int) -> CustomShape:
+        return self._liveShapes.get(shapeId)
+
+    def addShape(self, shape: CustomShape) -> int:
+        shapeId = SceneStore.__putRecord(self._shapes, self._freeShapeIds, shape.copy())
+        self._shapeIds[shape] = shapeId
+        self._liveShapes[shapeId] = shape
+        self._version += 1
+
+        return shapeId
+
+    # Saves current state of shape, record is replaced as a whole, so readers never see partial change
+    def updateShape(self, shape: CustomShape) -> None:
+        self._changedShapes.pop(shape, None)
+        self._shapes.set(self._shapeIds[shape], shape.copy())
+        self._version += 1
+
+    # Marks shapes as changed without copying them, e.g. shapes moved by animation frame
+    # Many frames could pass between snapshots, so shapes are copied once, when snapshot is taken
+    def updateShapes(self, shapes: List[CustomShape]) -> None:
+        self._changedShapes.update(zip(shapes, repeat(None)))
+        self._version += 1
+
+    def removeShape(self, shape: CustomShape) -> None:
+        self._changedShapes.pop(shape, None)
+        shapeId = self._shapeIds.pop(shape)
+        del self._liveShapes[shapeId]
+        self._shapes.set(shapeId, None)
+        self._freeShapeIds.append(shapeId)
+        self._version += 1
+
+    # Linked shapes should be in store themselves or be inside of groups which are in store
+    # Record keeps detached copy of link, so route of routed link is frozen until record is updated
+    def addLink(self, link: ShapesLinkBase) -> None:
+        self._linkIds[link] = SceneStore.__putRecord(self._links, self._freeLinkIds, self.__getLinkRecord(link))
+        self._version += 1
+
+    # Should be called when route of link is replaced, e.g. after linked shapes moved or link was re-routed
+    def updateLink(self, link: ShapesLinkBase) -> None:
+        self._links.set(self._linkIds[link], self.__getLinkRecord(link))
+        self._version += 1
+
+    def removeLink(self, link: ShapesLinkBase) -> None:
+        linkId = self._linkIds.pop(link)
+        self._links.set(linkId, None)
+        self._freeLinkIds.append(linkId)
+        self._version += 1
+
+    def clear(self) -> None:
+        self._shapes.clear()
+        self._shapeIds.clear()
+        self._liveShapes.clear()
+        self._freeShapeIds.clear()
+        self._changedShapes.clear()
+
+        self._links.clear()
+        self._linkIds.clear()
+        self._freeLinkIds.clear()
+
+        self._version += 1
+
+    # Returns consistent state of the store, O(1) plus copying of shapes changed by batch updates since previous snapshot
+    def snapshot(self) -> SceneSnapshot:
+        for shape in self._changedShapes:
+            self._shapes.set(self._shapeIds[shape], shape.copy())
+        self._changedShapes.clear()
+
+        return SceneSnapshot(self._version, self._shapes.snapshot(), self._links.snapshot())
+
+    def __getLinkRecord(self, link: ShapesLinkBase) -> tuple:
+        return self.__getShapeAddress(link._shape1), self.__getShapeAddress(link._shape2), link.copyWithShapes(None, None)
+
+    # Shape inside of group has no scene id, it is addressed by id of top-level group and indexes of children
+    def __getShapeAddress(self, shape: CustomShape) -> tuple:
+        childPath = []
+
+        while shape.parentGroup is not None:
+            childPath.append(shape.parentGroup.childShapes.index(shape))
+            shape = shape.parentGroup
+
+        return self._shapeIds[shape], tuple(reversed(childPath))
+
+    # Saves record to free slot or to the end of vector, returns slot index
+    @staticmethod
+    def __putRecord(vector: PersistentVector, freeIds: List[int], record: object) -> int:
+        if freeIds:
+            recordId = freeIds.pop()
+            vector.set(recordId, record)
+        else:
+            recordId = len(vector)
+            vector.append(record)
+
+        return recordId
@@ -0,0 +1,476 @@
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Iterable, List
+
+# NumPy is optional, without it boxes are processed one by one
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from PyQt5.QtCore import QPoint, QRect
+
+import constants
+from custom_shape import CustomShape
+
+# Bounding boxes of many shapes for checks which are done for all of them at once, e.g. for shapes moved in one animation frame
+#
+# Borders are read from shapes once, then checks work with plain numbers
+# Box is (left, top, right, bottom) with inclusive borders, same as QRect, so results match QRect.intersects
+# With NumPy, checks are done over arrays: pairs of boxes are found by sort and sweep,
+# where range of candidates for every box is found by binary search in boxes sorted by left border
+class ShapeBoxes():
+    def __init__(self, shapes: List[CustomShape]) -> None:
+        self._shapes = list(shapes)
+        # QRect.getCoords gives all borders in one call: (left, top, right, bottom)
+        bounds = [shape.boundingBox.getCoords() for shape in self._shapes]
+
+        if numpy is not None and len(bounds) >= constants.BOX_BATCH_MIN_COUNT:
+            self._bounds = numpy.array(bounds, dtype=numpy.int64).reshape(-1, 4)
+        else:
+            self._bounds = bounds
+
+    # Boxes with already known borders, rows of bounds are (left, top, right, bottom) of shapes in the same order
+    @staticmethod
+    def fromBounds(shapes: List[CustomShape], bounds) -> "ShapeBoxes":
+        result = ShapeBoxes([])
+        result._shapes = shapes
+        result._bounds = bounds
+
+        return result
+
+    @property
+    def shapes(self) -> List[CustomShape]:
+        return self._shapes
+
+    def __len__(self) -> int:
+        return len(self._shapes)
+
+    # Boxes of shapes with specified indexes, given as list or as array
+    def take(self, indexes) -> "ShapeBoxes":
+        result = ShapeBoxes([])
+        result._shapes = list(map(self._shapes.__getitem__, _toList(indexes)))
+
+        if isinstance(self._bounds, list):
+            result._bounds = list(map(self._bounds.__getitem__, _toList(indexes)))
+        else:
+            result._bounds = self._bounds[numpy.asarray(indexes, dtype=numpy.int64)]
+
+        return result
+
+    # Same boxes, where boxes with specified indexes are replaced with boxes of the same shapes from other boxes
+    def replaced(self, indexes, other: "ShapeBoxes") -> "ShapeBoxes":
+        if isinstance(self._bounds, list) or isinstance(other._bounds, list):
+            bounds = list(_toTuples(self._bounds))
+            otherBounds = _toTuples(other._bounds)
+
+            for index in _toList(indexes):
+                bounds[index] = otherBounds[index]
+        else:
+            bounds = self._bounds.copy()
+            rows = numpy.asarray(indexes, dtype=numpy.int64)
+            bounds[rows] = other._bounds[rows]
+
+        return ShapeBoxes.fromBounds(self._shapes, bounds)
+
+    # Boxes containing both boxes of the same shape from these and other boxes, e.g. boxes of shapes before and after move
+    def united(self, other: "ShapeBoxes") -> "ShapeBoxes":
+        if isinstance(self._bounds, list) or isinstance(other._bounds, list):
+            bounds = [(min(left, otherLeft), min(top, otherTop), max(right, otherRight), max(bottom, otherBottom))
+                      for (left, top, right, bottom), (otherLeft, otherTop, otherRight, otherBottom) in zip(_toTuples(self._bounds), _toTuples(other._bounds))]
+        else:
+            # Operations over single columns are much faster than over halves of rows
+            bounds = numpy.minimum(self._bounds, other._bounds)
+            numpy.maximum(self._bounds[:, 2], other._bounds[:, 2], out=bounds[:, 2])
+            numpy.maximum(self._bounds[:, 3], other._bounds[:, 3], out=bounds[:, 3])
+
+        return ShapeBoxes.fromBounds(self._shapes, bounds)
+
+    # Rect containing all boxes, it is empty if there are no boxes
+    def getBoundingRect(self) -> QRect:
+        if not len(self._shapes):
+            return QRect()
+
+        if isinstance(self._bounds, list):
+            left = min(bounds[0] for bounds in self._bounds)
+            top = min(bounds[1] for bounds in self._bounds)
+            right = max(bounds[2] for bounds in self._bounds)
+            bottom = max(bounds[3] for bounds in self._bounds)
+        else:
+            left, top = self._bounds[:, :2].min(axis=0).tolist()
+            right, bottom = self._bounds[:, 2:].max(axis=0).tolist()
+
+        return QRect(QPoint(left, top), QPoint(right, bottom))
+
+    # Shapes which boxes go out of area from (0, 0) to (width, height)
+    def getShapesOutside(self, width: int, height: int) -> List[CustomShape]:
+        if isinstance(self._bounds, list):
+            return [shape for shape, (left, top, right, bottom) in zip(self._shapes, self._bounds)
+                    if left < 0 or top < 0 or right > width or bottom > height]
+
+        bounds = self._bounds
+        outside = (bounds[:, 0] < 0) | (bounds[:, 1] < 0) | (bounds[:, 2] > width) | (bounds[:, 3] > height)
+
+        return [self._shapes[index] for index in numpy.flatnonzero(outside).tolist()]
+
+    # Pairs of shapes with intersecting boxes: (shape of these boxes, shape of other boxes)
+    # Without other boxes, pairs of different shapes of these boxes are returned, every pair once
+    def getIntersectingPairs(self, other: "ShapeBoxes" = None) -> List[tuple]:
+        selfPairs = other is None
+        other = self if selfPairs else other
+
+        if not len(self._shapes) or not len(other._shapes):
+            return []
+
+        # Few boxes are checked against many ones over arrays as well
+        if isinstance(self._bounds, list) and isinstance(other._bounds, list):
+            indexPairs = ShapeBoxes.__getIntersectingIndexPairs(self._bounds, other._bounds, selfPairs)
+        else:
+            indexPairs = ShapeBoxes.__getIntersectingIndexPairsVectorized(_toArray(self._bounds), _toArray(other._bounds), selfPairs)
+
+        return [(self._shapes[index], other._shapes[otherIndex]) for index, otherIndex in indexPairs]
+
+    # Boxes of several sets merged by cells of uniform grid: every box goes to cell of its top-left corner,
+    # and boxes of the same cell are replaced with rect containing all of them
+    # Used to notify about changed area with few rects instead of a rect per shape
+    @staticmethod
+    def getMergedRects(boxesList: List["ShapeBoxes"], cellSize: int) -> List[QRect]:
+        boundsList = [boxes._bounds for boxes in boxesList if len(boxes._shapes)]
+
+        if not boundsList:
+            return []
+
+        if any(isinstance(bounds, list) for bounds in boundsList):
+            merged = {}
+
+            for bounds in boundsList:
+                for left, top, right, bottom in _toTuples(bounds):
+                    cell = (left // cellSize, top // cellSize)
+                    cellBounds = merged.get(cell)
+
+                    if cellBounds is None:
+                        merged[cell] = (left, top, right, bottom)
+                    else:
+                        merged[cell] = (min(cellBounds[0], left), min(cellBounds[1], top), max(cellBounds[2], right), max(cellBounds[3], bottom))
+
+            return [QRect(QPoint(left, top), QPoint(right, bottom)) for left, top, right, bottom in merged.values()]
+
+        bounds = numpy.concatenate(boundsList)
+        columns = bounds[:, 0] // cellSize
+        rows = bounds[:, 1] // cellSize
+
+        # Cell is packed into one number to sort boxes by cells
+        firstRow = int(rows.min())
+        cells = (columns - int(columns.min())) * (int(rows.max()) - firstRow + 1) + (rows - firstRow)
+        cellsCount = int(cells.max()) + 1
+
+        # When boxes cover a small range of cells, borders are merged right in arrays of all cells of the range,
+        # otherwise boxes are sorted by cells and borders are merged by groups of the same cell
+        if cellsCount <= len(bounds) * 4:
+            lefts = numpy.full(cellsCount, numpy.iinfo(numpy.int64).max)
+            tops = lefts.copy()
+            rights = numpy.full(cellsCount, numpy.iinfo(numpy.int64).min)
+            bottoms = rights.copy()
+
+            numpy.minimum.at(lefts, cells, bounds[:, 0])
+            numpy.minimum.at(tops, cells, bounds[:, 1])
+            numpy.maximum.at(rights, cells, bounds[:, 2])
+            numpy.maximum.at(bottoms, cells, bounds[:, 3])
+
+            usedCells = numpy.flatnonzero(numpy.bincount(cells, minlength=cellsCount))
+            lefts, tops, rights, bottoms = lefts[usedCells], tops[usedCells], rights[usedCells], bottoms[usedCells]
+        else:
+            order = numpy.argsort(cells)
+            bounds = bounds[order]
+            cells = cells[order]
+
+            # Start of every group of boxes with the same cell
+            starts = numpy.flatnonzero(numpy.concatenate(([True], cells[1:] != cells[:-1])))
+
+            lefts = numpy.minimum.reduceat(bounds[:, 0], starts)
+            tops = numpy.minimum.reduceat(bounds[:, 1], starts)
+            rights = numpy.maximum.reduceat(bounds[:, 2], starts)
+            bottoms = numpy.maximum.reduceat(bounds[:, 3], starts)
+
+        return [QRect(left, top, right - left + 1, bottom - top + 1)
+                for left, top, right, bottom in zip(lefts.tolist(), tops.tolist(), rights.tolist(), bottoms.tolist())]
+
+    # Left and right borders of boxes sorted by x as two lists: x of borders and their shapes
+    # Left border of box goes before its right border
+    def getSortedBorders(self) -> tuple:
+        if isinstance(self._bounds, list):
+            borders = [(bounds[0], shape) for shape, bounds in zip(self._shapes, self._bounds)]
+            borders.extend((bounds[2], shape) for shape, bounds in zip(self._shapes, self._bounds))
+            borders.sort(key=itemgetter(0))
+
+            return [x for x, _ in borders], [shape for _, shape in borders]
+
+        # Lowest bit of sort key puts left border before right border with the same x
+        borders = numpy.concatenate((self._bounds[:, 0], self._bounds[:, 2]))
+        order = numpy.argsort(numpy.concatenate((self._bounds[:, 0] * 2, self._bounds[:, 2] * 2 + 1)))
+        # Right border of box goes after borders of all lefts, so its index wraps around to index of its shape
+        # Shapes are taken over array of objects, which is much faster than taking them by indexes from list
+        shapes = numpy.fromiter(self._shapes, dtype=object, count=len(self._shapes))
+
+        return borders[order].tolist(), shapes.take(order, mode="wrap").tolist()
+
+    # Indexes of boxes which are in other cells of uniform grid after move, cells of box are all cells it overlaps
+    # Boxes before and after move should be boxes of the same shapes in the same order
+    @staticmethod
+    def getIndexesOfChangedCells(oldBoxes: "ShapeBoxes", newBoxes: "ShapeBoxes", cellSize: int) -> List[int]:
+        if isinstance(oldBoxes._bounds, list) or isinstance(newBoxes._bounds, list):
+            return [index for index, (oldBounds, newBounds) in enumerate(zip(_toTuples(oldBoxes._bounds), _toTuples(newBoxes._bounds)))
+                    if any(oldBorder // cellSize != newBorder // cellSize for oldBorder, newBorder in zip(oldBounds, newBounds))]
+
+        changed = (oldBoxes._bounds // cellSize != newBoxes._bounds // cellSize).any(axis=1)
+        return numpy.flatnonzero(changed).tolist()
+
+    # Sort and sweep: other boxes are sorted by left border, for every box only other boxes which start
+    # not further than widest other box to the left and not after box's right border are checked
+    @staticmethod
+    def __getIntersectingIndexPairs(bounds: List[tuple], otherBounds: List[tuple], selfPairs: bool) -> List[tuple]:
+        order = sorted(range(len(otherBounds)), key=lambda index: otherBounds[index][0])
+        sortedLefts = [otherBounds[index][0] for index in order]
+        maxWidth = max(right - left for left, _, right, _ in otherBounds)
+
+        result = []
+
+        for index, (left, top, right, bottom) in enumerate(bounds):
+            for position in range(bisect_left(sortedLefts, left - maxWidth), bisect_right(sortedLefts, right)):
+                otherIndex = order[position]
+
+                if selfPairs and otherIndex <= index:
+                    continue
+
+                otherLeft, otherTop, otherRight, otherBottom = otherBounds[otherIndex]
+
+                if otherRight >= left and otherTop <= bottom and top <= otherBottom:
+                    result.append((index, otherIndex))
+
+        return result
+
+    # Same sweep over arrays, but other boxes are also split to horizontal bands by top border,
+    # so candidates of box are taken only from bands its box could reach, not from the whole column of the world
+    # Band is not lower than the highest other box, so box could only intersect boxes of bands from
+    # band of its top minus one to band of its bottom. Boxes are sorted by (band, left) packed into one number,
+    # then candidate ranges of all boxes for every band offset are found by binary search and filtered at once
+    # Bands are made higher for sparse boxes, about one candidate per box is expected, so few boxes reach next band
+    # For pairs inside one set, boxes are checked only against bands from band of their top, and inside that band
+    # only against boxes after them in sorted order, so every pair is found once and no search is needed for it
+    @staticmethod
+    def __getIntersectingIndexPairsVectorized(bounds, otherBounds, selfPairs: bool) -> List[tuple]:
+        lefts, tops, rights, bottoms = bounds.T
+        otherLefts, otherTops, otherRights, otherBottoms = otherBounds.T
+
+        maxWidth = int((otherRights - otherLefts).max())
+        minTop = min(int(tops.min()), int(otherTops.min()))
+        minLeft = min(int(lefts.min()), int(otherLefts.min())) - maxWidth
+        maxBottom = max(int(bottoms.max()), int(otherBottoms.max()))
+
+        # Range of band keys is wider than any candidates range, so ranges never cross into neighbour bands
+        stride = max(int(otherLefts.max()), int(rights.max())) - minLeft + 1
+        bandHeight = max(int((otherBottoms - otherTops).max()) + 1, (maxBottom - minTop + 1) * stride // (len(otherBounds) * (2 * maxWidth + 2)))
+        bandsCount = (maxBottom - minTop) // bandHeight + 1
+
+        # Packed numbers should fit into int64, otherwise all boxes are put to one band
+        if bandsCount * stride >= 2 ** 62:
+            bandHeight = maxBottom - minTop + 1
+
+        otherBands = (otherTops - minTop) // bandHeight
+        otherKeys = otherBands * stride + (otherLefts - minLeft)
+        order = numpy.argsort(otherKeys)
+        sortedKeys = otherKeys[order]
+
+        # Binary search is much faster for sorted queries, so boxes are processed in order of their first band keys
+        if selfPairs:
+            firstBands = otherBands
+            active = order
+        else:
+            firstBands = numpy.maximum(tops - minTop - bandHeight + 1, 0) // bandHeight
+            active = numpy.argsort(firstBands * stride + lefts)
+
+        lastBands = (bottoms - minTop) // bandHeight
+        startOffsets = lefts - maxWidth - minLeft
+        endOffsets = rights - minLeft
+
+        indexesList = []
+        otherIndexesList = []
+        offset = 0
+
+        while len(active):
+            bandKeys = (firstBands[active] + offset) * stride
+            ends = numpy.searchsorted(sortedKeys, bandKeys + endOffsets[active], side="right")
+
+            if selfPairs and not offset:
+                starts = numpy.arange(1, len(active) + 1)
+            else:
+                starts = numpy.searchsorted(sortedKeys, bandKeys + startOffsets[active], side="left")
+
+            counts = ends - starts
+            indexes = numpy.repeat(active, counts)
+            otherIndexes = order[numpy.arange(len(indexes)) - numpy.repeat(numpy.cumsum(counts) - counts - starts, counts)]
+
+            mask = (otherRights[otherIndexes] >= lefts[indexes]) & (otherTops[otherIndexes] <= bottoms[indexes]) & (tops[indexes] <= otherBottoms[otherIndexes])
+            indexesList.append(indexes[mask])
+            otherIndexesList.append(otherIndexes[mask])
+
+            offset += 1
+            active = active[firstBands[active] + offset <= lastBands[active]]
+
+        return list(zip(numpy.concatenate(indexesList).tolist(), numpy.concatenate(otherIndexesList).tolist()))
+
+def _toTuples(bounds) -> List[tuple]:
+    return bounds if isinstance(bounds, list) else list(map(tuple, bounds.tolist()))
+
+# Centers and boxes of fixed list of shapes, which are moved together many times, e.g. by animation frames
+#
+# Borders of shapes are read once, when batch is created, after that boxes are moved by the same deltas as centers,
+# so moved shapes are not read again for the next move
+# Shapes are moved by their types at once (see CustomShape.moveCentersBatch), which could change center points in place,
+# so shapes get own copies of their center points when batch is created
+# Batch is valid while its shapes are moved only through it, owner checks it by generation of shapes collection
+# Shapes are given by indexes in batch: array of indexes with NumPy, list of indexes without it
+class ShapeBatch():
+    def __init__(self, shapes: List[CustomShape], generation: int) -> None:
+        self._shapes = shapes
+        self._generation = generation
+        self._shapeIndexes = {shape: index for index, shape in enumerate(shapes)}
+
+        for shape in shapes:
+            shape.setNewCenterPoint(QPoint(shape.centerPoint))
+
+        # Shape types, which shapes are of each type and shapes of each type in batch order
+        types = [type(shape) for shape in shapes]
+        self._typeMasks = {shapeType: [itemType is shapeType for itemType in types] for shapeType in set(types)}
+        self._typeShapes = {shapeType: [shape for shape, isOfType in zip(shapes, typeMask) if isOfType] for shapeType, typeMask in self._typeMasks.items()}
+
+        # Rows are (x, y) of centers and (left, top, right, bottom) of boxes
+        centers = [(shape.centerPoint.x(), shape.centerPoint.y()) for shape in shapes]
+        bounds = [shape.boundingBox.getCoords() for shape in shapes]
+
+        if numpy is not None:
+            self._centers = numpy.array(centers, dtype=numpy.int64).reshape(-1, 2)
+            self._bounds = numpy.array(bounds, dtype=numpy.int64).reshape(-1, 4)
+            self._typeMasks = {shapeType: numpy.array(mask, dtype=bool) for shapeType, mask in self._typeMasks.items()}
+        else:
+            self._centers = centers
+            self._bounds = bounds
+
+    @property
+    def shapes(self) -> List[CustomShape]:
+        return self._shapes
+
+    # Generation of shapes collection after the last move of batch
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # Target centers of all shapes of batch in form used by other methods
+    def getTargets(self, centersX: List[int], centersY: List[int]):
+        if numpy is None:
+            return list(zip(centersX, centersY))
+
+        return numpy.column_stack((numpy.asarray(centersX, dtype=numpy.int64), numpy.asarray(centersY, dtype=numpy.int64))).reshape(-1, 2)
+
+    # Indexes of shapes, which targets differ from their centers, excluded shape is never moved (e.g. shape dragged by user)
+    def getMovingIndexes(self, targets, excludedShape: CustomShape):
+        excludedIndex = self._shapeIndexes.get(excludedShape, -1)
+
+        if numpy is None:
+            return [index for index, (center, target) in enumerate(zip(self._centers, targets)) if center != target and index != excludedIndex]
+
+        moving = (self._centers[:, 0] != targets[:, 0]) | (self._centers[:, 1] != targets[:, 1])
+
+        if excludedIndex >= 0:
+            moving[excludedIndex] = False
+
+        return numpy.flatnonzero(moving)
+
+    # Shapes with specified indexes, list of batch itself is returned if all shapes are requested, it should not be changed
+    def getShapes(self, indexes) -> List[CustomShape]:
+        if len(indexes) == len(self._shapes):
+            return self._shapes
+
+        return [self._shapes[index] for index in _toList(indexes)]
+
+    # Positions of shapes in list of shapes with specified indexes (see getShapes), shapes should be in that list
+    def getPositions(self, indexes, shapes: Iterable[CustomShape]):
+        shapeIndexes = sorted(map(self._shapeIndexes.__getitem__, shapes))
+
+        if numpy is None:
+            return [bisect_left(indexes, index) for index in shapeIndexes]
+
+        return numpy.searchsorted(indexes, shapeIndexes)
+
+    # Current boxes of shapes
+    def getBoxes(self, indexes) -> ShapeBoxes:
+        return ShapeBoxes.fromBounds(self.getShapes(indexes), self.__takeRows(self._bounds, indexes))
+
+    # Boxes of shapes after move to their targets
+    def getTargetBoxes(self, indexes, targets) -> ShapeBoxes:
+        if numpy is None:
+            bounds = [(left + x - centerX, top + y - centerY, right + x - centerX, bottom + y - centerY)
+                      for (left, top, right, bottom), (centerX, centerY), (x, y)
+                      in zip(self.__takeRows(self._bounds, indexes), self.__takeRows(self._centers, indexes), self.__takeRows(targets, indexes))]
+        else:
+            deltas = self.__takeRows(targets, indexes) - self.__takeRows(self._centers, indexes)
+            bounds = self.__takeRows(self._bounds, indexes) + numpy.tile(deltas, 2)
+
+        return ShapeBoxes.fromBounds(self.getShapes(indexes), bounds)
+
+    # Moves shapes to their targets, shapes of each type are moved at once
+    def moveShapes(self, indexes, targets) -> None:
+        for shapeType, typeMask in self._typeMasks.items():
+            if numpy is None:
+                typeIndexes = [index for index in indexes if typeMask[index]]
+                centersX = [targets[index][0] for index in typeIndexes]
+                centersY = [targets[index][1] for index in typeIndexes]
+            else:
+                typeIndexes = indexes[typeMask[indexes]]
+                centersX = targets[typeIndexes, 0].tolist()
+                centersY = targets[typeIndexes, 1].tolist()
+
+            # All shapes of type are moved in most cases, e.g. by animation, so their list is taken as is
+            if len(typeIndexes) == len(self._typeShapes[shapeType]):
+                shapeType.moveCentersBatch(self._typeShapes[shapeType], centersX, centersY)
+            elif len(typeIndexes):
+                shapeType.moveCentersBatch(self.getShapes(typeIndexes), centersX, centersY)
+
+    # Moves shapes back to their centers, known to batch
+    def restoreShapes(self, shapes: Iterable[CustomShape]) -> None:
+        for shape in shapes:
+            x, y = self._centers[self._shapeIndexes[shape]]
+            shape.setNewCenterPoint(QPoint(int(x), int(y)))
+
+    # Saves positions of shapes after move, boxes are final boxes of these shapes, moved or not
+    # Generation is generation of shapes collection after shapes were relocated in it
+    def commitMove(self, indexes, boxes: ShapeBoxes, generation: int) -> None:
+        self._generation = generation
+
+        if numpy is None:
+            for index, bounds in zip(indexes, boxes._bounds):
+                oldLeft, oldTop, _, _ = self._bounds[index]
+                x, y = self._centers[index]
+                self._centers[index] = (x + bounds[0] - oldLeft, y + bounds[1] - oldTop)
+                self._bounds[index] = bounds
+        else:
+            rows = slice(None) if len(indexes) == len(self._shapes) else indexes
+            self._centers[rows, 0] += boxes._bounds[:, 0] - self._bounds[rows, 0]
+            self._centers[rows, 1] += boxes._bounds[:, 1] - self._bounds[rows, 1]
+            self._bounds[rows] = boxes._bounds
+
+    # Rows of all shapes are copied at once, which is much faster than taking them by indexes
+    def __takeRows(self, rows, indexes):
+        if numpy is None:
+            return [rows[index] for index in indexes]
+
+        if len(indexes) == len(self._shapes):
+            return rows.copy()
+
+        return rows[indexes]
+
+def _toArray(bounds):
+    return numpy.array(bounds, dtype=numpy.int64).reshape(-1, 4) if isinstance(bounds, list) else bounds
+
+def _toList(indexes) -> List[int]:
+    return indexes if isinstance(indexes, list) else indexes.tolist()
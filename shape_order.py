@@ -0,0 +1,105 @@
+from typing import List
+
+from PyQt5.QtCore import QSize
+
+import constants
+from custom_shape import CustomShape
+from performance_monitor import PERF_MONITOR
+
+# Returns position of cell (x, y) along Hilbert curve filling square of 2^order x 2^order cells
+# Cells close on the curve are close on the plane, so shapes sorted by it are stored close to their neighbours
+def getHilbertIndex(x: int, y: int, order: int) -> int:
+    lastCell = (1 << order) - 1
+    index = 0
+    quadrantSize = 1 << (order - 1)
+
+    while quadrantSize > 0:
+        quadrantX = 1 if x & quadrantSize else 0
+        quadrantY = 1 if y & quadrantSize else 0
+        index += quadrantSize * quadrantSize * ((3 * quadrantX) ^ quadrantY)
+
+        # Quadrant is rotated, so curve inside it starts and ends next to neighbour quadrants
+        if quadrantY == 0:
+            if quadrantX == 1:
+                x = lastCell - x
+                y = lastCell - y
+
+            x, y = y, x
+
+        quadrantSize >>= 1
+
+    return index
+
+# Maintenance pass which reorders shapes collection along Hilbert curve of shapes centers
+#
+# After shapes were added, deleted and moved, order of shapes list and index has nothing to do with their positions,
+# so paint and search loops jump between distant shapes. Pass restores spatial order:
+# - curve positions are calculated for HILBERT_ORDER_CHUNK shapes per step, so pass could run in idle time by small steps
+# - when all positions are ready, shapes are sorted and collection index is rebuilt in bulk (see reorderShapes of collections)
+# Pass starts only after HILBERT_ORDER_MIN_CHANGES changes of collection since previous ordering
+# If collection is changed during pass, calculated positions are outdated and pass starts again
+class HilbertOrderMaintainer():
+    def __init__(self, shapesCollection, worldSize: QSize) -> None:
+        self._shapesCollection = shapesCollection
+        # Curve cell size, so curve covers the whole world
+        self._cellSize = (max(worldSize.width(), worldSize.height()) >> constants.HILBERT_ORDER_CURVE_ORDER) + 1
+
+        # Generation of collection when it was ordered last time, None if order is unknown
+        self._orderedGeneration: int = None
+        # Shapes being ordered, their curve positions calculated so far, and generation of collection they were taken at
+        self._shapes: List[CustomShape] = None
+        self._keys: List[int] = []
+        self._passGeneration = 0
+
+    # True if maintenance pass is started and not finished yet
+    @property
+    def isRunning(self) -> bool:
+        return self._shapes is not None
+
+    # Makes one step of maintenance pass, starts new pass if enough changes were made
+    # Returns true if pass is not finished and more steps are needed
+    def runStep(self) -> bool:
+        generation = self._shapesCollection.generation
+
+        if self._shapes is None or generation != self._passGeneration:
+            if self._orderedGeneration is not None and generation - self._orderedGeneration < constants.HILBERT_ORDER_MIN_CHANGES:
+                self._shapes = None
+                return False
+
+            self._shapes = list(self._shapesCollection.shapesList)
+            self._keys = []
+            self._passGeneration = generation
+
+        timerStart = PERF_MONITOR.startTimer()
+
+        order = constants.HILBERT_ORDER_CURVE_ORDER
+        lastCell = (1 << order) - 1
+        cellSize = self._cellSize
+
+        for shape in self._shapes[len(self._keys):len(self._keys) + constants.HILBERT_ORDER_CHUNK]:
+            center = shape.centerPoint
+            self._keys.append(getHilbertIndex(min(max(center.x() // cellSize, 0), lastCell), min(max(center.y() // cellSize, 0), lastCell), order))
+
+        if len(self._keys) < len(self._shapes):
+            PERF_MONITOR.stopTimer("order.step", timerStart)
+            return True
+
+        keys = self._keys
+        orderedShapes = [self._shapes[number] for number in sorted(range(len(keys)), key=keys.__getitem__)]
+
+        # Collection could refuse reordering, e.g. while it moves shapes to other index, then pass is repeated after next changes
+        self._shapesCollection.reorderShapes(orderedShapes)
+        self._orderedGeneration = self._shapesCollection.generation
+
+        self._shapes = None
+        self._keys = []
+
+        PERF_MONITOR.stopTimer("order.rebuild", timerStart)
+        return False
+
+    # Runs whole pass at once, e.g. after scene load or in benchmark
+    def reorderNow(self) -> None:
+        self._orderedGeneration = None
+
+        while self.runStep():
+            pass
@@ -0,0 +1,74 @@
+from typing import Dict, List, Iterable
+
+from PyQt5.QtGui import QPainter, QColor, QBrush, QPen
+from PyQt5.QtCore import Qt, QSize
+
+# Shared drawing properties of shapes (flyweight)
+# Brush and pen are created once per style, not on every paint call
+class ShapeStyle():
+    __slots__ = ("color", "size", "brush", "pen")
+
+    def __init__(self, color: QColor, size: QSize) -> None:
+        self.color = QColor(color)
+        self.size = QSize(size)
+        self.brush = QBrush(self.color)
+        self.pen = QPen(Qt.PenStyle.NoPen)
+
+    # Sets painter to draw shapes of this style
+    def applyToPainter(self, painter: QPainter) -> None:
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+
+# Table of interned styles, shapes keep only index of their style
+# Styles are never removed, so ids stay valid and table could be read from any thread
+class ShapeStyleTable():
+    def __init__(self) -> None:
+        self._styles: List[ShapeStyle] = []
+        self._styleIds: Dict[tuple, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._styles)
+
+    # Returns id of style with specified properties, style is created on first request
+    def getStyleId(self, color: QColor, size: QSize) -> int:
+        color = QColor(color)
+        key = (color.rgba(), size.width(), size.height())
+
+        styleId = self._styleIds.get(key)
+
+        if styleId is None:
+            styleId = len(self._styles)
+            self._styles.append(ShapeStyle(color, size))
+            self._styleIds[key] = styleId
+
+        return styleId
+
+    def getStyle(self, styleId: int) -> ShapeStyle:
+        return self._styles[styleId]
+
+    # Returns (rgba, width, height) of every style in id order, e.g. to recreate the same table in other process
+    def getStyleRecords(self) -> List[tuple]:
+        return [(style.color.rgba(), style.size.width(), style.size.height()) for style in self._styles]
+
+    # Replaces all styles with styles from records, ids of styles become the same as in records
+    def setStyleRecords(self, records: List[tuple]) -> None:
+        self._styles.clear()
+        self._styleIds.clear()
+
+        for rgba, width, height in records:
+            self.getStyleId(QColor.fromRgba(rgba), QSize(width, height))
+
+# Draws shapes grouped by type and style: painter is set up once per group,
+# and shapes of the same type could draw whole group in a single call (see CustomShape.drawGeometryBatch)
+def drawShapesGrouped(painter: QPainter, shapes: Iterable) -> None:
+    groups: Dict[tuple, list] = {}
+
+    for shape in shapes:
+        groups.setdefault((type(shape), shape.styleId), []).append(shape)
+
+    for (shapeType, styleId), groupShapes in groups.items():
+        SHAPE_STYLES.getStyle(styleId).applyToPainter(painter)
+        shapeType.drawGeometryBatch(painter, groupShapes)
+
+# Global style table
+SHAPE_STYLES = ShapeStyleTable()
@@ -1,9 +1,12 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, List
 
-from PyQt5.QtGui import QPainter
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QPen, QPolygon
+from PyQt5.QtCore import Qt, QLine, QPoint, QRect
 
+import constants
 from custom_rect import CustomRect
+from link_endpoints import getLinkEndpoints
 
 # Base class for link between shapes
 # Contains shapes which specific link connects
@@ -19,6 +22,27 @@ class ShapesLinkBase(ABC):
     def drawLink(self, painter: QPainter) -> None:
         pass
 
+    # Returns link of the same type between specified shapes, e.g. between copies of linked shapes
+    def copyWithShapes(self, shape_1: CustomRect, shape_2: CustomRect) -> "ShapesLinkBase":
+        return type(self)(shape_1, shape_2)
+
+    # Returns list of segments (pairs of points) link consists of
+    @abstractmethod
+    def getSegments(self) -> List[tuple]:
+        pass
+
+    # Draws link as selected, on top of regular link
+    def drawHighlight(self, painter: QPainter) -> None:
+        painter.setPen(QPen(constants.LINK_SELECTED_COLOR, constants.LINK_SELECTED_WIDTH))
+
+        for point_1, point_2 in self.getSegments():
+            painter.drawLine(point_1, point_2)
+
+    # Area covered by link, used to skip links outside of drawn area
+    @property
+    def boundingBox(self) -> QRect:
+        return self._shape1.boundingBox.united(self._shape2.boundingBox)
+
 # Link in for of simple line, no specific properties
 class ShapesLinkLine(ShapesLinkBase):
     def __init__(self, shape_1: CustomRect, shape_2: CustomRect) -> None:
@@ -29,4 +53,63 @@ class ShapesLinkLine(ShapesLinkBase):
         point2 = self._shape2.getLinkPoint(self._shape1)
 
         painter.setPen(Qt.GlobalColor.black)
-        painter.drawLine(point1, point2)
\ No newline at end of file
+        painter.drawLine(point1, point2)
+
+    def getSegments(self) -> List[tuple]:
+        return [(self._shape1.getLinkPoint(self._shape2), self._shape2.getLinkPoint(self._shape1))]
+
+# Link in form of orthogonal polyline which goes around other shapes
+# Route is calculated by router and cached until shapes near the route are changed
+# Link without router (e.g. copy for other thread) keeps route it was created with
+class ShapesLinkRouted(ShapesLinkBase):
+    def __init__(self, shape_1: CustomRect, shape_2: CustomRect, router=None, route: tuple = None) -> None:
+        super().__init__(shape_1, shape_2)
+        self._router = router
+        # Route is replaced as a whole, so it could be read from other thread at any moment
+        self._route: tuple = route
+
+    # Copy keeps current route, it does not change when this link is re-routed later
+    def copyWithShapes(self, shape_1: CustomRect, shape_2: CustomRect) -> "ShapesLinkBase":
+        return ShapesLinkRouted(shape_1, shape_2, None, self.getRoutePoints())
+
+    # Returns route points, from link point of first shape to link point of second one
+    def getRoutePoints(self) -> tuple:
+        if self._router:
+            return self._router.getRoute(self)
+
+        if self._route:
+            return self._route
+
+        return (self._shape1.getLinkPoint(self._shape2), self._shape2.getLinkPoint(self._shape1))
+
+    def drawLink(self, painter: QPainter) -> None:
+        painter.setPen(Qt.GlobalColor.black)
+        painter.drawPolyline(QPolygon(list(self.getRoutePoints())))
+
+    def getSegments(self) -> List[tuple]:
+        points = self.getRoutePoints()
+        return list(zip(points, points[1:]))
+
+    @property
+    def boundingBox(self) -> QRect:
+        points = self.getRoutePoints()
+
+        return QRect(QPoint(min(point.x() for point in points), min(point.y() for point in points)),
+                     QPoint(max(point.x() for point in points), max(point.y() for point in points)))
+
+# Draws links, straight links are drawn with single painter call
+# Link points of straight links are calculated for all of them at once
+def drawLinksBatched(painter: QPainter, links: Iterable[ShapesLinkBase]) -> None:
+    lineLinks = []
+
+    for link in links:
+        if type(link) is ShapesLinkLine:
+            lineLinks.append(link)
+        else:
+            link.drawLink(painter)
+
+    if lineLinks:
+        endpoints = getLinkEndpoints([(link._shape1, link._shape2) for link in lineLinks])
+
+        painter.setPen(Qt.GlobalColor.black)
+        painter.drawLines([QLine(x1, y1, x2, y2) for x1, y1, x2, y2 in endpoints])
@@ -0,0 +1,341 @@
+import json
+import sys
+from argparse import ArgumentParser
+from random import Random
+from typing import Dict, List
+
+from PyQt5.QtCore import QPoint, QRect, QSize
+
+import constants
+from custom_ellipse import CustomEllipse
+from custom_group import CustomGroup
+from custom_polygon import CustomPolygon
+from custom_rect import CustomRect
+from custom_shape import CustomShape
+from geometry_controller import GeometryController, NoCustomShapeSelected
+from positioning_backends import POSITIONING_BACKENDS, REFERENCE_BACKEND
+from shape_style import SHAPE_STYLES
+
+# Differential stress test of positioning backends
+#
+# The same random sequence of operations is applied to GeometryController of every backend,
+# and results of every operation are compared with results of reference backend:
+# created/moved or not (collision verdicts), shape found at point, number of deleted shapes and so on
+# Shapes of all controllers (shapesList and selected shape) are compared every STRESS_CHECK_INTERVAL operations
+#
+# Operations are plain lists, so the same sequence could be saved, loaded and replayed again:
+#   ["create", kind, size, x, y]        ["select", x, y]        ["move", x, y]       ["deselect"]
+#   ["delete", x, y]                    ["query", x, y]         ["link", x, y]       ["ungroup", x, y]     ["reorder"]
+#   ["deleteRect", x, y, w, h]          ["group", x, y, w, h]   ["freePosition", enabled]
+#   ["relocate", [[x, y, dx, dy], ...]] - moves shapes at points by deltas at once
+#   ["linkUngroup", x, y, gx, gy] - selects shape at (x, y), links it with shape at (gx, gy), usually a group, and ungroups it
+# Move and link are generated only while shape is selected, so they do not fail for lack of selected shape
+# NoCustomShapeSelected is the only expected exception, any other one stops the run as a failure
+# Coordinates are taken from coarse lattice, so shapes often have equal X of boundary points,
+# which is the edge case of binary search in sorted list of positioning_helper_v2
+#
+# Sequence is run in rounds of STRESS_ROUND_LENGTH operations on new controllers,
+# when results differ, operations of the round are shrunk to minimal sequence which still gives different results
+
+# Shape classes and sizes of created shapes, wide and tall shapes are included for degenerate distributions
+SHAPE_KINDS = {"rect": CustomRect, "ellipse": CustomEllipse, "polygon": CustomPolygon}
+SHAPE_SIZES = (QSize(constants.RECT_SIZE_X, constants.RECT_SIZE_Y), QSize(20, 20), QSize(40, 120), QSize(400, 20))
+
+# Relative frequencies of generated operations
+OPERATION_WEIGHTS = {"create": 30, "query": 20, "select": 10, "move": 10, "deselect": 3, "delete": 6, "relocate": 6,
+                     "link": 3, "group": 3, "ungroup": 2, "linkUngroup": 2, "deleteRect": 2, "freePosition": 1, "reorder": 1}
+
+# Only world size is taken from draw area by controller
+class _StressArea():
+    def __init__(self, worldSize: QSize) -> None:
+        self._worldSize = worldSize
+
+    def worldSize(self) -> QSize:
+        return self._worldSize
+
+# Generates random operations for one round
+# Operations are applied to reference controller while they are generated, so move and link are generated
+# only when shape is selected, and select and linkUngroup are aimed at existing shapes and groups
+def generateOperations(count: int, random: Random, worldSize: int = constants.STRESS_WORLD_SIZE) -> List[list]:
+    operationTypes = list(OPERATION_WEIGHTS)
+    weights = list(OPERATION_WEIGHTS.values())
+    controller = GeometryController(_StressArea(QSize(worldSize, worldSize)), REFERENCE_BACKEND)
+    # Centers of created shapes, most operations are done near them to hit shapes
+    centers = []
+
+    def getPoint() -> tuple:
+        if centers and random.random() < 0.8:
+            x, y = random.choice(centers)
+            return _snap(x + random.randint(-60, 60), worldSize), _snap(y + random.randint(-60, 60), worldSize)
+
+        return _snap(random.randint(0, worldSize), worldSize), _snap(random.randint(0, worldSize), worldSize)
+
+    def getRect() -> list:
+        x, y = getPoint()
+        return [x, y, _snap(random.randint(0, worldSize // 4), worldSize), _snap(random.randint(0, worldSize // 4), worldSize)]
+
+    # Center of shape which is not a group, for group it is center of one of its shapes
+    def getShapePoint(shape: CustomShape) -> tuple:
+        shape = random.choice([treeShape for treeShape in shape.iterShapeTree() if not treeShape.childShapes])
+        return shape.centerPoint.x(), shape.centerPoint.y()
+
+    operations = []
+
+    for operationType in random.choices(operationTypes, weights, k=count):
+        shapes = controller.getAllShapes()
+        groups = [shape for shape in shapes if shape.childShapes]
+
+        if operationType in ("move", "link") and controller.selectedShape is None:
+            operationType = "select"
+
+        if operationType == "select" and shapes:
+            operation = [operationType, *getShapePoint(random.choice(shapes))]
+        elif operationType == "linkUngroup" and groups:
+            operation = [operationType, *getShapePoint(random.choice(shapes)), *getShapePoint(random.choice(groups))]
+        elif operationType == "create":
+            x, y = getPoint()
+            centers.append((x, y))
+            operation = [operationType, random.choice(list(SHAPE_KINDS)), random.randrange(len(SHAPE_SIZES)), x, y]
+        elif operationType in ("select", "move", "delete", "query", "link", "ungroup", "linkUngroup"):
+            operation = [operationType, *getPoint(), *(getPoint() if operationType == "linkUngroup" else ())]
+        elif operationType in ("deleteRect", "group"):
+            operation = [operationType, *getRect()]
+        elif operationType == "relocate":
+            operation = [operationType, [[*getPoint(), _snap(random.randint(-100, 100), worldSize), _snap(random.randint(-100, 100), worldSize)]
+                                         for _ in range(random.randint(1, 8))]]
+        elif operationType == "freePosition":
+            operation = [operationType, random.random() < 0.5]
+        else:
+            operation = [operationType]
+
+        operations.append(operation)
+
+        # Failure is reported when operations are run on all backends, generation just goes on
+        try:
+            _applyOperation(controller, operation)
+        except Exception:
+            pass
+
+    return operations
+
+# Applies operations to controllers of all backends, returns None if all results are the same as reference ones
+# Otherwise returns {"index": number of operation, "operation": operation, "results": {backend: result}}
+def runOperations(operations: List[list], backends: List[str], checkInterval: int = constants.STRESS_CHECK_INTERVAL,
+                  worldSize: int = constants.STRESS_WORLD_SIZE) -> dict:
+    area = _StressArea(QSize(worldSize, worldSize))
+    controllers = {backend: GeometryController(area, backend) for backend in [REFERENCE_BACKEND, *backends] if backend}
+
+    for index, operation in enumerate(operations):
+        results = {}
+
+        for backend, controller in controllers.items():
+            try:
+                results[backend] = _applyOperation(controller, operation)
+            # Unexpected exception is a failure even if every backend raises it
+            except Exception as exception:
+                return {"index": index, "operation": operation, "results": {backend: ("exception", type(exception).__name__, str(exception))}}
+
+        if index % checkInterval == checkInterval - 1 or index == len(operations) - 1:
+            for backend, controller in controllers.items():
+                results[backend] = (results[backend], _getShapesState(controller))
+
+        referenceResult = results[REFERENCE_BACKEND]
+
+        if any(result != referenceResult for result in results.values()):
+            return {"index": index, "operation": operation, "results": results}
+
+    return None
+
+# Delta debugging (ddmin): removes parts of sequence while it still gives different results on the same type of operation
+# Sequence is split into chunks, which are tried alone and removed one by one, chunks get smaller when nothing could be removed
+def shrinkOperations(operations: List[list], backends: List[str], checkInterval: int = constants.STRESS_CHECK_INTERVAL) -> List[list]:
+    # Operations after the first difference are not needed
+    divergence = runOperations(operations, backends, checkInterval)
+
+    if divergence is None:
+        return operations
+
+    operations = operations[:divergence["index"] + 1]
+    operationType = divergence["operation"][0]
+
+    def isFailing(candidate: List[list]) -> bool:
+        candidateDivergence = runOperations(candidate, backends, checkInterval)
+        return candidateDivergence is not None and candidateDivergence["operation"][0] == operationType
+
+    chunksCount = 2
+
+    while len(operations) >= 2:
+        chunkSize = -(-len(operations) // chunksCount)
+        chunks = [operations[start:start + chunkSize] for start in range(0, len(operations), chunkSize)]
+        reduced = False
+
+        for chunk in chunks:
+            if isFailing(chunk):
+                operations = chunk
+                chunksCount = 2
+                reduced = True
+                break
+
+        if not reduced:
+            for chunkIndex in range(len(chunks)):
+                complement = [operation for otherIndex, chunk in enumerate(chunks) if otherIndex != chunkIndex for operation in chunk]
+
+                if isFailing(complement):
+                    operations = complement
+                    chunksCount = max(chunksCount - 1, 2)
+                    reduced = True
+                    break
+
+        if not reduced:
+            if chunksCount >= len(operations):
+                break
+
+            chunksCount = min(chunksCount * 2, len(operations))
+
+    return operations
+
+def saveOperations(filePath: str, operations: List[list]) -> None:
+    with open(filePath, "w", encoding="utf-8") as operationsFile:
+        for operation in operations:
+            operationsFile.write(json.dumps(operation) + "\n")
+
+def loadOperations(filePath: str) -> List[list]:
+    with open(filePath, "r", encoding="utf-8") as operationsFile:
+        return [json.loads(line) for line in operationsFile if line.strip()]
+
+# Applies operation to controller and returns comparable result
+# Shapes are different objects in each controller, so they are compared by their signatures
+# Missing selected shape is a comparable result, other exceptions are raised to caller
+def _applyOperation(controller: GeometryController, operation: list):
+    operationType, *arguments = operation
+
+    try:
+        if operationType == "create":
+            kind, sizeIndex, x, y = arguments
+            return controller.tryAddShape(SHAPE_KINDS[kind](QPoint(x, y), _getStyleId(sizeIndex)))
+        elif operationType == "select":
+            return controller.trySelectShape(QPoint(*arguments))
+        elif operationType == "move":
+            return controller.tryMoveSelectedShape(QPoint(*arguments))
+        elif operationType == "deselect":
+            return controller.clearSelectedShape()
+        elif operationType == "delete":
+            return controller.tryDeleteShapeAtPoint(QPoint(*arguments))
+        elif operationType == "query":
+            return _getShapeSignature(controller.getShapeAtPoint(QPoint(*arguments)))
+        elif operationType == "link":
+            return controller.tryLinkWithSelectedShape(QPoint(*arguments))
+        elif operationType == "ungroup":
+            return controller.tryUngroupShapeAtPoint(QPoint(*arguments))
+        elif operationType == "linkUngroup":
+            return _linkAndUngroup(controller, *arguments)
+        elif operationType == "deleteRect":
+            return controller.deleteShapesInRect(QRect(*arguments))
+        elif operationType == "group":
+            return _getShapeSignature(controller.groupShapesInRect(QRect(*arguments)))
+        elif operationType == "relocate":
+            return _relocateShapes(controller, arguments[0])
+        elif operationType == "freePosition":
+            return controller.setFindFreePositionEnabled(arguments[0])
+        elif operationType == "reorder":
+            return controller.reorderShapes()
+    except NoCustomShapeSelected:
+        return "error", NoCustomShapeSelected.__name__
+
+    raise ValueError(f"Unknown operation: {operationType}")
+
+# Links shape with group and ungroups it, so links of the group itself are deleted, returns results of all steps
+def _linkAndUngroup(controller: GeometryController, x: int, y: int, groupX: int, groupY: int) -> tuple:
+    if not controller.trySelectShape(QPoint(x, y)):
+        return (False,)
+
+    return True, controller.tryLinkWithSelectedShape(QPoint(groupX, groupY)), controller.tryUngroupShapeAtPoint(QPoint(groupX, groupY))
+
+# Shapes at points are moved by deltas, returns signatures of moved shapes
+def _relocateShapes(controller: GeometryController, moves: List[list]) -> list:
+    targets: Dict[CustomShape, QPoint] = {}
+
+    for x, y, delta_x, delta_y in moves:
+        shape = controller.getShapeAtPoint(QPoint(x, y))
+
+        if shape and shape not in targets:
+            targets[shape] = QPoint(shape.centerPoint.x() + delta_x, shape.centerPoint.y() + delta_y)
+
+    return sorted(_getShapeSignature(shape) for shape in controller.tryRelocateShapes(targets))
+
+# Shapes of controller as sorted signatures and signature of selected shape
+def _getShapesState(controller: GeometryController) -> tuple:
+    return sorted(_getShapeSignature(shape) for shape in controller.getAllShapes()), _getShapeSignature(controller.selectedShape)
+
+def _getShapeSignature(shape: CustomShape) -> tuple:
+    if shape is None:
+        return None
+
+    boundingBox = shape.boundingBox
+    childCount = len(shape.childShapes) if isinstance(shape, CustomGroup) else 0
+
+    return type(shape).__name__, boundingBox.left(), boundingBox.top(), boundingBox.width(), boundingBox.height(), childCount
+
+def _getStyleId(sizeIndex: int) -> int:
+    return SHAPE_STYLES.getStyleId(constants.RECT_DEFAULT_COLOR, SHAPE_SIZES[sizeIndex])
+
+def _snap(value: int, worldSize: int) -> int:
+    return min(max(value, -worldSize), worldSize * 2) // constants.STRESS_COORDINATE_STEP * constants.STRESS_COORDINATE_STEP
+
+# Adaptive collection switches index only for thousands of shapes by default,
+# harness lowers limits, so switch and migration by small chunks happen during each round
+def _configureAdaptiveIndex() -> None:
+    constants.ADAPTIVE_INDEX_MIN_SHAPES = constants.STRESS_ADAPTIVE_MIN_SHAPES
+    constants.ADAPTIVE_INDEX_CHECK_INTERVAL = constants.STRESS_ADAPTIVE_CHECK_INTERVAL
+    constants.ADAPTIVE_INDEX_MIGRATION_CHUNK = constants.STRESS_ADAPTIVE_MIGRATION_CHUNK
+
+def _printDivergence(divergence: dict) -> None:
+    print(f"Results differ at operation {divergence['index']}: {json.dumps(divergence['operation'])}")
+
+    for backend, result in divergence["results"].items():
+        print(f"    {backend:<12} {result}")
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Run the same random operations on all positioning backends and compare results")
+    parser.add_argument("--operations", type=int, default=constants.STRESS_OPERATIONS, help="total number of operations")
+    parser.add_argument("--seed", type=int, default=0, help="seed of random operations, each round uses its own seed derived from it")
+    parser.add_argument("--backends", default=",".join(POSITIONING_BACKENDS), help="comma-separated backends to compare with reference one")
+    parser.add_argument("--round-length", type=int, default=constants.STRESS_ROUND_LENGTH, help="operations applied to the same controllers")
+    parser.add_argument("--check-interval", type=int, default=constants.STRESS_CHECK_INTERVAL, help="compare all shapes every N operations")
+    parser.add_argument("--output", default=constants.STRESS_FAILURE_FILE, help="file to save shrunk sequence to")
+    parser.add_argument("--replay", metavar="OPERATIONS_FILE", help="run saved sequence instead of random operations")
+    args = parser.parse_args()
+
+    _configureAdaptiveIndex()
+    backends = [backend for backend in args.backends.split(",") if backend and backend != REFERENCE_BACKEND]
+
+    if args.replay:
+        divergence = runOperations(loadOperations(args.replay), backends, args.check_interval)
+
+        if divergence:
+            _printDivergence(divergence)
+            sys.exit(1)
+
+        print("Results are the same")
+        sys.exit(0)
+
+    roundsCount = -(-args.operations // args.round_length)
+
+    for roundNumber in range(roundsCount):
+        roundLength = min(args.round_length, args.operations - roundNumber * args.round_length)
+        operations = generateOperations(roundLength, Random(args.seed * 1000003 + roundNumber))
+        divergence = runOperations(operations, backends, args.check_interval)
+
+        if divergence:
+            _printDivergence(divergence)
+
+            operations = shrinkOperations(operations, backends, args.check_interval)
+            saveOperations(args.output, operations)
+
+            print(f"Shrunk to {len(operations)} operations, saved to {args.output}, run with --replay {args.output}")
+            _printDivergence(runOperations(operations, backends, args.check_interval))
+            sys.exit(1)
+
+        print(f"Round {roundNumber + 1}/{roundsCount}: {roundLength} operations, results are the same")
+
+    print(f"All {args.operations} operations gave the same results on backends: {', '.join([REFERENCE_BACKEND, *backends])}")
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from math import floor, ceil
+from typing import Callable, Dict
+
+from PyQt5.QtGui import QPainter, QImage
+from PyQt5.QtCore import Qt, QPoint, QRect, QSize
+
+import constants
+from geometry_change_listener import GeometryChangeListener
+from performance_monitor import PERF_MONITOR
+from view_transform import ViewTransform
+
+# Cache of pre-rendered world tiles
+# World is split into square tiles of TILE_SIZE_PX view pixels for each zoom level,
+# each tile is rendered once into QImage and then only copied to draw area
+#
+# Tiles are kept in LRU order, least recently used tiles are dropped when memory budget is exceeded
+# Geometry changes drop only tiles overlapped by changed shapes and link segments
+class TileCache(GeometryChangeListener):
+    def __init__(self, renderTile: Callable[[QPainter, QRect, float], None]) -> None:
+        # Function which draws world rect using painter set to world coordinates with specified scale
+        self._renderTile = renderTile
+
+        # Tiles are keyed by (zoom level key, tile column, tile row)
+        self._tiles: OrderedDict[tuple, QImage] = OrderedDict()
+        # Tile size in world units and number of cached tiles for each zoom level key
+        # Zoom level is forgotten with its last tile, so invalidation checks only levels which have tiles
+        self._zoomLevels: Dict[float, float] = {}
+        self._zoomLevelTilesCounts: Dict[float, int] = {}
+
+        self._tileBytes = constants.TILE_SIZE_PX * constants.TILE_SIZE_PX * 4
+        self._maxTilesCount = max(constants.TILE_CACHE_MEMORY_BUDGET_MB * 1024 * 1024 // self._tileBytes, 1)
+
+    # Memory used by cached tiles in bytes
+    @property
+    def memoryUsage(self) -> int:
+        return len(self._tiles) * self._tileBytes
+
+    # Draws tiles covering the draw area, painter should be set to draw area coordinates
+    def drawTiles(self, painter: QPainter, viewTransform: ViewTransform, viewSize: QSize) -> None:
+        scale = viewTransform.scale
+        zoomLevelKey = round(scale, 6)
+        tileWorldSize = constants.TILE_SIZE_PX / scale
+
+        visibleRect = viewTransform.visibleWorldRect(viewSize)
+
+        # All tiles share the same fractional offset, so rounding world origin does not produce seams
+        worldOrigin = viewTransform.mapToView(QPoint(0, 0))
+        originX = round(worldOrigin.x())
+        originY = round(worldOrigin.y())
+
+        for tileY in range(floor(visibleRect.top() / tileWorldSize), floor(visibleRect.bottom() / tileWorldSize) + 1):
+            for tileX in range(floor(visibleRect.left() / tileWorldSize), floor(visibleRect.right() / tileWorldSize) + 1):
+                image = self.__getTile(zoomLevelKey, tileX, tileY, scale, tileWorldSize)
+                painter.drawImage(QPoint(originX + tileX * constants.TILE_SIZE_PX,
+                                         originY + tileY * constants.TILE_SIZE_PX), image)
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self._zoomLevels.clear()
+        self._zoomLevelTilesCounts.clear()
+
+    # Drops tiles overlapped by changed rect on every zoom level
+    def onRectChanged(self, rect: QRect) -> None:
+        for zoomLevelKey, tileWorldSize in list(self._zoomLevels.items()):
+            # Rect is extended by a pixel to cover antialiasing and pen width
+            margin = ceil(1 / zoomLevelKey) + 1
+
+            self.__invalidateTilesRange(zoomLevelKey,
+                                        floor((rect.left() - margin) / tileWorldSize),
+                                        floor((rect.top() - margin) / tileWorldSize),
+                                        floor((rect.right() + margin) / tileWorldSize),
+                                        floor((rect.bottom() + margin) / tileWorldSize))
+
+    # Drops only tiles segment passes through, column by column
+    def onSegmentChanged(self, point_1: QPoint, point_2: QPoint) -> None:
+        if point_1.x() > point_2.x():
+            point_1, point_2 = point_2, point_1
+
+        # Vertical segment covers single column range anyway
+        if point_1.x() == point_2.x():
+            self.onRectChanged(QRect(point_1, point_2).normalized())
+            return
+
+        for zoomLevelKey, tileWorldSize in list(self._zoomLevels.items()):
+            margin = ceil(1 / zoomLevelKey) + 1
+
+            firstColumn = floor((point_1.x() - margin) / tileWorldSize)
+            lastColumn = floor((point_2.x() + margin) / tileWorldSize)
+
+            for column in range(firstColumn, lastColumn + 1):
+                # Part of segment inside column's X range, margin columns use closest segment end
+                startX = min(max(column * tileWorldSize, point_1.x()), point_2.x())
+                endX = max(min((column + 1) * tileWorldSize, point_2.x()), point_1.x())
+
+                startY = TileCache.__segmentY(point_1, point_2, startX)
+                endY = TileCache.__segmentY(point_1, point_2, endX)
+
+                self.__invalidateTilesRange(zoomLevelKey,
+                                            column,
+                                            floor((min(startY, endY) - margin) / tileWorldSize),
+                                            column,
+                                            floor((max(startY, endY) + margin) / tileWorldSize))
+
+    def onGeometryCleared(self) -> None:
+        self.clear()
+
+    # Returns cached tile or renders a new one
+    def __getTile(self, zoomLevelKey: float, tileX: int, tileY: int, scale: float, tileWorldSize: float) -> QImage:
+        key = (zoomLevelKey, tileX, tileY)
+        image = self._tiles.get(key)
+
+        if image is not None:
+            self._tiles.move_to_end(key)
+
+            if PERF_MONITOR.enabled:
+                PERF_MONITOR.incrementCounter("tiles.hits")
+            return image
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("tiles.misses")
+        timerStart = PERF_MONITOR.startTimer()
+
+        image = QImage(constants.TILE_SIZE_PX, constants.TILE_SIZE_PX, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+
+        worldLeft = tileX * tileWorldSize
+        worldTop = tileY * tileWorldSize
+        worldRect = QRect(QPoint(floor(worldLeft), floor(worldTop)),
+                          QPoint(ceil(worldLeft + tileWorldSize), ceil(worldTop + tileWorldSize)))
+
+        painter = QPainter(image)
+        painter.scale(scale, scale)
+        painter.translate(-worldLeft, -worldTop)
+        self._renderTile(painter, worldRect, scale)
+        painter.end()
+
+        self._tiles[key] = image
+        self._zoomLevels[zoomLevelKey] = tileWorldSize
+        self._zoomLevelTilesCounts[zoomLevelKey] = self._zoomLevelTilesCounts.get(zoomLevelKey, 0) + 1
+
+        # Drop least recently used tiles to fit memory budget
+        while len(self._tiles) > self._maxTilesCount:
+            self.__forgetTile(self._tiles.popitem(last=False)[0])
+
+        PERF_MONITOR.stopTimer("tiles.render", timerStart)
+        return image
+
+    # Drops tiles in specified inclusive range of columns and rows
+    def __invalidateTilesRange(self, zoomLevelKey: float, firstColumn: int, firstRow: int, lastColumn: int, lastRow: int) -> None:
+        rangeSize = (lastColumn - firstColumn + 1) * (lastRow - firstRow + 1)
+
+        # For huge ranges it is cheaper to check cached tiles than every tile in range
+        if rangeSize > len(self._tiles):
+            keysToDelete = [key for key in self._tiles
+                            if key[0] == zoomLevelKey and firstColumn <= key[1] <= lastColumn and firstRow <= key[2] <= lastRow]
+        else:
+            keysToDelete = [(zoomLevelKey, column, row)
+                            for row in range(firstRow, lastRow + 1)
+                            for column in range(firstColumn, lastColumn + 1)]
+
+        for key in keysToDelete:
+            if self._tiles.pop(key, None) is not None:
+                self.__forgetTile(key)
+
+        if PERF_MONITOR.enabled:
+            PERF_MONITOR.incrementCounter("tiles.invalidate_calls")
+
+    # Updates tiles count of zoom level after its tile was dropped
+    def __forgetTile(self, key: tuple) -> None:
+        zoomLevelKey = key[0]
+        self._zoomLevelTilesCounts[zoomLevelKey] -= 1
+
+        if not self._zoomLevelTilesCounts[zoomLevelKey]:
+            del self._zoomLevelTilesCounts[zoomLevelKey]
+            del self._zoomLevels[zoomLevelKey]
+
+    # Y coordinate of segment's line at specified X
+    @staticmethod
+    def __segmentY(point_1: QPoint, point_2: QPoint, x: float) -> float:
+        return point_1.y() + (point_2.y() - point_1.y()) * (x - point_1.x()) / (point_2.x() - point_1.x())
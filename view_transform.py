@@ -0,0 +1,84 @@
+from math import floor, ceil
+
+from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import QPoint, QPointF, QRect, QSize
+
+import constants
+
+# Transformation between world coordinates (where shapes live) and draw area coordinates
+# View is defined by scale and world coordinates of draw area's top-left corner
+class ViewTransform():
+    def __init__(self, worldSize: QSize) -> None:
+        self._worldSize = worldSize
+        self._scale = 1.0
+        self._offsetX = 0.0
+        self._offsetY = 0.0
+
+    # Number of view pixels per world unit
+    @property
+    def scale(self) -> float:
+        return self._scale
+
+    @property
+    def worldSize(self) -> QSize:
+        return self._worldSize
+
+    # World point shown in draw area's top-left corner
+    def worldOrigin(self) -> QPointF:
+        return QPointF(self._offsetX, self._offsetY)
+
+    # Converts draw area point to world point
+    def mapToWorld(self, point: QPoint) -> QPoint:
+        return QPoint(floor(point.x() / self._scale + self._offsetX),
+                      floor(point.y() / self._scale + self._offsetY))
+
+    # Converts world point to draw area point
+    def mapToView(self, point: QPoint | QPointF) -> QPointF:
+        return QPointF((point.x() - self._offsetX) * self._scale,
+                       (point.y() - self._offsetY) * self._scale)
+
+    # Returns part of the world visible in draw area of specified size
+    def visibleWorldRect(self, viewSize: QSize) -> QRect:
+        return QRect(QPoint(floor(self._offsetX), floor(self._offsetY)),
+                     QPoint(ceil(self._offsetX + viewSize.width() / self._scale),
+                            ceil(self._offsetY + viewSize.height() / self._scale)))
+
+    # Sets up painter to draw in world coordinates
+    def applyToPainter(self, painter: QPainter) -> None:
+        painter.scale(self._scale, self._scale)
+        painter.translate(-self._offsetX, -self._offsetY)
+
+    # Changes scale keeping world point under specified view point in place
+    def zoomAt(self, viewPoint: QPoint, factor: float, viewSize: QSize) -> None:
+        worldX = viewPoint.x() / self._scale + self._offsetX
+        worldY = viewPoint.y() / self._scale + self._offsetY
+
+        self._scale = min(max(self._scale * factor, constants.VIEW_ZOOM_MIN), constants.VIEW_ZOOM_MAX)
+
+        self._offsetX = worldX - viewPoint.x() / self._scale
+        self._offsetY = worldY - viewPoint.y() / self._scale
+        self.__clampOffset(viewSize)
+
+    # Moves view by specified number of view pixels
+    def pan(self, delta_x: int, delta_y: int, viewSize: QSize) -> None:
+        self._offsetX += delta_x / self._scale
+        self._offsetY += delta_y / self._scale
+        self.__clampOffset(viewSize)
+
+    # Returns to initial 1:1 view of the world's top-left corner
+    def reset(self) -> None:
+        self._scale = 1.0
+        self._offsetX = 0.0
+        self._offsetY = 0.0
+
+    # Keeps view inside the world, world smaller than view is centered
+    def __clampOffset(self, viewSize: QSize) -> None:
+        self._offsetX = ViewTransform.__clampAxis(self._offsetX, self._worldSize.width(), viewSize.width() / self._scale)
+        self._offsetY = ViewTransform.__clampAxis(self._offsetY, self._worldSize.height(), viewSize.height() / self._scale)
+
+    @staticmethod
+    def __clampAxis(offset: float, worldLength: int, visibleLength: float) -> float:
+        if visibleLength >= worldLength:
+            return (worldLength - visibleLength) / 2
+
+        return min(max(offset, 0.0), worldLength - visibleLength)